@@ -3,6 +3,54 @@
 import fs from 'fs';
 import path from 'path';
 
+// driving_analyze.py の列指向形式（save_results_to_json の compact 出力）
+const COLUMNAR_FORMAT = 'alfano-analysis/columnar';
+
+const TYPED_ARRAYS = {
+  float32: Float32Array,
+  float64: Float64Array,
+  int32: Int32Array,
+  int64: BigInt64Array,
+};
+
+// float32 の値を元に戻る最短の10進表記にする（-0.32 が -0.3199999928... にならないように）
+function shortestFloat32(value) {
+  for (let digits = 1; digits < 9; digits++) {
+    const rounded = parseFloat(value.toPrecision(digits));
+    if (Math.fround(rounded) === value) {
+      return rounded;
+    }
+  }
+  return value;
+}
+
+// 列指向形式のバイナリカラム（.bin）を通常の配列に展開する
+function expandColumnarData(data, dataFilePath) {
+  if (data.format !== COLUMNAR_FORMAT || !data.binary) {
+    return data;
+  }
+  const buffer = fs.readFileSync(path.join(path.dirname(dataFilePath), data.binary));
+  const columns = {};
+  Object.entries(data.columns).forEach(([name, column]) => {
+    if (Array.isArray(column)) {
+      columns[name] = column;
+      return;
+    }
+    const TypedArray = TYPED_ARRAYS[column.dtype];
+    const start = buffer.byteOffset + column.offset;
+    const bytes = buffer.buffer.slice(start, start + column.length * TypedArray.BYTES_PER_ELEMENT);
+    // NaN は JSON で表現できないため null にする
+    columns[name] = Array.from(new TypedArray(bytes), v => {
+      const value = Number(v);
+      if (!Number.isFinite(value)) {
+        return null;
+      }
+      return column.dtype === 'float32' ? shortestFloat32(value) : value;
+    });
+  });
+  return { ...data, binary: null, columns };
+}
+
 export default function handler(req, res) {
   try {
     // 本番環境では、Pythonスクリプトを実行するロジックを追加するか
@@ -41,7 +89,7 @@ export default function handler(req, res) {
     
     // 実際のデータファイルを読み込む
     const fileContents = fs.readFileSync(dataFilePath, 'utf8');
-    const data = JSON.parse(fileContents);
+    const data = expandColumnarData(JSON.parse(fileContents), dataFilePath);
     
     res.status(200).json(data);
   } catch (error) {
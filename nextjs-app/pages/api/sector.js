@@ -3,20 +3,28 @@ import path from 'path';
 
 export default function handler(req, res) {
   try {
+    // 詳細度別の軌跡の索引（sector_data/index.json）を優先し、無ければ従来の sector_data.json を読む
+    const indexPath = path.join(process.cwd(), 'public', 'sector_data', 'index.json');
     const filePath = path.join(process.cwd(), 'public', 'sector_data.json');
-    if (!fs.existsSync(filePath)) {
+    let laps;
+    if (fs.existsSync(indexPath)) {
+      laps = JSON.parse(fs.readFileSync(indexPath, 'utf8')).laps;
+    } else if (fs.existsSync(filePath)) {
+      laps = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+    } else {
       return res.status(404).json({ error: 'sector_data.json が見つかりません' });
     }
 
-    const raw = fs.readFileSync(filePath, 'utf8');
-    const laps = JSON.parse(raw);
-
     // 各セクター番号ごとに集計
     const summary = {};
 
     laps.forEach(lap => {
       const sectorTimes = lap.sectorTimes;
       Object.entries(sectorTimes).forEach(([sectorName, time]) => {
+        // 計測できなかったセクター（null / NaN）は集計に含めない
+        if (typeof time !== 'number' || !Number.isFinite(time)) {
+          return;
+        }
         const sector = parseInt(sectorName.replace('Sector', ''));
         if (!summary[sector]) {
           summary[sector] = {
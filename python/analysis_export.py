@@ -0,0 +1,210 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+
+# 出力形式の識別子とバージョン（読み込み側はこの値で形式を判定する）
+EXPORT_FORMAT = 'alfano-analysis/columnar'
+EXPORT_VERSION = 1
+
+# バイナリ出力時に使うデータ型（リトルエンディアン）
+BINARY_DTYPES = {
+    'float32': '<f4',
+    'float64': '<f8',
+    'int32': '<i4',
+    'int64': '<i8',
+}
+
+
+def _column_dtype(values):
+    """カラムの出力データ型名を返す（数値以外は None）"""
+    if np.issubdtype(values.dtype, np.floating):
+        return 'float64' if values.dtype.itemsize > 4 else 'float32'
+    if np.issubdtype(values.dtype, np.bool_):
+        return 'int32'
+    if np.issubdtype(values.dtype, np.integer):
+        return 'int64' if values.dtype.itemsize > 4 else 'int32'
+    return None
+
+
+def _column_to_list(values, dtype):
+    """カラムをJSON配列用のリストに変換する（NaN / inf は null）"""
+    if dtype is None:
+        return [None if pd.isna(v) else v for v in values.tolist()]
+    if dtype.startswith('int'):
+        return values.astype(np.int64).tolist()
+    if dtype == 'float32':
+        # float32 は文字列を経由して最短表記の値に戻す（0.27 が 0.27000001... にならないように）
+        values = values.astype(str).astype(np.float64)
+    finite = np.isfinite(values)
+    out = values.astype(object)
+    out[~finite] = None
+    return out.tolist()
+
+
+def _lap_row_ranges(df, lap_column='Lap'):
+    """ラップ番号で安定ソートした並び順と、各ラップの行範囲（両端含む）を返す"""
+    if lap_column not in df.columns or df.empty:
+        return np.arange(len(df)), {}
+    lap_values = df[lap_column].to_numpy()
+    order = np.argsort(lap_values, kind='stable')
+    lap_sorted = lap_values[order]
+    starts = np.flatnonzero(np.concatenate(([True], lap_sorted[1:] != lap_sorted[:-1])))
+    ends = np.append(starts[1:] - 1, len(lap_sorted) - 1)
+    ranges = {
+        lap.item(): (int(start), int(end))
+        for lap, start, end in zip(lap_sorted[starts], starts, ends)
+    }
+    return order, ranges
+
+
+def _events_to_ranges(events, lap_start):
+    """ラップ内インデックスの区間をデータ全体の行範囲 [開始, 終了] に変換する"""
+    return [[lap_start + int(e['start_idx']), lap_start + int(e['end_idx'])] for e in events]
+
+
+def build_compact_export(results, binary_path=None):
+    """分析結果を列指向・参照形式の辞書に変換する関数
+
+    各チャンネルはデータ全体で一度だけ配列として保存し、ラップ・コーナー・操作は
+    その配列への行範囲（両端含む）で表す。行はラップ番号順（ラップ内は元の順）に並べ替える。
+    行データが無い場合（ストリーミング処理）は range_origin が 'lap' になり、
+    コーナー・操作の区間はラップ内インデックスのまま出力する。
+
+    Parameters:
+    -----------
+    results : dict
+        driving_analyze.analyze_driving_characteristics の結果
+    binary_path : str, optional
+        指定すると数値カラムをこのファイルに型付きバイナリとして書き出し、
+        JSON側にはデータ型・オフセット・要素数だけを記録する
+
+    Returns:
+    --------
+    dict
+    """
+    df = results.get('dataframe')
+    if df is None:
+        # ストリーミング処理ではデータ全体を保持しないため、ラップデータから組み立てる
+        laps = results.get('laps', {})
+        df = pd.concat(laps.values(), ignore_index=True) if laps else pd.DataFrame()
+
+    order, lap_ranges = _lap_row_ranges(df)
+    df = df.iloc[order].reset_index(drop=True)
+
+    columns = {}
+    dtypes = {}
+    binary_file = open(binary_path, 'wb') if binary_path else None
+    try:
+        offset = 0
+        for col in df.columns:
+            values = df[col].to_numpy()
+            dtype = _column_dtype(values)
+            dtypes[col] = dtype or 'object'
+            if binary_file is not None and dtype is not None:
+                data = values.astype(BINARY_DTYPES[dtype]).tobytes()
+                binary_file.write(data)
+                columns[col] = {'dtype': dtype, 'offset': offset, 'length': len(values)}
+                offset += len(data)
+            else:
+                columns[col] = _column_to_list(values, dtype)
+    finally:
+        if binary_file is not None:
+            binary_file.close()
+
+    # 行データが無い場合（ストリーミング処理）は区間をラップ内インデックスのまま出力する
+    range_origin = 'row' if lap_ranges else 'lap'
+
+    corners = {}
+    for lap, lap_corners in results.get('corners', {}).items():
+        lap_start = lap_ranges[lap][0] if lap in lap_ranges else 0
+        corners[int(lap)] = {
+            'rows': _events_to_ranges(lap_corners, lap_start),
+            'type': [c['type'] for c in lap_corners],
+            'peak_g': [c.get('peak_g') for c in lap_corners],
+        }
+
+    operations = {}
+    for lap, ops in results.get('operations', {}).items():
+        lap_start = lap_ranges[lap][0] if lap in lap_ranges else 0
+        operations[int(lap)] = {
+            name: _events_to_ranges(events, lap_start) for name, events in ops.items()
+        }
+
+    best_lap_time = results.get('best_lap_time')
+    export_data = {
+        'format': EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'row_count': len(df),
+        'binary': os.path.basename(binary_path) if binary_path else None,
+        'dtypes': dtypes,
+        'columns': columns,
+        # ラップ0（アウトラップなど）は分析対象外だが行範囲は残す
+        'laps': {lap: list(rows) for lap, rows in lap_ranges.items()},
+        'range_origin': range_origin,
+        'lap_times': {int(lap): float(t) for lap, t in results.get('lap_times', {}).items()},
+        'best_lap_time': None if best_lap_time is None or pd.isna(best_lap_time) else float(best_lap_time),
+        'lap_categories': {int(lap): info for lap, info in results.get('lap_categories', {}).items()},
+        'corners': corners,
+        'operations': operations,
+    }
+    return export_data
+
+
+def save_compact_export(results, output_path, binary=False):
+    """分析結果を列指向JSON（と必要に応じてバイナリ）で保存する関数
+
+    binary=True の場合は output_path の拡張子を .bin に変えたファイルに数値カラムを書き出す。
+    """
+    binary_path = os.path.splitext(output_path)[0] + '.bin' if binary else None
+    export_data = build_compact_export(results, binary_path)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        # JavaScript の JSON.parse で読めるよう NaN は出力しない（null に変換済み）
+        json.dump(export_data, f, ensure_ascii=False, separators=(',', ':'), allow_nan=False,
+                  default=_json_default)
+    return export_data
+
+
+def _json_default(obj):
+    """numpy のスカラー値をJSONに変換する"""
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        if isinstance(value, float) and not np.isfinite(value):
+            return None
+        return value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def load_compact_export(input_path):
+    """列指向JSONを読み込み、データ全体のデータフレームと分析結果を返す関数
+
+    Returns:
+    --------
+    tuple
+        (データフレーム, JSONの内容)。コーナー・操作の行範囲はデータフレームの行番号
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        export_data = json.load(f)
+    if export_data.get('format') != EXPORT_FORMAT:
+        raise ValueError(f"列指向形式の分析結果ではありません: {input_path}")
+
+    binary = None
+    if export_data.get('binary'):
+        binary_path = os.path.join(os.path.dirname(input_path), export_data['binary'])
+        with open(binary_path, 'rb') as f:
+            binary = f.read()
+
+    data = {}
+    for col, values in export_data['columns'].items():
+        if isinstance(values, dict):
+            dtype = np.dtype(BINARY_DTYPES[values['dtype']])
+            data[col] = np.frombuffer(binary, dtype=dtype, count=values['length'],
+                                      offset=values['offset']).astype(values['dtype'])
+        else:
+            dtype = export_data['dtypes'].get(col)
+            if dtype in BINARY_DTYPES:
+                data[col] = np.array([np.nan if v is None else v for v in values], dtype=dtype)
+            else:
+                data[col] = values
+
+    return pd.DataFrame(data), export_data
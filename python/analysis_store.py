@@ -0,0 +1,268 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import contextlib
+import hashlib
+import sqlite3
+import json
+import os
+
+from session_cache import CACHE_DIR_NAME
+
+# スキーマを変更したら上げる（古いテーブルは作り直す）
+STORE_SCHEMA_VERSION = 2
+
+# 既定のストアファイル名（元データと同じディレクトリの .session_cache に作成）
+STORE_FILE_NAME = 'analysis_store.sqlite'
+
+# 他のプロセスが書き込み中の場合に待つ時間 [秒]
+STORE_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lap_results (
+    session     TEXT    NOT NULL,
+    lap         INTEGER NOT NULL,
+    lap_hash    TEXT    NOT NULL,
+    params_hash TEXT    NOT NULL,
+    row_count   INTEGER NOT NULL,
+    lap_time    REAL,
+    corners     TEXT    NOT NULL,
+    operations  TEXT    NOT NULL,
+    sectors     TEXT,
+    updated_at  TEXT    NOT NULL,
+    PRIMARY KEY (session, lap)
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session       TEXT    PRIMARY KEY,
+    size          INTEGER NOT NULL,
+    mtime_ns      INTEGER NOT NULL,
+    lap_count     INTEGER NOT NULL,
+    best_lap_time REAL,
+    analyzed_at   TEXT    NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS lap_categories (
+    session        TEXT    NOT NULL,
+    lap            INTEGER NOT NULL,
+    time           REAL    NOT NULL,
+    diff_from_best REAL    NOT NULL,
+    category       TEXT    NOT NULL,
+    PRIMARY KEY (session, lap)
+);
+
+CREATE INDEX IF NOT EXISTS idx_lap_categories_category ON lap_categories (session, category, time);
+"""
+
+# テーブル一覧（スキーマ変更時に作り直す）
+_TABLES = ('lap_results', 'sessions', 'lap_categories')
+
+# JSONとして保存するカラム
+_JSON_COLUMNS = ('corners', 'operations', 'sectors')
+
+
+def default_store_path(file_path):
+    """元データファイルに対応する既定のストアのパスを返す"""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, STORE_FILE_NAME)
+
+
+def lap_content_hash(lap_data):
+    """ラップの生データ（カラム名・型・全サンプル値）から内容ハッシュを計算する関数
+
+    pandas の行ハッシュ（ベクトル化済み）をまとめてSHA-1にかけるため、
+    行ごとの文字列化は行わない。
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([[col, str(dtype)] for col, dtype in lap_data.dtypes.items()]).encode('utf-8'))
+    row_hashes = pd.util.hash_pandas_object(lap_data, index=False).to_numpy()
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def parameters_hash(params):
+    """分析パラメータ（閾値・ゲートなど）のハッシュを計算する関数"""
+    text = json.dumps(params, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _json_default(obj):
+    """numpy の値・配列をJSONに変換する"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class AnalysisStore:
+    """ラップ単位の分析結果を保存するローカルストア（SQLite）
+
+    セッション（元データの絶対パス）とラップ番号をキーに、ラップの内容ハッシュ・
+    分析パラメータのハッシュと一緒に結果を保存する。両方のハッシュが一致する
+    ラップは再計算せずに保存済みの結果を使う。
+    ラップタイムとラップ分類（success / average / miss）もセッションごとに保存し、
+    比較分析（driving_analyze2）から直接参照する。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=STORE_BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self):
+        # 同じストアを複数のプロセスが同時に開くため、バージョンの確認とテーブルの作り直しは
+        # 書き込みロックを取った1つのトランザクションで行う（他のプロセスが書いた行を消さない）
+        conn = self._conn
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version != STORE_SCHEMA_VERSION:
+                    for table in _TABLES:
+                        conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+                for statement in _SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.isolation_level = ''
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_lap_results(self, session):
+        """セッションの保存済みラップ結果を {ラップ番号: 結果} で返す"""
+        rows = self._conn.execute(
+            "SELECT * FROM lap_results WHERE session = ? ORDER BY lap", (session,)
+        ).fetchall()
+        results = {}
+        for row in rows:
+            record = dict(row)
+            for col in _JSON_COLUMNS:
+                record[col] = json.loads(record[col]) if record[col] is not None else None
+            results[record['lap']] = record
+        return results
+
+    def put_lap_results(self, session, records):
+        """ラップ結果をまとめて保存する（同じラップは上書き）"""
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (
+                session, int(r['lap']), r['lap_hash'], r['params_hash'], int(r['row_count']),
+                None if r['lap_time'] is None or pd.isna(r['lap_time']) else float(r['lap_time']),
+                *(None if r.get(col) is None else json.dumps(r[col], ensure_ascii=False, default=_json_default)
+                  for col in _JSON_COLUMNS),
+                updated_at
+            )
+            for r in records
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO lap_results "
+                "(session, lap, lap_hash, params_hash, row_count, lap_time, corners, operations, sectors, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def remove_other_laps(self, session, laps):
+        """ファイルから無くなったラップの結果を削除する"""
+        laps = [int(lap) for lap in laps]
+        placeholders = ','.join('?' * len(laps))
+        with self._conn:
+            if laps:
+                self._conn.execute(
+                    f"DELETE FROM lap_results WHERE session = ? AND lap NOT IN ({placeholders})",
+                    (session, *laps)
+                )
+            else:
+                self._conn.execute("DELETE FROM lap_results WHERE session = ?", (session,))
+
+    def publish_lap_categories(self, session, lap_categories, best_lap_time, lap_count=None):
+        """セッションのラップタイム・分類を保存する（以前の分類は置き換える）"""
+        stat = os.stat(session)
+        analyzed_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (session, int(lap), float(info['time']), float(info['diff_from_best']), info['category'])
+            for lap, info in lap_categories.items()
+        ]
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(session, size, mtime_ns, lap_count, best_lap_time, analyzed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    session, stat.st_size, stat.st_mtime_ns,
+                    len(lap_categories) if lap_count is None else int(lap_count),
+                    None if pd.isna(best_lap_time) else float(best_lap_time),
+                    analyzed_at
+                )
+            )
+            self._conn.execute("DELETE FROM lap_categories WHERE session = ?", (session,))
+            self._conn.executemany(
+                "INSERT INTO lap_categories (session, lap, time, diff_from_best, category) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get_session(self, session):
+        """セッションの情報を返す（未登録なら None）"""
+        row = self._conn.execute("SELECT * FROM sessions WHERE session = ?", (session,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def is_session_current(self, session):
+        """保存済みの分類が現在のファイル内容（サイズ・更新時刻）に対応しているか"""
+        info = self.get_session(session)
+        if info is None or not os.path.exists(session):
+            return False
+        stat = os.stat(session)
+        return info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns
+
+    def get_lap_categories(self, session, category=None):
+        """セッションのラップ分類を {ラップ番号: {'time', 'diff_from_best', 'category'}} で返す
+
+        category を指定するとその分類のラップだけをタイム順で返す。
+        """
+        query = "SELECT lap, time, diff_from_best, category FROM lap_categories WHERE session = ?"
+        params = [session]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        query += " ORDER BY time, lap" if category is not None else " ORDER BY lap"
+        return {
+            row['lap']: {
+                'time': row['time'],
+                'diff_from_best': row['diff_from_best'],
+                'category': row['category']
+            }
+            for row in self._conn.execute(query, params)
+        }
+
+    def list_sessions(self, directory=None):
+        """分類を保存済みのセッション一覧を返す（directory 指定時はそのディレクトリのものだけ）"""
+        rows = [dict(row) for row in self._conn.execute("SELECT * FROM sessions ORDER BY analyzed_at, session")]
+        if directory is not None:
+            directory = os.path.abspath(directory)
+            rows = [row for row in rows if os.path.dirname(row['session']) == directory]
+        return rows
+
+
+@contextlib.contextmanager
+def open_store(file_path=None, db_path=None):
+    """元データファイル（または明示したパス）のストアを開くコンテキストマネージャ"""
+    store = AnalysisStore(db_path or default_store_path(file_path))
+    try:
+        yield store
+    finally:
+        store.close()
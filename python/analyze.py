@@ -8,6 +8,8 @@ from sklearn.cluster import KMeans
 import json
 import os
 
+from stream_stats import CorrelationAccumulator
+
 # Alfanoデータ解析処理
 def analyze_alfano_data(file_path):
     # データ読み込み
@@ -25,9 +27,10 @@ def analyze_alfano_data(file_path):
     # 数値データのみ抽出
     numeric_columns = df.select_dtypes(include=[np.number]).columns
 
-    # 相関ヒートマップ作成
-    if len(numeric_columns) > 1:
-        correlation = df[numeric_columns].corr()
+    # 相関ヒートマップ作成（読み込み済みのデータから集計し、レポートの他の項目と同じカラムを使う）
+    session_stats = CorrelationAccumulator().update(df)
+    if len(session_stats.columns) > 1:
+        correlation = session_stats.corr()
         plt.figure(figsize=(10, 8))
         sns.heatmap(correlation, annot=True, cmap='coolwarm', fmt=".2f")
         plt.title('相関ヒートマップ')
@@ -5,13 +5,27 @@ import seaborn as sns
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
+import argparse
 import json
 import os
 
+from session_cache import load_cached_frame
+from cluster_model import load_or_fit_model, DEFAULT_CHUNKSIZE
+from stream_stats import CorrelationStore, default_stats_path
+
 # Alfanoデータ解析処理
-def analyze_alfano_data(file_path):
-    # データ読み込み（セミコロン区切り）
-    df = pd.read_csv(file_path, sep=';')
+def analyze_alfano_data(file_path, scalable=False, model_path=None, refit=False, chunksize=DEFAULT_CHUNKSIZE,
+                        stats_path=None):
+    # 大量のデータはチャンク単位で処理し、学習済みのモデルで予測だけを行う
+    if scalable:
+        return analyze_alfano_data_scalable(file_path, model_path, refit, chunksize, stats_path)
+
+    # データ読み込み（セミコロン区切り、セッションキャッシュがあればCSV解析を省略）
+    df = load_cached_frame(
+        file_path,
+        lambda path: pd.read_csv(path, sep=';'),
+        namespace='analyze_v2.raw'
+    )
 
     # ID列を先頭に追加
     df.insert(0, 'id', range(1, len(df) + 1))
@@ -31,14 +45,13 @@ def analyze_alfano_data(file_path):
     # 欠損値を0で補完
     df_filled = df[numeric_columns].fillna(0)
 
+    # 相関の集計（読み込み済みのデータから作る。stats_path を指定した場合だけ、他のセッションと統合できるように保存する）
+    store = CorrelationStore(stats_path)
+    session_stats = store.add_file(file_path, frame=df)
+
     # 相関ヒートマップ作成
     if len(numeric_columns) > 1:
-        correlation = df[numeric_columns].corr()
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(correlation, annot=True, cmap='coolwarm', fmt=".2f")
-        plt.title('相関ヒートマップ')
-        plt.savefig('correlation_heatmap.png')
-        print("\n相関ヒートマップを保存しました")
+        save_correlation_heatmap(session_stats.corr())
 
     # クラスタリング
     if len(numeric_columns) >= 2:
@@ -73,6 +86,8 @@ def analyze_alfano_data(file_path):
         'data_sample': df.head(5).to_dict('records')
     }
 
+    result['correlation'] = correlation_summary(store)
+
     if len(numeric_columns) >= 2:
         cluster_means = df.groupby('cluster')[numeric_columns].mean().T.to_dict()
         cluster_sizes = df['cluster'].value_counts().sort_index().to_dict()
@@ -85,6 +100,68 @@ def analyze_alfano_data(file_path):
 
     return result
 
+# Alfanoデータ解析処理（チャンク単位、シーズン分など全体がメモリに載らないデータ用）
+def analyze_alfano_data_scalable(file_path, model_path=None, refit=False, chunksize=DEFAULT_CHUNKSIZE,
+                                 stats_path=None):
+    # クラスタリングモデル（スケーラー・IncrementalPCA・MiniBatchKMeans）は保存済みのものを使う
+    model = load_or_fit_model(file_path, model_path, refit=refit, chunksize=chunksize)
+
+    # 相関はチャンクごとの集計を統合して求める（集計済みで変更の無いセッションは読み込まない）
+    store = CorrelationStore(stats_path or default_stats_path(file_path))
+    session_stats = store.add_file(file_path, chunksize=chunksize)
+    if len(session_stats.columns) > 1:
+        save_correlation_heatmap(session_stats.corr())
+
+    # 予測と同じ走査で行数・欠損値の数・先頭行も集計する
+    prediction = model.predict_file(file_path, chunksize=chunksize)
+    print("データ行数:", prediction['rows'])
+
+    sample = prediction['sample']
+    plt.figure(figsize=(10, 8))
+    scatter = plt.scatter(sample['pc1'], sample['pc2'], c=sample['cluster'], cmap='viridis', s=2)
+    plt.colorbar(scatter)
+    plt.title('Alfanoデータのクラスタリング結果')
+    plt.xlabel('PCA 第1主成分')
+    plt.ylabel('PCA 第2主成分')
+    plt.savefig('clustering_result.png')
+    print("\nクラスタリング結果を保存しました")
+
+    # ID列を先頭に追加（従来の出力と同じ形式）
+    head = prediction['head']
+    head.insert(0, 'id', range(1, len(head) + 1))
+    return {
+        'summary': {
+            'rows': prediction['rows'],
+            'columns': head.shape[1],
+            'missing_values': prediction['missing_values']
+        },
+        'columns': head.columns.tolist(),
+        'data_sample': head.to_dict('records'),
+        'correlation': correlation_summary(store),
+        'clusters': {
+            'count': len(prediction['sizes']),
+            'sizes': prediction['sizes'],
+            'cluster_means': prediction['cluster_means']
+        }
+    }
+
+# 相関ヒートマップ作成
+def save_correlation_heatmap(correlation, path='correlation_heatmap.png'):
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(correlation, annot=True, cmap='coolwarm', fmt=".2f")
+    plt.title('相関ヒートマップ')
+    plt.savefig(path)
+    print("\n相関ヒートマップを保存しました")
+
+# 保存済みの全セッションを統合した相関行列（JSON出力用）
+def correlation_summary(store):
+    combined = store.combined()
+    return {
+        'sessions': len(store.sessions),
+        'rows': combined.n_rows.to_dict(),
+        'matrix': combined.corr().to_dict()
+    }
+
 # numpy型変換対応
 def convert(o):
     if isinstance(o, np.integer):
@@ -101,7 +178,16 @@ if __name__ == "__main__":
     file_path = os.path.join(base_dir, 'data', 'alfano_data.csv')
     output_path = os.path.join(base_dir, 'python', 'analysis_results.json')
 
-    results = analyze_alfano_data(file_path)
+    parser = argparse.ArgumentParser(description="Alfanoデータの統計・クラスタリング分析")
+    parser.add_argument('file', nargs='?', default=file_path, help="分析するCSVファイル（セミコロン区切り）")
+    parser.add_argument('--scalable', action='store_true', help="チャンク単位で処理し、学習済みのクラスタリングモデルを使う")
+    parser.add_argument('--model', default=None, help="クラスタリングモデルの保存先（既定: データと同じディレクトリの .session_cache）")
+    parser.add_argument('--refit', action='store_true', help="保存済みのモデルがあっても学習し直す")
+    parser.add_argument('--stats', default=None, help="相関の集計の保存先（--scalable の既定: データと同じディレクトリの .session_cache。それ以外は指定した場合だけ保存）")
+    args = parser.parse_args()
+
+    results = analyze_alfano_data(args.file, scalable=args.scalable, model_path=args.model, refit=args.refit,
+                                  stats_path=args.stats)
 
     # NaN → 0 に変換（再帰的に処理）
     def replace_nan_with_zero(obj):
@@ -0,0 +1,278 @@
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import traceback
+import argparse
+import glob
+import time
+import io
+import os
+
+from driving_analyze import (
+    analyze_driving_characteristics,
+    save_results_to_json,
+    save_analysis_report,
+    result_output_paths,
+    publish_lap_categories,
+)
+
+# サマリーのカラム（ファイルごとに1行）
+SUMMARY_COLUMNS = [
+    'file', 'status', 'lap_count', 'best_lap', 'best_lap_time',
+    'success', 'average', 'miss', 'corners', 'braking', 'strong_accel', 'partial_accel',
+    'json_path', 'report_path', 'elapsed', 'error'
+]
+
+
+def collect_session_files(paths, pattern='*.csv'):
+    """ディレクトリ・globパターン・ファイルパスの一覧から分析対象のCSVを集める関数
+
+    ディレクトリは直下の pattern に一致するファイルを対象にする。
+    重複を除いてパス順に並べて返す。
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, pattern)))
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path, recursive=True))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"⚠️ ファイルが見つかりません: {path}")
+
+    return sorted({os.path.abspath(f) for f in files if os.path.isfile(f)})
+
+
+def _session_output_dir(file_path, output_dir, root_dir):
+    """出力先ディレクトリ（output_dir 指定時は元のディレクトリ構成を再現する）"""
+    if output_dir is None:
+        return os.path.dirname(file_path)
+    relative_dir = os.path.relpath(os.path.dirname(file_path), root_dir)
+    return os.path.normpath(os.path.join(output_dir, relative_dir))
+
+
+def analyze_session(file_path, output_dir=None, use_cache=True, streaming=False, binary=False,
+                    publish=True):
+    """1セッション分の分析（読み込み・ラップ分類・コーナー/操作検出・レポート出力）を行う関数
+
+    ワーカープロセスで実行するため、戻り値はサマリー用の辞書だけにする。
+    publish=False の場合はラップ分類をストアに保存せず、戻り値の 'lap_categories' で返す
+    （run_batch は親プロセスでまとめて保存する）。
+    """
+    start_time = time.perf_counter()
+    results = analyze_driving_characteristics(file_path, use_cache=use_cache, streaming=streaming)
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    json_path, report_path = result_output_paths(file_path, output_dir)
+    save_results_to_json(results, json_path, binary=binary)
+    save_analysis_report(results, report_path)
+    if publish:
+        publish_lap_categories(results, file_path)
+
+    categories = {'success': 0, 'average': 0, 'miss': 0}
+    for info in results['lap_categories'].values():
+        categories[info['category']] += 1
+
+    operation_counts = {'braking': 0, 'strong_accel': 0, 'partial_accel': 0}
+    for ops in results['operations'].values():
+        for name, events in ops.items():
+            operation_counts[name] = operation_counts.get(name, 0) + len(events)
+
+    lap_times = results['lap_times']
+    best_lap = min(lap_times, key=lap_times.get) if lap_times else None
+
+    return {
+        'file': file_path,
+        'status': 'ok',
+        'lap_count': results['lap_count'],
+        'best_lap': None if best_lap is None else int(best_lap),
+        'best_lap_time': float(results['best_lap_time']),
+        **categories,
+        'corners': sum(len(c) for c in results['corners'].values()),
+        **operation_counts,
+        'json_path': json_path,
+        'report_path': report_path,
+        'elapsed': time.perf_counter() - start_time,
+        'error': None,
+        'lap_categories': None if publish else results['lap_categories'],
+    }
+
+
+def _run_session(file_path, output_dir, options, quiet):
+    """ワーカー側のエントリポイント（例外はここで受け止めて他のファイルに影響させない）
+
+    ラップ分類のストアはディレクトリ単位で共有されるため、ワーカーからは書き込まず
+    結果に含めて返す（_publish_session で親プロセスが保存する）。
+    """
+    start_time = time.perf_counter()
+    try:
+        if quiet:
+            # 各ファイルの進捗表示は並列実行では混ざるため捨てる
+            with contextlib.redirect_stdout(io.StringIO()):
+                return analyze_session(file_path, output_dir, publish=False, **options)
+        return analyze_session(file_path, output_dir, publish=False, **options)
+    except Exception as e:
+        return {
+            'file': file_path,
+            'status': 'error',
+            'elapsed': time.perf_counter() - start_time,
+            'error': f"{type(e).__name__}: {e}",
+            'traceback': traceback.format_exc(),
+        }
+
+
+def _publish_session(record):
+    """ワーカーが返したラップ分類をストアに保存する（親プロセスで1ファイルずつ実行）"""
+    lap_categories = record.pop('lap_categories', None)
+    if record['status'] != 'ok' or lap_categories is None:
+        return record
+    try:
+        publish_lap_categories(
+            {
+                'lap_categories': lap_categories,
+                'best_lap_time': record['best_lap_time'],
+                'lap_count': record['lap_count'],
+            },
+            record['file']
+        )
+    except Exception as e:
+        record.update({
+            'status': 'error',
+            'error': f"{type(e).__name__}: {e}",
+            'traceback': traceback.format_exc(),
+        })
+    return record
+
+
+def run_batch(paths, workers=None, output_dir=None, use_cache=True, streaming=False,
+              binary=False, quiet=True):
+    """複数セッションの分析をプロセスプールで並列実行する関数
+
+    Parameters:
+    -----------
+    paths : str or list
+        ディレクトリ、globパターン（例: 'data/**/*.csv'）、CSVファイルのパス
+    workers : int, optional
+        ワーカープロセス数。指定がなければCPU数。1 の場合は同じプロセスで順番に実行する
+    output_dir : str, optional
+        JSON・レポートの出力先。指定がなければ各CSVと同じディレクトリ
+    use_cache : bool
+        前処理済みデータのキャッシュを使うか
+    streaming : bool
+        ラップ単位のストリーミング処理で分析するか（メモリ使用量を抑える）
+    binary : bool
+        数値カラムをJSONとは別のバイナリファイルに出力するか
+    quiet : bool
+        各ファイルの分析中の表示を抑制するか
+
+    Returns:
+    --------
+    pd.DataFrame
+        ファイルごとの結果サマリー（失敗したファイルは status='error'）
+    """
+    files = collect_session_files(paths)
+    if not files:
+        print("分析対象のCSVファイルがありません。")
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    root_dir = os.path.commonpath([os.path.dirname(f) for f in files])
+    options = {'use_cache': use_cache, 'streaming': streaming, 'binary': binary}
+    jobs = [(f, _session_output_dir(f, output_dir, root_dir)) for f in files]
+
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    print(f"{len(files)} ファイルを {workers} プロセスで分析します...")
+
+    records = []
+
+    def report(record):
+        record = _publish_session(record)
+        records.append(record)
+        name = os.path.relpath(record['file'], root_dir)
+        if record['status'] == 'ok':
+            print(f"✅ [{len(records)}/{len(files)}] {name}: {record['lap_count']} ラップ, "
+                  f"ベスト {record['best_lap_time']:.3f}秒 ({record['elapsed']:.1f}秒)")
+        else:
+            print(f"❌ [{len(records)}/{len(files)}] {name}: {record['error']}")
+
+    if workers == 1:
+        for file_path, session_dir in jobs:
+            report(_run_session(file_path, session_dir, options, quiet))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_run_session, file_path, session_dir, options, quiet): file_path
+                for file_path, session_dir in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # ワーカープロセス自体が異常終了した場合など
+                    record = {'file': futures[future], 'status': 'error',
+                              'error': f"{type(e).__name__}: {e}"}
+                report(record)
+
+    summary = pd.DataFrame(records).reindex(columns=SUMMARY_COLUMNS + ['traceback'])
+    if summary['traceback'].isna().all():
+        summary = summary.drop(columns='traceback')
+    return summary.sort_values('file').reset_index(drop=True)
+
+
+def print_batch_summary(summary):
+    """バッチ分析の集計結果を表示する関数"""
+    ok = summary[summary['status'] == 'ok']
+    failed = summary[summary['status'] != 'ok']
+
+    print("\n=== バッチ分析サマリー ===")
+    print(f"分析ファイル数: {len(summary)} (成功: {len(ok)}, 失敗: {len(failed)})")
+    if not ok.empty:
+        print(f"総ラップ数: {int(ok['lap_count'].sum())}")
+        print(f"成功/アベレージ/ミス ラップ数: "
+              f"{int(ok['success'].sum())} / {int(ok['average'].sum())} / {int(ok['miss'].sum())}")
+        best = ok.loc[ok['best_lap_time'].idxmin()] if ok['best_lap_time'].notna().any() else None
+        if best is not None:
+            print(f"最速ラップ: {best['best_lap_time']:.3f}秒 "
+                  f"({os.path.basename(best['file'])} ラップ {int(best['best_lap'])})")
+        print(f"処理時間の合計: {ok['elapsed'].sum():.1f}秒")
+
+    for _, row in failed.iterrows():
+        print(f"❌ {row['file']}: {row['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数のセッションCSVをまとめて分析します")
+    parser.add_argument('paths', nargs='+', help="ディレクトリ、globパターン、またはCSVファイル")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="ワーカープロセス数（既定: CPU数）")
+    parser.add_argument('-o', '--output-dir', default=None, help="JSON・レポートの出力先ディレクトリ")
+    parser.add_argument('--summary', default=None, help="サマリーCSVの保存先")
+    parser.add_argument('--no-cache', action='store_true', help="前処理キャッシュを使わない")
+    parser.add_argument('--streaming', action='store_true', help="ラップ単位のストリーミング処理で分析する")
+    parser.add_argument('--binary', action='store_true', help="数値カラムをバイナリファイルに出力する")
+    parser.add_argument('-v', '--verbose', action='store_true', help="各ファイルの分析中の表示を出す")
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.paths,
+        workers=args.workers,
+        output_dir=args.output_dir,
+        use_cache=not args.no_cache,
+        streaming=args.streaming,
+        binary=args.binary,
+        quiet=not args.verbose,
+    )
+    print_batch_summary(summary)
+
+    if args.summary:
+        summary.to_csv(args.summary, index=False, encoding='utf-8-sig')
+        print(f"\nサマリーを保存しました: {args.summary}")
+
+    return 0 if (summary['status'] == 'ok').all() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,185 @@
+import numpy as np
+import json
+import os
+
+from lap_resample import latlon_to_xy
+from gate_crossing import find_gate_crossings, gate_lines
+
+# サーキット定義ファイルの保存先（サーキットごとに <名前>.json）
+CIRCUIT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'circuits')
+
+# 読み込み済みのサーキット {ファイルの絶対パス: (更新時刻, Circuit)}
+_LOADED = {}
+
+
+def circuit_path(name, circuit_dir=None):
+    """サーキット名に対応する定義ファイルのパスを返す"""
+    return os.path.join(circuit_dir or CIRCUIT_DIR, f"{name}.json")
+
+
+def _box_polygon(box):
+    """緯度経度の範囲 {'lat_min', 'lat_max', 'lon_min', 'lon_max'} を4頂点のポリゴンにする"""
+    return [
+        [box['lat_min'], box['lon_min']],
+        [box['lat_min'], box['lon_max']],
+        [box['lat_max'], box['lon_max']],
+        [box['lat_max'], box['lon_min']],
+    ]
+
+
+def _format_circuit(data):
+    """定義ファイルの JSON（手で編集しやすいようにゲート・コーナーは1件1行）"""
+    dump = lambda value: json.dumps(value, ensure_ascii=False)
+    lines = ['{']
+    for key, value in data.items():
+        if isinstance(value, list):
+            items = [f'    {dump(item)}' for item in value]
+            lines.append(f'  {dump(key)}: [' + ('\n' + ',\n'.join(items) + '\n  ],' if items else '],'))
+        else:
+            lines.append(f'  {dump(key)}: {dump(value)},')
+    lines[-1] = lines[-1].rstrip(',')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+class Circuit:
+    """サーキット定義（セクターゲート・コーナー領域・ローカル座標の基準点）
+
+    ゲートとコーナーは緯度経度（度）で保持し、読み込み時にローカルXY座標 [m]
+    （lap_resample.latlon_to_xy）でのゲート線分・直線の係数と、コーナーの
+    外接矩形の配列を一度だけ作る。多数のセッションをまとめて処理する場合も
+    セクター・コーナーの判定ごとに準備をやり直さない。
+    """
+
+    def __init__(self, name, lat0, lon0, gates=None, corners=None, display_name=None):
+        """
+        Parameters:
+        -----------
+        name : str
+            サーキット名（定義ファイル名）
+        lat0, lon0 : float
+            ローカル座標の基準点（度）
+        gates : list, optional
+            走行順のセクターゲート [{'name', 'start': [lat, lon], 'end': [lat, lon]}, ...]
+        corners : list, optional
+            コーナー領域 [{'name', 'polygon': [[lat, lon], ...], 'priority'}, ...]。
+            'polygon' の代わりに 'lat_min', 'lat_max', 'lon_min', 'lon_max' の矩形でもよい。
+            領域が重なる場合は 'priority'（省略時 0）が大きい方、同じなら面積が小さい方を優先する
+        display_name : str, optional
+            表示用の名前
+        """
+        self.name = name
+        self.display_name = display_name or name
+        self.lat0 = float(lat0)
+        self.lon0 = float(lon0)
+        self.gates = [dict(g) for g in (gates or [])]
+        self.corners = []
+        for c in (corners or []):
+            corner = {'name': c['name'], 'polygon': c['polygon'] if 'polygon' in c else _box_polygon(c)}
+            if c.get('priority') is not None:
+                corner['priority'] = c['priority']
+            self.corners.append(corner)
+        self._prepare()
+
+    def _prepare(self):
+        # ゲート線分（緯度経度・ローカル座標、形状: ゲート数 × 2 × 2）
+        self.gates_latlon = np.array(
+            [[g['start'], g['end']] for g in self.gates], dtype=np.float64
+        ).reshape(-1, 2, 2)
+        gx, gy = self.to_xy(self.gates_latlon[:, :, 0].ravel(), self.gates_latlon[:, :, 1].ravel())
+        self.gates_xy = np.stack((gx, gy), axis=1).reshape(-1, 2, 2)
+
+        # ゲートを通る直線 a*x + b*y = c の係数（(a, b) は単位法線、形状: ゲート数 × 3）と長さ
+        # （gate_crossing.find_gate_crossings の lines にそのまま渡す）
+        self.gate_lines, self.gate_lengths = gate_lines(self.gates_xy)
+
+        # コーナーの頂点と外接矩形（緯度経度、形状: コーナー数 × 4 = lat_min, lat_max, lon_min, lon_max）
+        self.corner_polygons = [np.asarray(c['polygon'], dtype=np.float64) for c in self.corners]
+        self.corner_bounds = np.array([
+            [p[:, 0].min(), p[:, 0].max(), p[:, 1].min(), p[:, 1].max()] for p in self.corner_polygons
+        ], dtype=np.float64).reshape(-1, 4)
+
+        # 外接矩形と一致する（軸に平行な長方形の）コーナーは頂点による内外判定を省略できる
+        self.corner_is_box = np.array([
+            len(set(map(tuple, p.tolist()))) == 4
+            and np.isin(p[:, 0], b[:2]).all() and np.isin(p[:, 1], b[2:]).all()
+            for p, b in zip(self.corner_polygons, self.corner_bounds)
+        ], dtype=bool)
+
+        # 重なりの解決順（優先度の低い順。後に割り当てたコーナーが上書きする）
+        priority = np.array([c.get('priority', 0) for c in self.corners], dtype=np.float64)
+        area = (self.corner_bounds[:, 1] - self.corner_bounds[:, 0]) * (self.corner_bounds[:, 3] - self.corner_bounds[:, 2])
+        self.corner_order = np.lexsort((-area, priority))
+
+    @property
+    def gate_names(self):
+        return [g.get('name', f"Gate {i + 1}") for i, g in enumerate(self.gates)]
+
+    @property
+    def corner_names(self):
+        return [c['name'] for c in self.corners]
+
+    def to_xy(self, lat, lon):
+        """緯度経度をこのサーキットのローカル座標 [m] に変換する（1e6倍の生値にも対応）"""
+        return latlon_to_xy(lat, lon, self.lat0, self.lon0)
+
+    def sector_gates(self):
+        """緯度経度のゲート [((lat1, lon1), (lat2, lon2)), ...]（分析パラメータのハッシュなどに使う）"""
+        return [(tuple(start), tuple(end)) for start, end in self.gates_latlon.tolist()]
+
+    def find_gate_crossings(self, x, y, t, lap=None):
+        """ローカル座標の軌跡と全ゲートの交差を、計算済みの直線の係数で検出する"""
+        return find_gate_crossings(x, y, t, self.gates_xy, lap=lap, lines=(self.gate_lines, self.gate_lengths))
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'display_name': self.display_name,
+            'origin': {'lat': self.lat0, 'lon': self.lon0},
+            'gates': self.gates,
+            'corners': self.corners,
+        }
+
+    @classmethod
+    def from_sector_gates(cls, sector_gates, name='sector_gates'):
+        """緯度経度のゲート [((lat1, lon1), (lat2, lon2)), ...] だけのサーキット（基準点は最初のゲートの始点）"""
+        gates = np.asarray(sector_gates, dtype=np.float64).reshape(-1, 2, 2)
+        return cls(name, gates[0, 0, 0], gates[0, 0, 1],
+                   [{'start': start, 'end': end} for start, end in gates.tolist()])
+
+    @classmethod
+    def from_dict(cls, data):
+        origin = data['origin']
+        return cls(data['name'], origin['lat'], origin['lon'], data.get('gates'), data.get('corners'),
+                   data.get('display_name'))
+
+    def save(self, path=None):
+        """定義ファイルに保存する（パス省略時はサーキットごとの既定の場所）"""
+        path = path or circuit_path(self.name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_format_circuit(self.to_dict()))
+        _LOADED.pop(os.path.abspath(path), None)
+        return path
+
+
+def load_circuit(name_or_path, circuit_dir=None):
+    """サーキット名または定義ファイルのパスから読み込む関数
+
+    同じファイルは更新されていない限り読み込み済みのもの（準備済みの配列）を返す。
+    """
+    path = name_or_path
+    if not os.path.exists(path):
+        path = circuit_path(name_or_path, circuit_dir)
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+
+    loaded = _LOADED.get(path)
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        circuit = Circuit.from_dict(json.load(f))
+    _LOADED[path] = (mtime, circuit)
+    return circuit
+
@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import IncrementalPCA
+from sklearn.cluster import MiniBatchKMeans
+from datetime import datetime
+import joblib
+import os
+
+from session_cache import CACHE_DIR_NAME
+
+# モデルファイルの形式を変えたら上げる（古いモデルは読み込まずに作り直す）
+MODEL_VERSION = 1
+
+# 既定のモデルファイル名（データと同じディレクトリの .session_cache に作成し、シーズン分のファイルで共有する）
+MODEL_FILE_NAME = 'cluster_model.joblib'
+
+# 一度に読み込む行数
+DEFAULT_CHUNKSIZE = 200000
+
+# クラスタリングの設定（analyze_v2 の従来の処理と同じ）
+N_CLUSTERS = 3
+N_COMPONENTS = 2
+RANDOM_STATE = 42
+
+# 行番号などの特徴量に使わないカラム
+EXCLUDED_COLUMNS = {'id', 'cluster'}
+
+
+def default_model_path(file_path):
+    """データファイルに対応する既定のモデルファイルのパスを返す"""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, MODEL_FILE_NAME)
+
+
+def read_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, sep=';'):
+    """CSVを chunksize 行ずつ読み込むイテレータ（セッション全体はメモリに載せない）"""
+    return pd.read_csv(file_path, sep=sep, chunksize=chunksize)
+
+
+class ScalableClusterModel:
+    """チャンク単位で学習・予測できるクラスタリングモデル
+
+    StandardScaler / IncrementalPCA / MiniBatchKMeans をいずれも partial_fit で学習するため、
+    メモリに載るのは1チャンク分だけになる。学習済みのモデルはファイルに保存し、
+    新しいセッションは変換・予測だけを行う。
+    """
+
+    def __init__(self, n_clusters=N_CLUSTERS, n_components=N_COMPONENTS, random_state=RANDOM_STATE):
+        self.n_clusters = n_clusters
+        self.n_components = n_components
+        self.columns = None
+        self.scaler = StandardScaler()
+        self.pca = IncrementalPCA(n_components=n_components)
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+        self.fitted_rows = 0
+        self.fitted_files = []
+        self.fitted_at = None
+
+    def _numeric(self, chunk):
+        """チャンクから特徴量カラムを数値の配列として取り出す（欠損値は NaN のまま）"""
+        if self.columns is None:
+            self.columns = [
+                col for col in chunk.select_dtypes(include=[np.number]).columns
+                if col not in EXCLUDED_COLUMNS
+            ]
+        values = np.full((len(chunk), len(self.columns)), np.nan)
+        for i, col in enumerate(self.columns):
+            if col in chunk.columns:
+                # チャンクによって型推論が変わる場合（全て空欄など）があるため数値に揃える
+                values[:, i] = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        return values
+
+    def _features(self, chunk):
+        """チャンクから特徴量の配列を取り出す（欠損値は0で補完）"""
+        return np.nan_to_num(self._numeric(chunk), nan=0.0)
+
+    def fit(self, chunk_source):
+        """チャンクを2回走査して学習する
+
+        1回目でスケーラー（平均・分散）を確定し、2回目でスケーリング済みのチャンクに
+        IncrementalPCA と MiniBatchKMeans を逐次学習させる。
+
+        Parameters:
+        -----------
+        chunk_source : callable
+            呼ぶたびに DataFrame のチャンクを返すイテレータを作る関数
+        """
+        for chunk in chunk_source():
+            if len(chunk):
+                self.scaler.partial_fit(self._features(chunk))
+
+        rows = 0
+        pending = None
+        for chunk in chunk_source():
+            if not len(chunk):
+                continue
+            scaled = self.scaler.transform(self._features(chunk))
+            # IncrementalPCA は各バッチに n_components 行以上が必要なため、端数は次のチャンクに回す
+            if pending is not None:
+                scaled = np.vstack((pending, scaled))
+                pending = None
+            if len(scaled) < max(self.n_components, self.n_clusters):
+                pending = scaled
+                continue
+            self.pca.partial_fit(scaled)
+            self.kmeans.partial_fit(scaled)
+            rows += len(scaled)
+        if pending is not None and rows > 0:
+            self.kmeans.partial_fit(pending)
+            rows += len(pending)
+        if rows == 0:
+            raise ValueError("学習に使えるデータがありません")
+
+        self.fitted_rows += rows
+        self.fitted_at = datetime.now().isoformat(timespec='seconds')
+        return self
+
+    def fit_files(self, file_paths, chunksize=DEFAULT_CHUNKSIZE, sep=';'):
+        """複数のセッションファイル（シーズン分など）をまとめて学習する"""
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+
+        def chunk_source():
+            for path in file_paths:
+                yield from read_chunks(path, chunksize, sep)
+
+        self.fit(chunk_source)
+        self.fitted_files = [os.path.abspath(p) for p in file_paths]
+        return self
+
+    def transform(self, chunk):
+        """チャンクを主成分空間に変換する"""
+        return self.pca.transform(self.scaler.transform(self._features(chunk)))
+
+    def predict(self, chunk):
+        """チャンクの各行のクラスタ番号を返す"""
+        return self.kmeans.predict(self.scaler.transform(self._features(chunk)))
+
+    def predict_file(self, file_path, chunksize=DEFAULT_CHUNKSIZE, sep=';', sample_size=50000,
+                     random_state=RANDOM_STATE):
+        """セッションファイルをチャンク単位で予測し、クラスタごとの集計を返す
+
+        全行のクラスタ番号を保持する代わりに、クラスタごとの行数・カラムの合計を積み上げる。
+        散布図用に、主成分とクラスタ番号の一部（最大 sample_size 行）を無作為抽出して残す。
+
+        Returns:
+        --------
+        dict
+            'rows', 'missing_values', 'head'（先頭5行とクラスタ番号）, 'sizes'（クラスタ番号: 行数）,
+            'cluster_means'（クラスタ番号: {カラム: 平均}）, 'sample'（'pc1', 'pc2', 'cluster' の DataFrame）
+        """
+        rng = np.random.default_rng(random_state)
+        n_columns = len(self.columns)
+        counts = np.zeros(self.n_clusters, dtype=np.int64)
+        sums = np.zeros((self.n_clusters, n_columns))
+        valid_counts = np.zeros((self.n_clusters, n_columns))
+        samples = []
+        head = None
+        missing_values = 0
+        rows = 0
+
+        for chunk in read_chunks(file_path, chunksize, sep):
+            if not len(chunk):
+                continue
+            values = self._numeric(chunk)
+            scaled = self.scaler.transform(np.nan_to_num(values, nan=0.0))
+            labels = self.kmeans.predict(scaled)
+            if head is None:
+                head = chunk.head(5).assign(cluster=labels[:5])
+            missing_values += int(chunk.isnull().sum().sum())
+
+            # クラスタ平均は欠損値を除いた元の値で計算する（従来の groupby().mean() と同じ）
+            valid = ~np.isnan(values)
+            for k in range(n_columns):
+                sums[:, k] += np.bincount(labels, weights=np.where(valid[:, k], values[:, k], 0.0),
+                                          minlength=self.n_clusters)
+                valid_counts[:, k] += np.bincount(labels, weights=valid[:, k], minlength=self.n_clusters)
+            counts += np.bincount(labels, minlength=self.n_clusters)
+
+            # 各行に乱数のキーを付け、キーの小さい sample_size 行を残す（全体からの一様な抽出）
+            keys = rng.random(len(chunk))
+            picked = np.argsort(keys)[:sample_size]
+            components = self.pca.transform(scaled[picked])
+            samples.append(pd.DataFrame({
+                'key': keys[picked], 'pc1': components[:, 0], 'pc2': components[:, 1], 'cluster': labels[picked]
+            }))
+            if len(samples) > 1:
+                samples = [pd.concat(samples, ignore_index=True).nsmallest(sample_size, 'key')]
+            rows += len(chunk)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / valid_counts
+        if samples:
+            sample = samples[0].drop(columns='key').reset_index(drop=True)
+        else:
+            sample = pd.DataFrame(columns=['pc1', 'pc2', 'cluster'])
+
+        present = np.flatnonzero(counts)
+        return {
+            'rows': rows,
+            'missing_values': missing_values,
+            'head': head,
+            'sizes': {int(k): int(counts[k]) for k in present},
+            'cluster_means': {
+                int(k): {col: (None if np.isnan(means[k, i]) else float(means[k, i])) for i, col in enumerate(self.columns)}
+                for k in present
+            },
+            'sample': sample,
+        }
+
+    def save(self, path):
+        """学習済みのモデルを保存する"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp'
+        joblib.dump({'version': MODEL_VERSION, 'model': self}, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """保存済みのモデルを読み込む（形式が古い・壊れている場合は None）"""
+        try:
+            data = joblib.load(path)
+        except Exception:
+            return None
+        if not isinstance(data, dict) or data.get('version') != MODEL_VERSION:
+            return None
+        return data['model']
+
+
+def load_or_fit_model(file_paths, model_path=None, refit=False, chunksize=DEFAULT_CHUNKSIZE, sep=';'):
+    """保存済みのモデルがあれば読み込み、無ければ file_paths で学習して保存する関数"""
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    if model_path is None:
+        model_path = default_model_path(file_paths[0])
+
+    model = None if refit or not os.path.exists(model_path) else ScalableClusterModel.load(model_path)
+    if model is not None:
+        print(f"学習済みのクラスタリングモデルを使用します: {model_path}")
+        return model
+
+    print(f"{len(file_paths)} ファイルでクラスタリングモデルを学習中...")
+    model = ScalableClusterModel().fit_files(file_paths, chunksize=chunksize, sep=sep)
+    model.save(model_path)
+    print(f"クラスタリングモデルを保存しました（{model.fitted_rows} 行）: {model_path}")
+    return model
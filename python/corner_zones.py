@@ -0,0 +1,240 @@
+import pandas as pd
+import numpy as np
+
+from lap_resample import normalize_latlon, LAT_COL, LON_COL, TIME_COLUMNS
+from run_length import find_runs
+
+# コーナー外（ストレート）のラベル
+STRAIGHT = -1
+
+# コーナー通過の統計に使う速度・横Gのカラム
+SPEED_COL = 'Speed GPS'
+LATERAL_G_COL = 'Gf. Y'
+
+# コーナー通過として扱う最小のポイント数（領域の縁でのGPSのぶれを除く。10Hzで0.5秒）
+DEFAULT_MIN_POINTS = 5
+
+# 同じコーナーの区間をまとめる最大の間隔 [ポイント]（重なった領域の縁で区間が途切れた場合）
+DEFAULT_MAX_GAP = 10
+
+PASSAGE_COLUMNS = [
+    'Lap', 'Corner', 'CornerId', 'start_idx', 'apex_idx', 'end_idx',
+    'entry_speed', 'apex_speed', 'exit_speed', 'peak_g', 'entry_time', 'duration'
+]
+
+
+def _points_in_polygon(lat, lon, polygon):
+    """点の配列がポリゴン（[[lat, lon], ...]）の内側にあるかをまとめて判定する（レイキャスト法）"""
+    inside = np.zeros(len(lat), dtype=bool)
+    p_lat = polygon[:, 0]
+    p_lon = polygon[:, 1]
+    for i in range(len(polygon)):
+        j = i - 1
+        crosses = (p_lat[i] > lat) != (p_lat[j] > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lon_at = p_lon[i] + (lat - p_lat[i]) * (p_lon[j] - p_lon[i]) / (p_lat[j] - p_lat[i])
+        inside ^= crosses & (lon < lon_at)
+    return inside
+
+
+def assign_corners(lat, lon, circuit):
+    """全サンプルをコーナー番号（circuit.corners の位置、コーナー外は STRAIGHT）に割り当てる関数
+
+    緯度でソートした点列に対して各コーナーの外接矩形の緯度範囲を二分探索し、
+    範囲内の点だけを経度・頂点で判定する。重なった領域は circuit.corner_order の
+    順に上書きし、優先度の高いコーナーを残す。
+    """
+    lat, lon = normalize_latlon(lat, lon)
+    labels = np.full(len(lat), STRAIGHT, dtype=np.int64)
+    if len(lat) == 0 or len(circuit.corners) == 0:
+        return labels
+
+    # 緯度の区間インデックス（NaN は末尾に並ぶため探索範囲に入らない）
+    order = np.argsort(lat, kind='stable')
+    lat_sorted = lat[order]
+
+    for c in circuit.corner_order:
+        lat_min, lat_max, lon_min, lon_max = circuit.corner_bounds[c]
+        lo = np.searchsorted(lat_sorted, lat_min, side='left')
+        hi = np.searchsorted(lat_sorted, lat_max, side='right')
+        idx = order[lo:hi]
+        idx = idx[(lon[idx] >= lon_min) & (lon[idx] <= lon_max)]
+        if not circuit.corner_is_box[c]:
+            idx = idx[_points_in_polygon(lat[idx], lon[idx], circuit.corner_polygons[c])]
+        labels[idx] = c
+    return labels
+
+
+def _elapsed_column(df):
+    """経過時間のカラム（無ければ None）"""
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            return df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return None
+
+
+def _merge_runs(starts, ends, corners, laps, max_gap, min_points):
+    """同じラップ・同じコーナーの区間のうち、間隔が max_gap ポイント以下のものを1つにまとめる
+
+    まとめた区間に含まれる他のコーナーの短い区間は除き、区間が重なる場合は
+    後から始まる区間の先頭を削って重ならないようにする。
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (開始インデックス, 終了インデックス, コーナー番号)（開始位置順）
+    """
+    order = np.lexsort((starts, corners, laps))
+    starts, ends, corners, laps = starts[order], ends[order], corners[order], laps[order]
+    same = np.concatenate(([False], (laps[1:] == laps[:-1]) & (corners[1:] == corners[:-1])))
+    gap = np.concatenate(([0], starts[1:] - ends[:-1] - 1))
+    first = np.flatnonzero(~same | (gap > max_gap))
+    starts, ends, corners = starts[first], np.maximum.reduceat(ends, first), corners[first]
+
+    # ラップは連続した区間に並んでいるため、開始位置順に前の区間の終了位置の最大値で削れば重ならない
+    order = np.argsort(starts, kind='stable')
+    starts, ends, corners = starts[order], ends[order], corners[order]
+    previous_end = np.maximum.accumulate(np.concatenate(([-1], ends[:-1])))
+    starts = np.maximum(starts, previous_end + 1)
+    keep = (ends - starts + 1) >= min_points
+    return starts[keep], ends[keep], corners[keep]
+
+
+def corner_passages(df, circuit, labels=None, min_points=DEFAULT_MIN_POINTS, lap_column='Lap',
+                    sample_interval=0.1, max_gap=DEFAULT_MAX_GAP, one_per_lap=True):
+    """セッション全体のコーナー通過（ラップ × コーナー）と進入・エイペックス・脱出の統計を一括で求める関数
+
+    同じコーナーに割り当てられた連続サンプルを1回の通過とし、重なった領域の縁で途切れた
+    区間（間隔が max_gap ポイント以下）は1回にまとめる。領域が粗く同じラップで同じコーナーを
+    何度も通る場合（ストレートが領域をかすめるなど）は、横Gのピークが最も大きい通過
+    （横Gが無ければ最も長い通過）をそのラップの通過とする。エイペックスは通過中の
+    最低速度の点とする。start_idx / apex_idx / end_idx はラップ内のインデックス
+    （driving_analyze.group_laps の各ラップと同じ位置）。
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        セッション全体のデータ（'Lat.', 'Lon.', ラップ番号、速度・横Gのカラム）
+    circuit : circuit_registry.Circuit
+        コーナー領域を持つサーキット定義
+    labels : array-like, optional
+        assign_corners の結果（省略時はここで割り当てる）
+    min_points : int
+        通過として扱う最小のポイント数（まとめた後の区間の長さ）
+    lap_column : str
+        ラップ番号のカラム（無い場合は全体を1ラップとして扱う）
+    sample_interval : float
+        時間カラムが無い場合のサンプリング間隔 [秒]
+    max_gap : int
+        同じコーナーの区間を1回の通過にまとめる最大の間隔 [ポイント]
+    one_per_lap : bool
+        True ならラップ・コーナーごとに1回の通過だけを残す
+
+    Returns:
+    --------
+    pd.DataFrame
+        PASSAGE_COLUMNS を持つ通過の一覧（ラップ・通過順）
+    """
+    if df.empty:
+        return pd.DataFrame(columns=PASSAGE_COLUMNS)
+    if labels is None:
+        labels = assign_corners(df[LAT_COL], df[LON_COL], circuit)
+
+    # ラップ番号で安定ソートし、各ラップを連続した区間にする
+    # ラップ番号のカラムが無い（1ラップ分のファイル）場合は全体をラップ 0 とする
+    lap_values = df[lap_column].to_numpy() if lap_column in df.columns else np.zeros(len(df), dtype=np.int64)
+    order = np.argsort(lap_values, kind='stable')
+    lap_sorted = lap_values[order]
+    labels = np.asarray(labels)[order]
+    lap_start = np.concatenate(([True], lap_sorted[1:] != lap_sorted[:-1]))
+    group_starts = np.flatnonzero(lap_start)
+
+    # ラップまたはコーナーが切り替わる位置で区切った連続区間を、同じコーナーの短い途切れをまとめた通過にする
+    segment = np.cumsum(lap_start | np.concatenate(([False], labels[1:] != labels[:-1])))
+    starts, ends = find_runs(labels != STRAIGHT, groups=segment)
+    run_lap = np.searchsorted(group_starts, starts, side='right') - 1
+    starts, ends, corner_ids = _merge_runs(starts, ends, labels[starts], run_lap, max_gap, min_points)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=PASSAGE_COLUMNS)
+
+    n_rows = len(lap_sorted)
+    speed = df[SPEED_COL].to_numpy(dtype=np.float64, na_value=np.nan)[order] if SPEED_COL in df.columns else np.full(n_rows, np.nan)
+    g_lat = df[LATERAL_G_COL].to_numpy(dtype=np.float64, na_value=np.nan)[order] if LATERAL_G_COL in df.columns else np.full(n_rows, np.nan)
+    elapsed = _elapsed_column(df)
+    elapsed = elapsed[order] if elapsed is not None else np.arange(n_rows, dtype=np.float64) * sample_interval
+
+    # 通過ごとの区間番号（通過外の点は -1）
+    passage = np.full(n_rows, -1, dtype=np.int64)
+    lengths = ends - starts + 1
+    passage_rows = np.repeat(starts, lengths) + (np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+    passage[passage_rows] = np.repeat(np.arange(len(starts)), lengths)
+
+    # エイペックス: 通過ごとに速度の昇順で並べた先頭（速度が全て NaN なら通過の中央）
+    rows = np.flatnonzero(passage >= 0)
+    ranked = rows[np.lexsort((np.where(np.isnan(speed[rows]), np.inf, speed[rows]), passage[rows]))]
+    first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    apex = ranked[first]
+    no_speed = np.isnan(speed[apex])
+    apex[no_speed] = (starts[no_speed] + ends[no_speed]) // 2
+
+    # 横Gのピーク（通過区間は重ならないため、開始・終了+1 を交互に並べて reduceat）
+    bounds = np.column_stack((starts, ends + 1)).ravel()
+    if bounds[-1] == n_rows:
+        bounds = bounds[:-1]
+    peak_g = np.fmax.reduceat(np.abs(g_lat), bounds)[::2]
+
+    # ラップ開始からの経過時間（ラップごとの最小値を基準にする）
+    lap_index = np.searchsorted(group_starts, starts, side='right') - 1
+    with np.errstate(invalid='ignore'):
+        lap_t0 = np.fmin.reduceat(elapsed, group_starts)
+
+    offset = group_starts[lap_index]
+    passages = pd.DataFrame({
+        'Lap': lap_sorted[starts],
+        'Corner': np.array(circuit.corner_names, dtype=object)[corner_ids],
+        'CornerId': corner_ids,
+        'start_idx': starts - offset,
+        'apex_idx': apex - offset,
+        'end_idx': ends - offset,
+        'entry_speed': speed[starts],
+        'apex_speed': speed[apex],
+        'exit_speed': speed[ends],
+        'peak_g': peak_g,
+        'entry_time': elapsed[starts] - lap_t0[lap_index],
+        'duration': elapsed[ends] - elapsed[starts],
+    }, columns=PASSAGE_COLUMNS)
+
+    if one_per_lap:
+        # ラップ・コーナーごとに横Gのピーク、次に長さが最大の通過を残す（通過順は保つ）
+        rank = np.lexsort((-(ends - starts), -np.nan_to_num(peak_g, nan=-np.inf), corner_ids, lap_index))
+        key = np.column_stack((lap_index[rank], corner_ids[rank]))
+        first = np.concatenate(([True], (key[1:] != key[:-1]).any(axis=1)))
+        passages = passages.iloc[np.sort(rank[first])].reset_index(drop=True)
+    return passages
+
+
+def corner_summary(passages):
+    """コーナーごとの進入・エイペックス・脱出速度などの集計（全ラップの平均・最良）"""
+    if passages.empty:
+        return pd.DataFrame()
+    grouped = passages.groupby(['CornerId', 'Corner'], sort=True)
+    summary = grouped.agg(
+        passes=('Lap', 'size'),
+        entry_speed_mean=('entry_speed', 'mean'),
+        apex_speed_mean=('apex_speed', 'mean'),
+        apex_speed_max=('apex_speed', 'max'),
+        exit_speed_mean=('exit_speed', 'mean'),
+        exit_speed_max=('exit_speed', 'max'),
+        peak_g_mean=('peak_g', 'mean'),
+        duration_mean=('duration', 'mean'),
+        duration_min=('duration', 'min'),
+    )
+    return summary.reset_index(level='CornerId', drop=True)
+
+
+def passages_by_lap(passages):
+    """通過の一覧を {ラップ番号: {コーナー名: [通過, ...]}} にまとめる（ラップごとの参照用）"""
+    by_lap = {}
+    for record in passages.to_dict('records'):
+        by_lap.setdefault(record['Lap'], {}).setdefault(record['Corner'], []).append(record)
+    return by_lap
@@ -7,6 +7,15 @@ from datetime import datetime
 import os
 import json
 
+from session_cache import load_cached_frame
+from telemetry_io import read_telemetry, time_to_seconds, iter_laps
+from run_length import find_runs
+from analysis_export import save_compact_export
+from analysis_store import open_store, lap_content_hash, parameters_hash
+from lap_resample import lap_elapsed_time
+from sector_engine import crossing_matrix, sector_times
+from circuit_registry import Circuit, load_circuit
+
 # ディレクトリ内のCSVファイルを一覧表示する関数
 def list_csv_files(directory):
     csv_files = []
@@ -22,9 +31,9 @@ def list_csv_files(directory):
 # CSVファイルの読み込み
 def load_telemetry_data(file_path):
     try:
-        # セミコロン区切りCSVを読み込む
         print(f"ファイル '{file_path}' を読み込み中...")
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
+        # 形式を自動判定し、型指定付きで一度だけ解析する（空欄のLapは前方補完）
+        df = read_telemetry(file_path)
         
         # カラム名を確認
         print(f"読み込まれたカラム: {df.columns.tolist()}")
@@ -49,40 +58,32 @@ def load_telemetry_data(file_path):
 
 # データの前処理
 def preprocess_data(df):
-    # 時間フォーマットの変換（"mm:ss.SSS" → 秒）
-    def convert_time_to_seconds(time_str):
-        if pd.isna(time_str):
-            return np.nan
-        # 時間が ":" を含むかチェック
-        if ':' in str(time_str):
-            parts = str(time_str).split(':')
-            # "mm:ss.SSS" 形式の場合
-            if len(parts) == 2:
-                minutes = float(parts[0])
-                seconds = float(parts[1])
-                return minutes * 60 + seconds
-        # 既に数値の場合はそのまま返す
-        try:
-            return float(time_str)
-        except:
-            return np.nan
-    
     # Time Lapカラムを秒単位に変換
     if 'Time Lap' in df.columns:
-        df['Time Lap (sec)'] = df['Time Lap'].apply(convert_time_to_seconds)
+        # "mm:ss.SSS" / 秒 / 空欄 を列単位でまとめて変換
+        df['Time Lap (sec)'] = time_to_seconds(df['Time Lap'])
     
     # 数値データの型変換
     numeric_columns = ['RPM', 'Speed GPS', 'T1', 'T2', 'Gf. X', 'Gf. Y', 'Speed rear']
     for col in numeric_columns:
-        if col in df.columns:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors='coerce')
     
     # ラップ番号を整数に変換
-    if 'Lap' in df.columns:
+    if 'Lap' in df.columns and not pd.api.types.is_integer_dtype(df['Lap']):
         df['Lap'] = pd.to_numeric(df['Lap'], errors='coerce').fillna(0).astype(int)
     
     return df
 
+# 前処理済みデータの読み込み（セッションキャッシュがあればCSV解析を省略）
+def load_preprocessed_data(file_path, use_cache=True):
+    return load_cached_frame(
+        file_path,
+        lambda path: preprocess_data(load_telemetry_data(path)),
+        namespace='driving_analyze.preprocessed',
+        use_cache=use_cache
+    )
+
 # ラップごとのデータをグループ化
 def group_laps(df):
     laps = {}
@@ -93,22 +94,30 @@ def group_laps(df):
                 laps[lap_num] = lap_data.reset_index(drop=True)
     return laps
 
+# ラップタイムを取得（各ラップの最後のTime Lap値）
+def get_lap_time(lap_data):
+    if 'Time Lap (sec)' not in lap_data.columns:
+        return np.nan
+    valid_times = lap_data['Time Lap (sec)'].dropna()
+    return valid_times.iloc[-1] if not valid_times.empty else np.nan
+
 # ラップタイムを取得して分類
 def classify_laps(laps_dict):
     lap_times = {}
     for lap_num, lap_data in laps_dict.items():
-        # ラップタイムを取得（各ラップの最後のTime Lap値）
-        if 'Time Lap (sec)' in lap_data.columns and not lap_data['Time Lap (sec)'].empty:
-            last_valid_time = lap_data['Time Lap (sec)'].dropna().iloc[-1] if not lap_data['Time Lap (sec)'].dropna().empty else np.nan
-            if not np.isnan(last_valid_time):
-                lap_times[lap_num] = last_valid_time
+        last_valid_time = get_lap_time(lap_data)
+        if not np.isnan(last_valid_time):
+            lap_times[lap_num] = last_valid_time
     
+    return classify_lap_times(lap_times)
+
+# ラップタイムの辞書からラップを分類
+def classify_lap_times(lap_times):
     if not lap_times:
         return {}, np.nan, {}
     
     # ベストラップタイム
     best_lap_time = min(lap_times.values())
-    best_lap = [lap for lap, time in lap_times.items() if time == best_lap_time][0]
     
     # ラップ分類（条件に基づいて）
     lap_categories = {}
@@ -128,51 +137,174 @@ def classify_laps(laps_dict):
     
     return lap_times, best_lap_time, lap_categories
 
+# コーナー検出の閾値（G-Force Y [G]）と、開始・終了の判定に使う連続ポイント数
+CORNER_THRESHOLD = 0.1
+CORNER_CONSECUTIVE_POINTS = 2
+
+# コーナー区間の計算（配列全体を一括処理）
+def _corner_intervals(g_lat, threshold, consecutive_points, group_starts, group_ends):
+    """
+    |G-Force Y| が閾値を超える状態が consecutive_points 点続いたらコーナー開始、
+    閾値以下が consecutive_points 点続いたらその直前でコーナー終了とする。
+    グループ（ラップ）をまたぐ判定は行わない。
+    
+    Returns: (開始位置, 終了位置) の配列（いずれも g_lat 上の位置、終了は区間に含む）
+    """
+    n = len(g_lat)
+    k = consecutive_points
+    if n < k:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    # 各サンプルが属するグループ番号
+    group_id = np.repeat(np.arange(len(group_starts)), group_ends - group_starts + 1)
+    
+    # 窓 [i, i+k) がすべて閾値超え / すべて閾値以下か（NaNはどちらにも数えない）
+    abs_g = np.abs(g_lat)
+    above = np.lib.stride_tricks.sliding_window_view(abs_g > threshold, k).all(axis=1)
+    below = np.lib.stride_tricks.sliding_window_view(abs_g <= threshold, k).all(axis=1)
+    same_group = group_id[:n - k + 1] == group_id[k - 1:]
+    event = np.where(above & same_group, 1, np.where(below & same_group, -1, 0))
+    
+    # 開始(+1)/終了(-1)イベントのうち状態が切り替わるものだけを残す
+    ev_pos = np.flatnonzero(event)
+    ev_val = event[ev_pos]
+    ev_grp = group_id[ev_pos]
+    prev_val = np.concatenate(([-1], ev_val[:-1]))
+    new_group = np.concatenate(([True], ev_grp[1:] != ev_grp[:-1]))
+    prev_val[new_group] = -1  # 各グループの先頭はコーナー外から始まる
+    keep = ev_val != prev_val
+    ev_pos, ev_val, ev_grp = ev_pos[keep], ev_val[keep], ev_grp[keep]
+    
+    # 開始イベントの次のイベント（同じグループ内なら終了イベント）で区間を閉じる
+    start_mask = ev_val == 1
+    starts = ev_pos[start_mask]
+    next_idx = np.flatnonzero(start_mask) + 1
+    has_end = next_idx < len(ev_pos)
+    has_end[has_end] = ev_grp[next_idx[has_end]] == ev_grp[start_mask][has_end]
+    ends = group_ends[ev_grp[start_mask]].copy()
+    ends[has_end] = ev_pos[next_idx[has_end]] - 1
+    
+    return starts, ends
+
+# 区間ごとの平均・ピーク横Gを計算
+def _corner_statistics(g_lat, starts, ends):
+    if len(starts) == 0:
+        return np.empty(0), np.empty(0)
+    valid = ~np.isnan(g_lat)
+    g_sum = np.concatenate(([0.0], np.cumsum(np.where(valid, g_lat, 0), dtype=np.float64)))
+    g_cnt = np.concatenate(([0], np.cumsum(valid)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_g = (g_sum[ends + 1] - g_sum[starts]) / (g_cnt[ends + 1] - g_cnt[starts])
+    
+    # コーナー区間同士は重ならないため、開始・終了+1 を交互に並べて reduceat で区間ごとの最大値を取る
+    bounds = np.column_stack((starts, ends + 1)).ravel()
+    if bounds[-1] == len(g_lat):
+        bounds = bounds[:-1]
+    peak_g = np.fmax.reduceat(np.abs(g_lat), bounds)[::2].astype(np.float64)
+    return mean_g, peak_g
+
+# G-Force Y を比較用の配列として取得（閾値判定は元のデータ型のまま行う）
+def _lateral_g(data):
+    g_lat = data['Gf. Y'].to_numpy()
+    if not np.issubdtype(g_lat.dtype, np.floating):
+        g_lat = data['Gf. Y'].to_numpy(dtype=np.float64, na_value=np.nan)
+    return g_lat
+
 # コーナー検出（G-Force Yに基づく）
-def detect_corners(lap_data):
-    corners = []
-    in_corner = False
-    corner_start_idx = None
-    threshold = 0.1  # コーナー検出の閾値
-    consecutive_points = 2  # 連続するポイント数の閾値
-    
+def detect_corners(lap_data, threshold=CORNER_THRESHOLD, consecutive_points=CORNER_CONSECUTIVE_POINTS):
+    """
+    1ラップ分のコーナーを検出する。
+    各コーナーはラップ内のインデックス範囲 start_idx〜end_idx（両端含む）、
+    方向（平均横Gが正なら right）とピーク横Gで表す。
+    """
     if 'Gf. Y' not in lap_data.columns:
         return []
     
-    # 連続したポイントでG-Force Yの閾値を確認
-    for i in range(len(lap_data) - consecutive_points + 1):
-        g_forces = lap_data['Gf. Y'].iloc[i:i+consecutive_points].abs()
-        
-        if not in_corner and all(g_forces > threshold):
-            # コーナー開始を検出
-            in_corner = True
-            corner_start_idx = i
-        elif in_corner and all(g_forces <= threshold):
-            # コーナー終了を検出
-            in_corner = False
-            if corner_start_idx is not None:
-                corner_type = 'right' if lap_data['Gf. Y'].iloc[corner_start_idx:i].mean() > 0 else 'left'
-                corners.append({
-                    'start_idx': corner_start_idx,
-                    'end_idx': i - 1,
-                    'type': corner_type,
-                    'data': lap_data.iloc[corner_start_idx:i]
-                })
-    
-    # 最後のコーナーが検出中だった場合
-    if in_corner and corner_start_idx is not None:
-        corner_type = 'right' if lap_data['Gf. Y'].iloc[corner_start_idx:].mean() > 0 else 'left'
-        corners.append({
-            'start_idx': corner_start_idx,
-            'end_idx': len(lap_data) - 1,
+    g_lat = _lateral_g(lap_data)
+    starts, ends = _corner_intervals(
+        g_lat, threshold, consecutive_points,
+        np.array([0]), np.array([len(g_lat) - 1])
+    )
+    mean_g, peak_g = _corner_statistics(g_lat, starts, ends)
+    
+    return [
+        {
+            'start_idx': int(start),
+            'end_idx': int(end),
+            'type': 'right' if mean > 0 else 'left',
+            'peak_g': float(peak)
+        }
+        for start, end, mean, peak in zip(starts, ends, mean_g, peak_g)
+    ]
+
+# 全ラップのコーナーを一括検出（セッション・シーズン単位のバッチ処理用）
+def detect_corners_batch(df, threshold=CORNER_THRESHOLD, consecutive_points=CORNER_CONSECUTIVE_POINTS,
+                         lap_column='Lap'):
+    """
+    データ全体のコーナーをラップごとに一括検出し、配列（DataFrame）で返す。
+    start_idx / end_idx はラップ内のインデックス（group_laps の各ラップと同じ位置）。
+    
+    Returns: 'Lap', 'start_idx', 'end_idx', 'type', 'mean_g', 'peak_g' を持つ DataFrame
+    """
+    columns = ['Lap', 'start_idx', 'end_idx', 'type', 'mean_g', 'peak_g']
+    if 'Gf. Y' not in df.columns or lap_column not in df.columns or df.empty:
+        return pd.DataFrame(columns=columns)
+    
+    # ラップ番号で安定ソートし、各ラップを連続した区間にする
+    lap_values = df[lap_column].to_numpy()
+    order = np.argsort(lap_values, kind='stable')
+    lap_sorted = lap_values[order]
+    g_lat = _lateral_g(df)[order]
+    
+    group_starts = np.flatnonzero(np.concatenate(([True], lap_sorted[1:] != lap_sorted[:-1])))
+    group_ends = np.append(group_starts[1:] - 1, len(lap_sorted) - 1)
+    
+    starts, ends = _corner_intervals(g_lat, threshold, consecutive_points, group_starts, group_ends)
+    mean_g, peak_g = _corner_statistics(g_lat, starts, ends)
+    
+    # ラップ内の位置に変換
+    offset = group_starts[np.searchsorted(group_starts, starts, side='right') - 1]
+    return pd.DataFrame({
+        'Lap': lap_sorted[starts],
+        'start_idx': starts - offset,
+        'end_idx': ends - offset,
+        'type': np.where(mean_g > 0, 'right', 'left'),
+        'mean_g': mean_g,
+        'peak_g': peak_g
+    }, columns=columns)
+
+# 一括検出結果をラップごとのコーナーリスト（detect_corners と同じ形式）に変換
+def corner_records_by_lap(corners_df):
+    corners_by_lap = {}
+    for lap, start, end, corner_type, peak in zip(
+        corners_df['Lap'].tolist(), corners_df['start_idx'].tolist(), corners_df['end_idx'].tolist(),
+        corners_df['type'].tolist(), corners_df['peak_g'].tolist()
+    ):
+        corners_by_lap.setdefault(lap, []).append({
+            'start_idx': start,
+            'end_idx': end,
             'type': corner_type,
-            'data': lap_data.iloc[corner_start_idx:]
+            'peak_g': peak
         })
-    
-    return corners
+    return corners_by_lap
+
+# 操作検出の閾値（G-Force X [G]）と最小連続ポイント数
+OPERATION_THRESHOLDS = {
+    'braking_gx': -0.2,            # ブレーキング: G-Force X がこれ未満
+    'strong_accel_gx': 0.15,       # 強アクセル: G-Force X がこれより大きく RPM上昇
+    'partial_accel_gx': 0.03,      # 部分アクセル: G-Force X がこれより大きく強アクセル未満、RPM維持または微増
+    'braking_min_points': 2,
+    'strong_accel_min_points': 1,
+    'partial_accel_min_points': 1,
+}
 
 # ブレーキング・アクセル操作の検出
-def detect_operations(lap_data):
+def detect_operations(lap_data, thresholds=None):
+    """
+    条件を満たすサンプルのマスクを作り、連続区間（ラン）に変換して操作を検出する。
+    各操作はラップ内のインデックス範囲 start_idx〜end_idx（両端含む）で表す。
+    """
+    t = dict(OPERATION_THRESHOLDS, **(thresholds or {}))
     operations = {
         'braking': [],
         'strong_accel': [],
@@ -182,56 +314,35 @@ def detect_operations(lap_data):
     if 'Gf. X' not in lap_data.columns or 'RPM' not in lap_data.columns:
         return operations
     
-    # ブレーキング検出: G-Force X < -0.25 が連続2点以上
-    in_braking = False
-    braking_start_idx = None
-    
-    for i in range(len(lap_data) - 1):
-        if not in_braking and lap_data['Gf. X'].iloc[i] < -0.2 and lap_data['Gf. X'].iloc[i+1] < -0.2:
-            in_braking = True
-            braking_start_idx = i
-        elif in_braking and lap_data['Gf. X'].iloc[i] >= -0.2:
-            in_braking = False
-            if braking_start_idx is not None:
-                operations['braking'].append({
-                    'start_idx': braking_start_idx,
-                    'end_idx': i - 1,
-                    'data': lap_data.iloc[braking_start_idx:i]
-                })
-    
-    # 最後のブレーキングが検出中だった場合
-    if in_braking and braking_start_idx is not None:
-        operations['braking'].append({
-            'start_idx': braking_start_idx,
-            'end_idx': len(lap_data) - 1,
-            'data': lap_data.iloc[braking_start_idx:]
-        })
+    # 閾値との比較はデータの型（float32など）のまま行う
+    gx = lap_data['Gf. X'].to_numpy()
+    rpm = lap_data['RPM'].to_numpy()
+    
+    # 次のポイントとのRPM差（最後のポイントは比較対象が無いので判定しない）
+    rpm_next = np.append(rpm[1:], np.nan)
+    
+    masks = {
+        'braking': gx < t['braking_gx'],
+        'strong_accel': (gx > t['strong_accel_gx']) & (rpm_next > rpm),
+        'partial_accel': (gx > t['partial_accel_gx']) & (gx < t['strong_accel_gx']) & (rpm_next >= rpm),
+    }
     
-    # 強アクセル検出: G-Force X > 0.2 かつ RPM上昇率 > 0
-    for i in range(len(lap_data) - 1):
-        if lap_data['Gf. X'].iloc[i] > 0.15 and lap_data['RPM'].iloc[i+1] > lap_data['RPM'].iloc[i]:
-            operations['strong_accel'].append({
-                'idx': i,
-                'data': lap_data.iloc[i:i+2]
-            })
-    
-    # 部分アクセル検出: 0.05 < G-Force X < 0.2 かつ RPM維持または微増
-    for i in range(len(lap_data) - 1):
-        if 0.03 < lap_data['Gf. X'].iloc[i] < 0.15 and lap_data['RPM'].iloc[i+1] >= lap_data['RPM'].iloc[i]:
-            operations['partial_accel'].append({
-                'idx': i,
-                'data': lap_data.iloc[i:i+2]
-            })
+    for name, mask in masks.items():
+        starts, ends = find_runs(mask, min_length=t[f'{name}_min_points'])
+        operations[name] = [
+            {'start_idx': int(start), 'end_idx': int(end)}
+            for start, end in zip(starts, ends)
+        ]
     
     return operations
 
 # メイン処理関数
-def analyze_driving_characteristics(file_path):
-    print("ファイル読み込み中...")
-    df = load_telemetry_data(file_path)
-    
-    print("データ前処理中...")
-    df = preprocess_data(df)
+def analyze_driving_characteristics(file_path, use_cache=True, streaming=False, chunksize=50000):
+    if streaming:
+        return analyze_driving_characteristics_streaming(file_path, chunksize=chunksize)
+
+    print("ファイル読み込み・データ前処理中...")
+    df = load_preprocessed_data(file_path, use_cache=use_cache)
     
     print("ラップデータ処理中...")
     laps = group_laps(df)
@@ -242,6 +353,7 @@ def analyze_driving_characteristics(file_path):
     results = {
         'dataframe': df,
         'laps': laps,
+        'lap_count': len(laps),
         'lap_times': lap_times,
         'best_lap_time': best_lap_time,
         'lap_categories': lap_categories,
@@ -249,20 +361,196 @@ def analyze_driving_characteristics(file_path):
         'operations': {}
     }
     
+    print("コーナー検出中...")
+    corners_by_lap = corner_records_by_lap(detect_corners_batch(df))
+    
     print("各ラップの特性分析中...")
     for lap_num, lap_data in laps.items():
         print(f"ラップ {lap_num} の分析中...")
+        results['corners'][lap_num] = corners_by_lap.get(lap_num, [])
+        results['operations'][lap_num] = detect_operations(lap_data)
+    
+    return results
+
+# ラップ単位の分析処理のバージョン（検出ロジックを変えたら上げる。保存済みの結果は再計算される）
+LAP_ANALYSIS_VERSION = 1
+
+# 分析パラメータ一式（インクリメンタル分析で結果の再利用可否の判定に使う）
+def analysis_parameters(sector_gates=None):
+    return {
+        'version': LAP_ANALYSIS_VERSION,
+        'corner_threshold': CORNER_THRESHOLD,
+        'corner_consecutive_points': CORNER_CONSECUTIVE_POINTS,
+        'operation_thresholds': OPERATION_THRESHOLDS,
+        'sector_gates': sector_gates,
+    }
+
+# セクタータイムの計算
+def lap_sector_times(lap_data, circuit, lap_time=None):
+    """
+    ゲート通過時刻（ラップ開始からの経過秒、線形補間）とセクタータイムを返す。
+    circuit は circuit_registry.Circuit（ゲートのローカル座標・直線の係数は読み込み時に計算済みのものを使う）。
+    セクタータイムは sector_engine.sector_times（周回コース）と同じで、最終セクター
+    （最後のゲート → 最初のゲート）はラップタイムから求める（ゲート数と同じ数のセクター）。
+    ラップ内で通過しなかったゲートの時刻は None、全ゲートを順に通過していないラップのセクターは None。
+    """
+    x, y = circuit.to_xy(lap_data['Lat.'], lap_data['Lon.'])
+    crossings = circuit.find_gate_crossings(x, y, lap_elapsed_time(lap_data))
+    gate_times = crossing_matrix(crossings, np.zeros(1), len(circuit.gates_xy))
+    sectors = sector_times(gate_times, [np.nan if lap_time is None else lap_time], closed=True)
+    
+    to_list = lambda values: [None if np.isnan(v) else float(v) for v in values]
+    return {'gate_times': to_list(gate_times[0]), 'sectors': to_list(sectors[0])}
+
+# 1ラップ分の分析（インクリメンタル分析で保存する単位）
+def analyze_lap(lap_data, circuit=None):
+    lap_time = get_lap_time(lap_data)
+    lap_time = None if pd.isna(lap_time) else float(lap_time)
+    return {
+        'row_count': len(lap_data),
+        'lap_time': lap_time,
+        'corners': detect_corners(lap_data),
+        'operations': detect_operations(lap_data),
+        'sectors': lap_sector_times(lap_data, circuit, lap_time) if circuit is not None and circuit.gates else None,
+    }
+
+# インクリメンタル分析（内容が変わったラップ・パラメータが変わった場合だけ再計算）
+def analyze_driving_characteristics_incremental(file_path, sector_gates=None, store_path=None, use_cache=True,
+                                                 circuit=None):
+    """
+    ラップごとの生データと分析パラメータのハッシュをキーに、結果をローカルストアに保存する。
+    同じファイルを繰り返し読み込む場合（走行中に伸びていくロガーファイルなど）は、
+    新しいラップと内容が変わったラップだけを分析する。
+    circuit（サーキット名・定義ファイルのパスまたは読み込み済みの Circuit）を指定すると、
+    登録済みのゲートでセクタータイムを計算する。sector_gates（緯度経度のゲート）を直接渡してもよい。
+    """
+    if isinstance(circuit, str):
+        circuit = load_circuit(circuit)
+    elif circuit is None and sector_gates is not None:
+        circuit = Circuit.from_sector_gates(sector_gates)
+    sector_gates = circuit.sector_gates() if circuit is not None else None
+    df = load_preprocessed_data(file_path, use_cache=use_cache)
+    laps = group_laps(df)
+    params_hash = parameters_hash(analysis_parameters(sector_gates))
+    session = os.path.abspath(file_path)
+    
+    results = {
+        'dataframe': df,
+        'laps': laps,
+        'lap_count': len(laps),
+        'lap_times': {},
+        'best_lap_time': np.nan,
+        'lap_categories': {},
+        'corners': {},
+        'operations': {},
+        'sectors': {},
+        'recomputed_laps': []
+    }
+    
+    with open_store(file_path, store_path) as store:
+        stored = store.get_lap_results(session)
+        updated = []
+        for lap_num, lap_data in laps.items():
+            lap_hash = lap_content_hash(lap_data)
+            record = stored.get(int(lap_num))
+            if record is None or record['lap_hash'] != lap_hash or record['params_hash'] != params_hash:
+                print(f"ラップ {lap_num} の分析中...")
+                record = analyze_lap(lap_data, circuit)
+                record.update({'lap': lap_num, 'lap_hash': lap_hash, 'params_hash': params_hash})
+                updated.append(record)
+                results['recomputed_laps'].append(lap_num)
+            
+            if record['lap_time'] is not None:
+                results['lap_times'][lap_num] = record['lap_time']
+            results['corners'][lap_num] = record['corners']
+            results['operations'][lap_num] = record['operations']
+            results['sectors'][lap_num] = record['sectors']
+        
+        store.put_lap_results(session, updated)
+        store.remove_other_laps(session, laps.keys())
+        
+        print(f"再計算したラップ: {len(results['recomputed_laps'])} / {len(laps)}")
+        lap_times, best_lap_time, lap_categories = classify_lap_times(results['lap_times'])
+        results['best_lap_time'] = best_lap_time
+        results['lap_categories'] = lap_categories
+        store.publish_lap_categories(session, lap_categories, best_lap_time, len(laps))
+    
+    return results
+
+# ラップタイム・分類をストアに保存（driving_analyze2 の比較分析はここから分類を読み込む）
+def publish_lap_categories(results, file_path, store_path=None):
+    with open_store(file_path, store_path) as store:
+        store.publish_lap_categories(
+            os.path.abspath(file_path),
+            results['lap_categories'],
+            results['best_lap_time'],
+            results['lap_count']
+        )
+
+# ストリーミング処理（ラップ単位で読み込み・分析し、ラップデータは保持しない）
+def analyze_driving_characteristics_streaming(file_path, chunksize=50000):
+    print(f"ファイル '{file_path}' をストリーミング読み込み中...")
+    
+    results = {
+        'dataframe': None,
+        'laps': {},
+        'lap_count': 0,
+        'lap_times': {},
+        'best_lap_time': np.nan,
+        'lap_categories': {},
+        'corners': {},
+        'operations': {}
+    }
+    
+    for lap_num, lap_data in iter_laps(file_path, chunksize=chunksize):
+        if lap_num <= 0:  # ラップ0は除外（アウトラップなど）
+            continue
+        print(f"ラップ {lap_num} の分析中...")
+        lap_data = preprocess_data(lap_data)
+        results['lap_count'] += 1
+        
+        lap_time = get_lap_time(lap_data)
+        if not np.isnan(lap_time):
+            results['lap_times'][lap_num] = lap_time
+        
         results['corners'][lap_num] = detect_corners(lap_data)
         results['operations'][lap_num] = detect_operations(lap_data)
     
+    print("ラップ分類中...")
+    lap_times, best_lap_time, lap_categories = classify_lap_times(results['lap_times'])
+    results['best_lap_time'] = best_lap_time
+    results['lap_categories'] = lap_categories
+    
     return results
 
 
+# ラップ内のインデックス範囲（両端含む）のデータをレコード形式で取り出す
+def _lap_slice_records(results, lap, start_idx, end_idx):
+    lap_data = results['laps'].get(lap)
+    if lap_data is None:
+        # ストリーミング処理ではラップデータを保持しない
+        return []
+    return lap_data.iloc[start_idx:end_idx + 1].to_dict(orient='records')
+
 # 分析結果をJSONとして保存
-def save_results_to_json(results, output_path):
+# compact=True では各チャンネルを一度だけ列として保存し、ラップ・コーナー・操作は行範囲で参照する
+# （binary=True で数値カラムを同名の .bin ファイルに型付きで書き出す）。
+# compact=False は従来のレコード形式（同じデータをラップ・区間ごとに重複して出力）
+# 保存に失敗した場合は例外を送出する（バッチ分析でそのファイルを失敗として記録するため）
+def save_results_to_json(results, output_path, compact=True, binary=False):
+    if compact:
+        try:
+            save_compact_export(results, output_path, binary=binary)
+            print(f"✅ JSON形式で保存されました: {output_path}")
+        except Exception as e:
+            print(f"❌ JSON保存中にエラーが発生しました: {e}")
+            raise
+        return
+    
     try:
         export_data = {
-            "dataframe": results['dataframe'].to_dict(orient='records'),
+            # ストリーミング処理ではデータ全体を保持しないため空になる
+            "dataframe": results['dataframe'].to_dict(orient='records') if results['dataframe'] is not None else [],
             "laps": {
                 lap_num: df.to_dict(orient='records')
                 for lap_num, df in results['laps'].items()
@@ -276,31 +564,19 @@ def save_results_to_json(results, output_path):
                         "start_idx": c["start_idx"],
                         "end_idx": c["end_idx"],
                         "type": c["type"],
-                        "data": c["data"].to_dict(orient='records')
+                        "data": _lap_slice_records(results, lap, c["start_idx"], c["end_idx"])
                     } for c in corners
                 ] for lap, corners in results.get("corners", {}).items()
             },
             "operations": {
                 lap: {
-                    "braking": [
+                    name: [
                         {
                             "start_idx": op["start_idx"],
                             "end_idx": op["end_idx"],
-                            "data": op["data"].to_dict(orient='records')
-                        } for op in ops["braking"]
-                    ],
-                    "strong_accel": [
-                        {
-                            "idx": op["idx"],
-                            "data": op["data"].to_dict(orient='records')
-                        } for op in ops["strong_accel"]
-                    ],
-                    "partial_accel": [
-                        {
-                            "idx": op["idx"],
-                            "data": op["data"].to_dict(orient='records')
-                        } for op in ops["partial_accel"]
-                    ]
+                            "data": _lap_slice_records(results, lap, op["start_idx"], op["end_idx"])
+                        } for op in events
+                    ] for name, events in ops.items()
                 } for lap, ops in results.get("operations", {}).items()
             }
         }
@@ -312,14 +588,25 @@ def save_results_to_json(results, output_path):
 
     except Exception as e:
         print(f"❌ JSON保存中にエラーが発生しました: {e}")
+        raise
+
 
+# 分析結果（JSON）とレポート（テキスト）の出力パスを返す
+def result_output_paths(file_path, output_dir=None):
+    if output_dir is None:
+        output_dir = os.path.dirname(file_path)
+    name = os.path.basename(file_path).split('.')[0]
+    return (
+        os.path.join(output_dir, f"analysis_data_{name}.json"),
+        os.path.join(output_dir, f"analysis_report_{name}.txt")
+    )
 
 # 分析レポートをファイルに保存
 def save_analysis_report(results, output_file):
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("=== カートレーシングテレメトリー分析レポート ===\n\n")
         f.write(f"分析日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"総ラップ数: {len(results['laps'])}\n")
+        f.write(f"総ラップ数: {results['lap_count']}\n")
         f.write(f"ベストラップタイム: {results['best_lap_time']:.3f}秒\n\n")
         
         # カテゴリ別のラップ数
@@ -377,7 +664,7 @@ if __name__ == "__main__":
         
         # 分析結果のサマリー表示
         print("\n=== 分析結果サマリー ===")
-        print(f"総ラップ数: {len(results['laps'])}")
+        print(f"総ラップ数: {results['lap_count']}")
         print(f"ベストラップタイム: {results['best_lap_time']:.3f}秒")
         
         # カテゴリ別のラップ数
@@ -398,17 +685,16 @@ if __name__ == "__main__":
                 selected_laps.append(category_laps[0])
         
         # JSONファイルとして保存
-        json_output_path = os.path.join(
-            os.path.dirname(file_path), 
-            f"analysis_data_{os.path.basename(file_path).split('.')[0]}.json"
-        )
+        json_output_path, output_file = result_output_paths(file_path)
         save_results_to_json(results, json_output_path)
 
         
         # 分析レポートを保存
-        output_file = os.path.join(os.path.dirname(file_path), f"analysis_report_{os.path.basename(file_path).split('.')[0]}.txt")
         save_analysis_report(results, output_file)
         
+        # ラップ分類をストアに保存
+        publish_lap_categories(results, file_path)
+        
     except Exception as e:
         print(f"エラーが発生しました: {e}")
         import traceback
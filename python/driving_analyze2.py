@@ -2,20 +2,34 @@ import pandas as pd
 import numpy as np
 import os
 import json
-from datetime import datetime
 
-def compare_success_vs_average(results_file, data_dir, output_dir=None):
+from lap_resample import LapResampler
+from track_model import TrackModel
+from analysis_store import open_store
+# 読み込み・前処理・ラップ分割は driving_analyze と共通（前処理キャッシュも共有する）
+from driving_analyze import classify_laps, load_preprocessed_data, group_laps
+
+def compare_success_vs_average(data_file, output_dir=None,
+                               align='distance', grid_step=0.5, store_path=None, circuit=None):
     """
     成功ラップ(ラップ5)とアベレージラップの比較分析を行う関数（数値処理のみ）
     
     Parameters:
     -----------
-    results_file : str
-        分析結果レポートファイルのパス
-    data_dir : str
-        元データファイルが格納されているディレクトリパス
+    data_file : str
+        元データ（CSV）ファイルのパス
     output_dir : str, optional
-        出力ファイルを保存するディレクトリパス。指定がなければdata_dirと同じ
+        出力ファイルを保存するディレクトリパス。指定がなければ元データと同じディレクトリ
+    align : str
+        'distance' なら両ラップを累積距離グリッドに揃えて比較、
+        'index' なら従来通りサンプル番号で比較
+    grid_step : float
+        距離グリッドの間隔 [m]
+    store_path : str, optional
+        ラップ分類を保存しているストアのパス。指定がなければ元データと同じ場所の既定のストア
+    circuit : str, optional
+        サーキット名またはコース中心線ファイルのパス。指定すると align='distance' の距離に
+        コース中心線上の距離（track_model.TrackModel への投影）を使う
         
     Returns:
     --------
@@ -23,14 +37,14 @@ def compare_success_vs_average(results_file, data_dir, output_dir=None):
         比較分析結果を含む辞書
     """
     if output_dir is None:
-        output_dir = data_dir
+        output_dir = os.path.dirname(data_file)
     
-    # 結果ファイルから分類情報を読み込む
-    lap_categories = parse_analysis_report(results_file)
+    # 前処理済みデータ（driving_analyze と共有のキャッシュ）を読み込み、ラップごとにグループ化
+    df = load_preprocessed_data(data_file)
+    laps = group_laps(df)
     
-    # 成功ラップとアベレージラップを特定
-    success_laps = [lap for lap, info in lap_categories.items() if info['category'] == 'success']
-    average_laps = [lap for lap, info in lap_categories.items() if info['category'] == 'average']
+    # ストアからラップ分類を取得
+    lap_categories, success_laps, average_laps = load_lap_categories(data_file, laps, store_path)
     
     if not success_laps:
         print("成功ラップが見つかりません。")
@@ -40,33 +54,44 @@ def compare_success_vs_average(results_file, data_dir, output_dir=None):
         print("アベレージラップが見つかりません。")
         return None
     
-    # データファイルを特定し読み込む
-    csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
-    if not csv_files:
-        print(f"指定ディレクトリ '{data_dir}' にCSVファイルがありません。")
-        return None
-    
-    # 最初のCSVファイルを使用
-    data_file = os.path.join(data_dir, csv_files[0])
-    df = load_telemetry_data(data_file)
-    df = preprocess_data(df)
-    
-    # ラップごとのデータをグループ化
-    laps = group_laps(df)
-    
     # 成功ラップを取得（ラップ5を優先）
     success_lap = 5 if 5 in success_laps else success_laps[0]
     
-    # アベレージラップのうち最速のものを選択
-    best_average_lap = min(average_laps, key=lambda lap: lap_categories[lap]['time'])
+    # アベレージラップのうち最速のもの（タイム順に取得済み）を選択
+    best_average_lap = average_laps[0]
+    
+    # 比較に使うデータ（距離グリッドに揃える場合はラップごとに一度だけリサンプリング）
+    if align == 'distance':
+        track = TrackModel.load(circuit) if circuit is not None else None
+        resampler = LapResampler(step=grid_step, track=track)
+        success_data = resampler.get(laps[success_lap])
+        average_data = resampler.get(laps[best_average_lap])
+    else:
+        success_data = laps[success_lap]
+        average_data = laps[best_average_lap]
     
     # 比較分析を実行
     comparison_results = process_lap_comparison(
-        laps[success_lap], laps[best_average_lap], 
+        success_data, average_data, 
         success_lap, best_average_lap, 
         lap_categories[success_lap]['time'], 
         lap_categories[best_average_lap]['time']
     )
+    comparison_results['alignment'] = {
+        'mode': align,
+        'grid_step_m': grid_step if align == 'distance' else None,
+        'circuit': circuit if align == 'distance' else None
+    }
+    
+    # 走行距離に沿ったデルタタイム（アベレージラップ − 成功ラップ、正ならアベレージラップのロス）
+    if align == 'distance':
+        # コース中心線の距離では両ラップの全長が揃うため、全長の伸縮は行わない
+        delta = resampler.delta_time(laps[best_average_lap], laps[success_lap], normalize=track is None)
+        comparison_results['delta_time'] = {
+            'reference_lap': success_lap,
+            'distance': delta['Distance'].tolist(),
+            'delta': [None if np.isnan(v) else v for v in delta['Delta'].tolist()]
+        }
     
     # 有意な差分ポイントの詳細分析
     comparison_results['difference_analysis'] = analyze_difference_points(comparison_results)
@@ -86,220 +111,149 @@ def compare_success_vs_average(results_file, data_dir, output_dir=None):
     return comparison_results
 
 
-def parse_analysis_report(file_path):
-    """分析レポートファイルからラップ分類情報を抽出する関数"""
-    lap_categories = {}
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        # ラップ詳細セクションを探す
-        lap_detail_section = False
-        for line in lines:
-            if "=== ラップ詳細 ===" in line:
-                lap_detail_section = True
-                continue
-            
-            if lap_detail_section and line.strip():
-                # ラップ情報を解析: "ラップ 5: 33.510秒 (success), ベストとの差: +0.000秒"
-                if line.startswith("ラップ"):
-                    parts = line.strip().split(", ")
-                    first_part = parts[0].split(": ")
-                    lap_num = int(first_part[0].replace("ラップ ", ""))
-                    lap_time = float(first_part[1].replace("秒", ""))
-                    
-                    # カテゴリ抽出 (success, average, miss)
-                    category_part = parts[0].split("(")[1].split(")")[0]
-                    
-                    # ベストラップとの差分
-                    diff_part = parts[1].split(": ")[1]
-                    diff_time = float(diff_part.replace("+", "").replace("秒", ""))
-                    
-                    lap_categories[lap_num] = {
-                        'time': lap_time,
-                        'category': category_part,
-                        'diff_from_best': diff_time
-                    }
+def load_lap_categories(data_file, laps, store_path=None):
+    """ストアからラップ分類を読み込む関数
+
+    driving_analyze が保存した分類が現在のファイル内容に対応していない場合
+    （未分析・ファイル更新後）は、読み込み済みのラップから分類し直して保存する。
+
+    Returns:
+    --------
+    tuple
+        (全ラップの分類, 成功ラップ番号のリスト（番号順）, アベレージラップ番号のリスト（タイム順）)
+    """
+    session = os.path.abspath(data_file)
+    with open_store(data_file, store_path) as store:
+        if not store.is_session_current(session):
+            print("保存済みのラップ分類がないため、ラップを分類します...")
+            _, best_lap_time, lap_categories = classify_laps(laps)
+            store.publish_lap_categories(session, lap_categories, best_lap_time, len(laps))
         
-        return lap_categories
+        lap_categories = store.get_lap_categories(session)
+        success_laps = sorted(store.get_lap_categories(session, 'success'))
+        average_laps = list(store.get_lap_categories(session, 'average'))
     
-    except Exception as e:
-        print(f"分析レポートの解析中にエラーが発生しました: {e}")
-        return {}
+    return lap_categories, success_laps, average_laps
 
 
-def load_telemetry_data(file_path):
-    """CSVファイルを読み込む関数"""
-    try:
-        print(f"ファイル '{file_path}' を読み込み中...")
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        print(f"データサイズ: {df.shape[0]} 行 x {df.shape[1]} 列")
-        df.columns = [col.strip() for col in df.columns]
-        return df
-    except Exception as e:
-        print(f"ファイル読み込み中にエラーが発生しました: {e}")
-        raise
-
-
-def preprocess_data(df):
-    """データの前処理を行う関数"""
-    # 時間フォーマットの変換（"mm:ss.SSS" → 秒）
-    def convert_time_to_seconds(time_str):
-        if pd.isna(time_str):
-            return np.nan
-        if ':' in str(time_str):
-            parts = str(time_str).split(':')
-            if len(parts) == 2:
-                minutes = float(parts[0])
-                seconds = float(parts[1])
-                return minutes * 60 + seconds
-        try:
-            return float(time_str)
-        except:
-            return np.nan
-    
-    # Time Lapカラムを秒単位に変換
-    if 'Time Lap' in df.columns:
-        df['Time Lap (sec)'] = df['Time Lap'].apply(convert_time_to_seconds)
-    
-    # 数値データの型変換
-    numeric_columns = ['RPM', 'Speed GPS', 'T1', 'T2', 'Gf. X', 'Gf. Y', 'Speed rear']
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # ラップ番号を整数に変換
-    if 'Lap' in df.columns:
-        df['Lap'] = pd.to_numeric(df['Lap'], errors='coerce').fillna(0).astype(int)
-    
-    return df
-
-
-def group_laps(df):
-    """ラップごとのデータをグループ化する関数"""
-    laps = {}
-    if 'Lap' in df.columns:
-        lap_groups = df.groupby('Lap')
-        for lap_num, lap_data in lap_groups:
-            if lap_num > 0:  # ラップ0は除外（アウトラップなど）
-                laps[lap_num] = lap_data.reset_index(drop=True)
-    return laps
+# 比較対象のチャンネル（出力キー名, 元データのカラム名）
+COMPARISON_CHANNELS = [
+    ('speed', 'Speed GPS'),
+    ('rpm', 'RPM'),
+    ('gfx', 'Gf. X'),
+    ('gfy', 'Gf. Y'),
+]
+
+# 差分リストのキー名（comparison_results 内）
+DIFF_KEYS = {
+    'speed': 'speed_diff',
+    'rpm': 'rpm_diff',
+    'gfx': 'gforce_x_diff',
+    'gfy': 'gforce_y_diff',
+}
+
+
+def extract_comparison_channels(lap_data):
+    """比較に使うチャンネルをfloat64のNumPy配列として取り出す関数
+
+    同じラップを何度も比較する場合（全ラップ組み合わせなど）は、
+    この結果を process_lap_comparison にそのまま渡すことで抽出を1回に抑えられる。
+    """
+    if isinstance(lap_data, dict):
+        return lap_data
+    return {
+        key: lap_data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        for key, col in COMPARISON_CHANNELS
+    }
+
+
+def _channel_statistics(diff, success_values, average_values, use_abs=False):
+    """差分配列と各ラップの値から基本統計量を計算する"""
+    if use_abs:
+        success_values = np.abs(success_values)
+        average_values = np.abs(average_values)
+    return {
+        'mean_diff': float(np.mean(diff)),
+        'std_diff': float(np.std(diff)),
+        'max_diff': float(np.max(diff)),
+        'min_diff': float(np.min(diff)),
+        # pandasのmean/maxと同じくNaNは無視する
+        'success_mean': float(np.nanmean(success_values)),
+        'average_mean': float(np.nanmean(average_values)),
+        'success_max': float(np.nanmax(success_values)),
+        'average_max': float(np.nanmax(average_values))
+    }
 
 
 def process_lap_comparison(success_data, average_data, success_lap_num, average_lap_num, 
                            success_time, average_time):
-    """ラップデータを比較する関数（数値処理のみ）"""
+    """ラップデータを比較する関数（数値処理のみ）
+
+    全チャンネルの差分・有意差マスクをNumPy配列で一括計算する。
+    lap_resample の距離グリッドを渡すと、インデックス i は両ラップで
+    同じ走行距離（i × グリッド間隔）を指す。
+    success_data / average_data には DataFrame のほか、
+    extract_comparison_channels の戻り値（配列の辞書）も渡せる。
+    """
+    success = extract_comparison_channels(success_data)
+    average = extract_comparison_channels(average_data)
+
+    # データ長さの調整（短い方に合わせる）
+    min_length = min(len(success['speed']), len(average['speed']))
+
+    # 各ポイントでの差分を一括計算
+    values = {}
+    diffs = {}
+    for key, _ in COMPARISON_CHANNELS:
+        s = success[key][:min_length]
+        a = average[key][:min_length]
+        values[key] = (s, a)
+        diffs[key] = s - a
+
+    # 有意な差分ポイントを特定（速度差が3km/h以上、またはG-Force差が0.1G以上）
+    significant_mask = (
+        (np.abs(diffs['speed']) > 3)
+        | (np.abs(diffs['gfx']) > 0.1)
+        | (np.abs(diffs['gfy']) > 0.1)
+    )
+    significant_idx = np.flatnonzero(significant_mask)
+
+    # 有意なポイントだけを辞書に変換（tolistでPythonのfloatへ一括変換）
+    columns = [significant_idx.tolist()]
+    for key, _ in COMPARISON_CHANNELS:
+        s, a = values[key]
+        columns.extend([
+            s[significant_idx].tolist(),
+            a[significant_idx].tolist(),
+            diffs[key][significant_idx].tolist(),
+        ])
+    point_keys = ['index']
+    for key, _ in COMPARISON_CHANNELS:
+        point_keys.extend([f'success_{key}', f'average_{key}', f'{key}_diff'])
+    significant_points = [dict(zip(point_keys, row)) for row in zip(*columns)]
+
     comparison_results = {
         'success_lap': success_lap_num,
         'average_lap': average_lap_num,
         'success_time': success_time,
         'average_time': average_time,
         'time_difference': average_time - success_time,
-        'data_points': min(len(success_data), len(average_data)),
-        'speed_diff': [],
-        'rpm_diff': [],
-        'gforce_x_diff': [],
-        'gforce_y_diff': [],
-        'significant_points': []
+        'data_points': min_length,
+        'speed_diff': diffs['speed'].tolist(),
+        'rpm_diff': diffs['rpm'].tolist(),
+        'gforce_x_diff': diffs['gfx'].tolist(),
+        'gforce_y_diff': diffs['gfy'].tolist(),
+        'significant_points': significant_points
     }
-    
-    # データ長さの調整（短い方に合わせる）
-    min_length = min(len(success_data), len(average_data))
-    
-    # 各ポイントでの差分を計算
-    for i in range(min_length):
-        speed_diff = success_data['Speed GPS'].iloc[i] - average_data['Speed GPS'].iloc[i]
-        rpm_diff = success_data['RPM'].iloc[i] - average_data['RPM'].iloc[i]
-        gfx_diff = success_data['Gf. X'].iloc[i] - average_data['Gf. X'].iloc[i]
-        gfy_diff = success_data['Gf. Y'].iloc[i] - average_data['Gf. Y'].iloc[i]
-        
-        comparison_results['speed_diff'].append(float(speed_diff))
-        comparison_results['rpm_diff'].append(float(rpm_diff))
-        comparison_results['gforce_x_diff'].append(float(gfx_diff))
-        comparison_results['gforce_y_diff'].append(float(gfy_diff))
-        
-        # 有意な差分ポイントを特定（速度差が3km/h以上、またはG-Force差が0.1G以上）
-        if abs(speed_diff) > 3 or abs(gfx_diff) > 0.1 or abs(gfy_diff) > 0.1:
-            comparison_results['significant_points'].append({
-                'index': i,
-                'success_speed': float(success_data['Speed GPS'].iloc[i]),
-                'average_speed': float(average_data['Speed GPS'].iloc[i]),
-                'speed_diff': float(speed_diff),
-                'success_rpm': float(success_data['RPM'].iloc[i]),
-                'average_rpm': float(average_data['RPM'].iloc[i]),
-                'rpm_diff': float(rpm_diff),
-                'success_gfx': float(success_data['Gf. X'].iloc[i]),
-                'average_gfx': float(average_data['Gf. X'].iloc[i]),
-                'gfx_diff': float(gfx_diff),
-                'success_gfy': float(success_data['Gf. Y'].iloc[i]),
-                'average_gfy': float(average_data['Gf. Y'].iloc[i]),
-                'gfy_diff': float(gfy_diff)
-            })
-    
+
     # 基本統計量の追加
     comparison_results['statistics'] = {
-        'speed': {
-            'mean_diff': float(np.mean(comparison_results['speed_diff'])),
-            'std_diff': float(np.std(comparison_results['speed_diff'])),
-            'max_diff': float(np.max(comparison_results['speed_diff'])),
-            'min_diff': float(np.min(comparison_results['speed_diff'])),
-            'success_mean': float(success_data['Speed GPS'].mean()),
-            'average_mean': float(average_data['Speed GPS'].mean()),
-            'success_max': float(success_data['Speed GPS'].max()),
-            'average_max': float(average_data['Speed GPS'].max())
-        },
-        'rpm': {
-            'mean_diff': float(np.mean(comparison_results['rpm_diff'])),
-            'std_diff': float(np.std(comparison_results['rpm_diff'])),
-            'max_diff': float(np.max(comparison_results['rpm_diff'])),
-            'min_diff': float(np.min(comparison_results['rpm_diff'])),
-            'success_mean': float(success_data['RPM'].mean()),
-            'average_mean': float(average_data['RPM'].mean()),
-            'success_max': float(success_data['RPM'].max()),
-            'average_max': float(average_data['RPM'].max())
-        },
-        'gforce_x': {
-            'mean_diff': float(np.mean(comparison_results['gforce_x_diff'])),
-            'std_diff': float(np.std(comparison_results['gforce_x_diff'])),
-            'max_diff': float(np.max(comparison_results['gforce_x_diff'])),
-            'min_diff': float(np.min(comparison_results['gforce_x_diff'])),
-            'success_mean': float(success_data['Gf. X'].mean()),
-            'average_mean': float(average_data['Gf. X'].mean()),
-            'success_max': float(success_data['Gf. X'].max()),
-            'average_max': float(average_data['Gf. X'].max())
-        },
-        'gforce_y': {
-            'mean_diff': float(np.mean(comparison_results['gforce_y_diff'])),
-            'std_diff': float(np.std(comparison_results['gforce_y_diff'])),
-            'max_diff': float(np.max(comparison_results['gforce_y_diff'])),
-            'min_diff': float(np.min(comparison_results['gforce_y_diff'])),
-            'success_mean': float(success_data['Gf. Y'].abs().mean()),
-            'average_mean': float(average_data['Gf. Y'].abs().mean()),
-            'success_max': float(success_data['Gf. Y'].abs().max()),
-            'average_max': float(average_data['Gf. Y'].abs().max())
-        }
-    }
-    
-    # 生のデータポイントは含めない（データ量が多すぎるため）
-    # 必要な場合は以下のコメントを解除して設定できます
-    """
-    comparison_results['raw_data'] = {
-        'success': {
-            'speed': success_data['Speed GPS'].tolist()[:min_length],
-            'rpm': success_data['RPM'].tolist()[:min_length],
-            'gforce_x': success_data['Gf. X'].tolist()[:min_length],
-            'gforce_y': success_data['Gf. Y'].tolist()[:min_length]
-        },
-        'average': {
-            'speed': average_data['Speed GPS'].tolist()[:min_length],
-            'rpm': average_data['RPM'].tolist()[:min_length],
-            'gforce_x': average_data['Gf. X'].tolist()[:min_length],
-            'gforce_y': average_data['Gf. Y'].tolist()[:min_length]
-        }
+        'speed': _channel_statistics(diffs['speed'], success['speed'], average['speed']),
+        'rpm': _channel_statistics(diffs['rpm'], success['rpm'], average['rpm']),
+        'gforce_x': _channel_statistics(diffs['gfx'], success['gfx'], average['gfx']),
+        'gforce_y': _channel_statistics(diffs['gfy'], success['gfy'], average['gfy'], use_abs=True)
     }
-    """
-    
+
     return comparison_results
 
 
@@ -336,54 +290,48 @@ def analyze_difference_points(comparison_results):
     return diff_analysis
 
 
-def identify_sections_with_differences(comparison_results):
-    """連続した差分ポイントからセクションを特定する関数"""
+def identify_sections_with_differences(comparison_results, max_gap=3):
+    """連続した差分ポイントからセクションを特定する関数
+
+    インデックス間隔が max_gap 以内のポイントを同じセクションとみなし、
+    グループ境界と区間平均を np.diff / np.add.reduceat で一括計算する。
+    """
     significant_points = comparison_results['significant_points']
     
     if not significant_points:
         return []
     
     # 差分ポイントのインデックスをソート
-    point_indices = sorted([p['index'] for p in significant_points])
+    point_indices = np.sort(np.fromiter((p['index'] for p in significant_points),
+                                        dtype=np.int64, count=len(significant_points)))
     
-    # 連続したポイントをグループ化してセクションを特定
-    sections = []
-    current_section = {'start': point_indices[0], 'points': [point_indices[0]]}
+    # 間隔が max_gap を超える位置でセクションを区切る
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(point_indices) > max_gap) + 1))
+    ends = np.append(starts[1:], len(point_indices))
+    counts = ends - starts
     
-    for i in range(1, len(point_indices)):
-        if point_indices[i] - point_indices[i-1] <= 3:  # 3ポイント以内の間隔なら同じセクション
-            current_section['points'].append(point_indices[i])
-        else:
-            # 現在のセクションを終了し、新しいセクションを開始
-            current_section['end'] = current_section['points'][-1]
-            current_section['count'] = len(current_section['points'])
-            
-            # セクション内のデータポイントの平均差分を計算
-            section_indices = current_section['points']
-            current_section['avg_speed_diff'] = float(np.mean([comparison_results['speed_diff'][i] for i in section_indices]))
-            current_section['avg_rpm_diff'] = float(np.mean([comparison_results['rpm_diff'][i] for i in section_indices]))
-            current_section['avg_gfx_diff'] = float(np.mean([comparison_results['gforce_x_diff'][i] for i in section_indices]))
-            current_section['avg_gfy_diff'] = float(np.mean([comparison_results['gforce_y_diff'][i] for i in section_indices]))
-            
-            sections.append(current_section)
-            current_section = {'start': point_indices[i], 'points': [point_indices[i]]}
-    
-    # 最後のセクションを追加
-    if current_section:
-        current_section['end'] = current_section['points'][-1]
-        current_section['count'] = len(current_section['points'])
-        
-        section_indices = current_section['points']
-        current_section['avg_speed_diff'] = float(np.mean([comparison_results['speed_diff'][i] for i in section_indices]))
-        current_section['avg_rpm_diff'] = float(np.mean([comparison_results['rpm_diff'][i] for i in section_indices]))
-        current_section['avg_gfx_diff'] = float(np.mean([comparison_results['gforce_x_diff'][i] for i in section_indices]))
-        current_section['avg_gfy_diff'] = float(np.mean([comparison_results['gforce_y_diff'][i] for i in section_indices]))
-        
-        sections.append(current_section)
+    # セクション内のデータポイントの平均差分を計算
+    averages = {}
+    for key, diff_key in DIFF_KEYS.items():
+        diff_values = np.asarray(comparison_results[diff_key], dtype=np.float64)[point_indices]
+        averages[key] = (np.add.reduceat(diff_values, starts) / counts).tolist()
     
-    # セクションの影響度でソート（ポイント数×平均速度差の絶対値）
-    for section in sections:
-        section['impact_score'] = section['count'] * abs(section['avg_speed_diff'])
+    point_list = point_indices.tolist()
+    sections = []
+    for n, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        count = end - start
+        sections.append({
+            'start': point_list[start],
+            'points': point_list[start:end],
+            'end': point_list[end - 1],
+            'count': count,
+            'avg_speed_diff': averages['speed'][n],
+            'avg_rpm_diff': averages['rpm'][n],
+            'avg_gfx_diff': averages['gfx'][n],
+            'avg_gfy_diff': averages['gfy'][n],
+            # セクションの影響度（ポイント数×平均速度差の絶対値）
+            'impact_score': count * abs(averages['speed'][n])
+        })
     
     sections.sort(key=lambda x: x['impact_score'], reverse=True)
     
@@ -483,8 +431,8 @@ if __name__ == "__main__":
     # ディレクトリパスを指定
     data_dir = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\data"
     
-    # 分析結果レポートファイルパス
-    results_file = os.path.join(data_dir, "analysis_report_alfano_data.txt")
+    # 元データファイルパス（ラップ分類は driving_analyze が保存したストアから読み込む）
+    data_file = os.path.join(data_dir, "alfano_data.csv")
     
     # 出力ディレクトリ
     output_dir = os.path.join(data_dir, "lap_comparison_results")
@@ -494,4 +442,4 @@ if __name__ == "__main__":
         os.makedirs(output_dir)
     
     # 成功ラップとアベレージラップの比較分析を実行
-    compare_success_vs_average(results_file, data_dir, output_dir)
\ No newline at end of file
+    compare_success_vs_average(data_file, output_dir)
\ No newline at end of file
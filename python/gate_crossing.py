@@ -0,0 +1,118 @@
+import pandas as pd
+import numpy as np
+
+# 一度に判定するセグメント数（セグメント数 × ゲート数 の配列を作るため上限を設ける）
+DEFAULT_CHUNK_SIZE = 200000
+
+
+def gate_lines(gates):
+    """ゲートを通る直線 a*x + b*y = c の係数とゲートの長さを求める関数
+
+    (a, b) はゲートの単位法線で、a*x + b*y - c が点のゲートの直線からの符号付き距離になる。
+    ゲート方向の単位ベクトルは (b, -a)。サーキット定義の読み込み時に一度だけ計算しておけば、
+    find_gate_crossings(lines=...) で判定ごとに作り直さずに済む。
+
+    Returns:
+    --------
+    tuple
+        (係数の配列（形状: ゲート数 × 3 = a, b, c）, ゲートの長さの配列)
+    """
+    gates = np.asarray(gates, dtype=np.float64).reshape(-1, 2, 2)
+    direction = gates[:, 1] - gates[:, 0]
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    normal = np.stack((-direction[:, 1], direction[:, 0]), axis=1) / np.where(length > 0, length, 1.0)[:, np.newaxis]
+    offset = (normal * gates[:, 0]).sum(axis=1)
+    return np.column_stack((normal, offset)), length
+
+
+def find_gate_crossings(x, y, t, gates, lap=None, chunk_size=DEFAULT_CHUNK_SIZE, lines=None):
+    """走行軌跡とゲート線分の交差をセッション全体で一括検出する関数
+
+    全サンプルの各ゲートの直線からの符号付き距離をNumPyで一度に求め、
+    連続する2サンプルで符号が変わるセグメントを交差の候補とする。
+    距離の比率から通過時刻を補間し、交差点がゲートの線分上にあるものだけを残す。
+
+    Parameters:
+    -----------
+    x, y : array-like
+        軌跡の座標
+    t : array-like
+        各サンプルの時刻
+    gates : list
+        ゲートのリスト [((x1, y1), (x2, y2)), ...]
+    lap : array-like, optional
+        ラップ番号。指定するとラップをまたぐセグメントは判定しない
+    chunk_size : int
+        一度に判定するセグメント数
+    lines : tuple, optional
+        gate_lines(gates) の戻り値（サーキット定義で計算済みのもの。省略時はここで計算する）
+
+    Returns:
+    --------
+    pd.DataFrame
+        'Lap', 'Gate'（0始まり）, 'Segment'（始点のサンプル位置）, 'Ratio',
+        'Time', 'x', 'y' を持つ交差点の一覧（Segment, Gate 順）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    gates = np.asarray(gates, dtype=np.float64).reshape(-1, 2, 2)
+    coefficients, length = gate_lines(gates) if lines is None else lines
+    a, b, c = coefficients[:, 0], coefficients[:, 1], coefficients[:, 2]
+
+    valid_segment = np.isfinite(x[:-1]) & np.isfinite(y[:-1]) & np.isfinite(x[1:]) & np.isfinite(y[1:])
+    if lap is not None:
+        lap = np.asarray(lap)
+        valid_segment &= lap[:-1] == lap[1:]
+
+    seg_list, gate_list, ratio_list = [], [], []
+    n_segments = max(len(x) - 1, 0)
+    for begin in range(0, n_segments, chunk_size):
+        end = min(begin + chunk_size, n_segments)
+
+        # サンプルの各ゲートの直線からの符号付き距離（形状: サンプル数 × ゲート数）
+        side = x[begin:end + 1, np.newaxis] * a + y[begin:end + 1, np.newaxis] * b - c
+        side0, side1 = side[:-1], side[1:]
+
+        # 直線をまたぐセグメント（セグメント側は [0, 1) として、サンプル点上の交差を二重に数えない）
+        denom = side0 - side1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seg_ratio = side0 / denom
+        hit = (denom != 0) & (seg_ratio >= 0) & (seg_ratio < 1) & valid_segment[begin:end, np.newaxis]
+        seg_idx, gate_idx = np.nonzero(hit)
+        ratio = seg_ratio[seg_idx, gate_idx]
+
+        # 交差点のゲート方向の位置が線分の範囲 [0, 長さ] にあるものだけを残す
+        seg = seg_idx + begin
+        cx = x[seg] + ratio * (x[seg + 1] - x[seg]) - gates[gate_idx, 0, 0]
+        cy = y[seg] + ratio * (y[seg + 1] - y[seg]) - gates[gate_idx, 0, 1]
+        along = cx * b[gate_idx] - cy * a[gate_idx]
+        on_gate = (along >= 0) & (along <= length[gate_idx])
+        seg_list.append(seg[on_gate])
+        gate_list.append(gate_idx[on_gate])
+        ratio_list.append(ratio[on_gate])
+
+    segment = np.concatenate(seg_list) if seg_list else np.empty(0, dtype=np.int64)
+    gate = np.concatenate(gate_list) if gate_list else np.empty(0, dtype=np.int64)
+    ratio = np.concatenate(ratio_list) if ratio_list else np.empty(0, dtype=np.float64)
+
+    # 交差位置の比率でサンプル間を線形補間
+    crossings = pd.DataFrame({
+        'Lap': lap[segment] if lap is not None else np.zeros(len(segment), dtype=np.int64),
+        'Gate': gate,
+        'Segment': segment,
+        'Ratio': ratio,
+        'Time': t[segment] + ratio * (t[segment + 1] - t[segment]),
+        'x': x[segment] + ratio * (x[segment + 1] - x[segment]),
+        'y': y[segment] + ratio * (y[segment + 1] - y[segment]),
+    })
+    return crossings
+
+
+def first_crossings(crossings):
+    """ラップ・ゲートごとに最初の交差だけを残す関数"""
+    return (
+        crossings.sort_values(['Lap', 'Gate', 'Segment'])
+        .drop_duplicates(['Lap', 'Gate'], keep='first')
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,207 @@
+import pandas as pd
+import numpy as np
+import warnings
+import json
+import os
+
+from lap_resample import LapResampler
+from driving_analyze import get_lap_time, lap_sector_times, load_preprocessed_data, group_laps
+from circuit_registry import load_circuit
+from driving_analyze2 import COMPARISON_CHANNELS
+
+# 差分の統計量（行列として保持する項目）
+MATRIX_STATISTICS = ['mean_diff', 'std_diff', 'max_diff', 'min_diff', 'mean_abs_diff']
+
+# 有意な差分の閾値（process_lap_comparison と同じ: 速度差3km/h以上、G-Force差0.1G以上）
+SIGNIFICANT_THRESHOLDS = {'speed': 3, 'gfx': 0.1, 'gfy': 0.1}
+
+
+class LapMatrix:
+    """セッション内の全ラップ組み合わせの比較結果（ラップ × ラップの行列）
+
+    各ラップは一度だけ距離グリッドにリサンプリングして (ラップ, グリッド, チャンネル) の
+    配列にまとめ、組み合わせごとの差分は1ラップ分ずつブロードキャストで一括計算する。
+    結果は行列として保持するため、任意の2ラップの比較は pair() で即座に取り出せる。
+    行 i・列 j の値は「ラップ i − ラップ j」。
+    """
+
+    def __init__(self, laps, grid_step=0.5, sector_bounds=None, circuit=None):
+        """
+        Parameters:
+        -----------
+        laps : dict
+            {ラップ番号: ラップデータ}（group_laps の戻り値）
+        grid_step : float
+            距離グリッドの間隔 [m]
+        sector_bounds : list, optional
+            セクター境界の走行距離 [m]（ラップ開始からの距離、両端を含まない）
+        circuit : str or circuit_registry.Circuit, optional
+            サーキット名・定義ファイルのパスまたはサーキット定義。指定するとセクターは
+            登録済みのゲートで区切る（sector_engine と同じセクタータイム。sector_bounds は使わない）
+
+        circuit・sector_bounds のどちらも指定しない場合はセクターを比較しない
+        （sector_times は0列、ラップ全体の差分だけを出力する）。
+        """
+        self.grid_step = grid_step
+        self.channels = [key for key, _ in COMPARISON_CHANNELS]
+        self.laps = sorted(laps)
+        self._position = {lap: i for i, lap in enumerate(self.laps)}
+
+        resampler = LapResampler(step=grid_step, channels=[col for _, col in COMPARISON_CHANNELS])
+        grids = [resampler.get(laps[lap]) for lap in self.laps]
+
+        # (ラップ, グリッド, チャンネル) の配列にまとめる。長さの違いは NaN で埋め、
+        # 組み合わせごとに短い方のラップの範囲だけで統計を取る（process_lap_comparison と同じ）
+        self.data_points = np.array([len(g) for g in grids], dtype=np.int64)
+        length = int(self.data_points.max()) if grids else 0
+        self.features = np.full((len(grids), length, len(self.channels)), np.nan)
+        for i, g in enumerate(grids):
+            self.features[i, :len(g)] = g[[col for _, col in COMPARISON_CHANNELS]].to_numpy(dtype=np.float64)
+
+        self.lap_times = np.array([get_lap_time(laps[lap]) for lap in self.laps], dtype=np.float64)
+        if circuit is not None:
+            if isinstance(circuit, str):
+                circuit = load_circuit(circuit)
+            self.sector_times = _gate_sector_times([laps[lap] for lap in self.laps], self.lap_times, circuit)
+        elif sector_bounds is not None:
+            self.sector_times = np.stack([
+                _sector_times(g, sector_bounds) for g in grids
+            ]) if grids else np.empty((0, len(sector_bounds) + 1))
+        else:
+            self.sector_times = np.empty((len(self.laps), 0))
+
+        self._compute()
+
+    def _compute(self):
+        n_laps, _, n_channels = self.features.shape
+        self.statistics = {
+            stat: np.full((n_channels, n_laps, n_laps), np.nan) for stat in MATRIX_STATISTICS
+        }
+        self.significant_ratio = np.full((n_laps, n_laps), np.nan)
+
+        thresholds = np.array([SIGNIFICANT_THRESHOLDS.get(key, np.inf) for key in self.channels])
+        for i in range(n_laps):
+            # ラップ i と全ラップの差分（形状: ラップ × グリッド × チャンネル）
+            diff = self.features[i][np.newaxis] - self.features
+            with warnings.catch_warnings():
+                # 全てNaNの区間は結果をNaNのままにする
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self.statistics['mean_diff'][:, i, :] = np.nanmean(diff, axis=1).T
+                self.statistics['std_diff'][:, i, :] = np.nanstd(diff, axis=1).T
+                self.statistics['max_diff'][:, i, :] = np.nanmax(diff, axis=1).T
+                self.statistics['min_diff'][:, i, :] = np.nanmin(diff, axis=1).T
+                self.statistics['mean_abs_diff'][:, i, :] = np.nanmean(np.abs(diff), axis=1).T
+                # 両ラップにデータがあるグリッド点のうち、有意な差がある点の割合
+                compared = np.arange(diff.shape[1]) < np.minimum(self.data_points[i], self.data_points)[:, np.newaxis]
+                significant = (np.abs(diff) > thresholds).any(axis=2) & compared
+                self.significant_ratio[i, :] = significant.sum(axis=1) / compared.sum(axis=1)
+
+        self.lap_time_delta = self.lap_times[:, np.newaxis] - self.lap_times[np.newaxis, :]
+        self.sector_time_delta = self.sector_times[:, np.newaxis, :] - self.sector_times[np.newaxis, :, :]
+
+    def pair(self, lap_a, lap_b):
+        """2ラップの比較結果（lap_a − lap_b）を返す"""
+        i, j = self._position[lap_a], self._position[lap_b]
+        return {
+            'lap_a': lap_a,
+            'lap_b': lap_b,
+            'lap_time_delta': _to_float(self.lap_time_delta[i, j]),
+            'sector_time_delta': [_to_float(v) for v in self.sector_time_delta[i, j]],
+            'data_points': int(min(self.data_points[i], self.data_points[j])),
+            'significant_ratio': _to_float(self.significant_ratio[i, j]),
+            'statistics': {
+                key: {stat: _to_float(self.statistics[stat][k, i, j]) for stat in MATRIX_STATISTICS}
+                for k, key in enumerate(self.channels)
+            },
+        }
+
+    def to_frame(self):
+        """全組み合わせをラップペアをインデックスとする縦持ちのデータフレームで返す"""
+        lap_a, lap_b = np.meshgrid(self.laps, self.laps, indexing='ij')
+        data = {
+            'lap_time_delta': self.lap_time_delta.ravel(),
+            'significant_ratio': self.significant_ratio.ravel(),
+        }
+        for s in range(self.sector_times.shape[1]):
+            data[f'sector{s + 1}_delta'] = self.sector_time_delta[:, :, s].ravel()
+        for k, key in enumerate(self.channels):
+            for stat in MATRIX_STATISTICS:
+                data[f'{key}_{stat}'] = self.statistics[stat][k].ravel()
+        index = pd.MultiIndex.from_arrays([lap_a.ravel(), lap_b.ravel()], names=['lap_a', 'lap_b'])
+        return pd.DataFrame(data, index=index)
+
+    def to_dict(self):
+        """JSON保存用の辞書（行列はラップ順の入れ子リスト）"""
+        return {
+            'laps': [int(lap) for lap in self.laps],
+            'grid_step_m': self.grid_step,
+            'data_points': self.data_points.tolist(),
+            'channels': self.channels,
+            'lap_times': _to_list(self.lap_times),
+            'sector_times': _to_list(self.sector_times),
+            'lap_time_delta': _to_list(self.lap_time_delta),
+            'sector_time_delta': _to_list(self.sector_time_delta),
+            'significant_ratio': _to_list(self.significant_ratio),
+            'statistics': {
+                key: {stat: _to_list(self.statistics[stat][k]) for stat in MATRIX_STATISTICS}
+                for k, key in enumerate(self.channels)
+            },
+        }
+
+
+def _sector_times(grid, sector_bounds):
+    """距離グリッドの経過時間から、指定した境界で区切ったセクタータイムを計算する"""
+    distance = grid['Distance'].to_numpy()
+    elapsed = grid['Elapsed'].to_numpy()
+    if len(distance) == 0:
+        return np.full(len(sector_bounds) + 1, np.nan)
+    bounds = np.concatenate(([0.0], np.asarray(sector_bounds, dtype=np.float64), [distance[-1]]))
+    return np.diff(np.interp(bounds, distance, elapsed))
+
+
+def _gate_sector_times(lap_frames, lap_times, circuit):
+    """ゲート通過時刻からセクタータイムを計算する（ラップ × セクター、計測できないセクターは NaN）"""
+    rows = [
+        lap_sector_times(lap_data, circuit, None if np.isnan(lap_time) else lap_time)['sectors']
+        for lap_data, lap_time in zip(lap_frames, lap_times)
+    ]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(circuit.gates))
+
+
+def _to_float(value):
+    return None if not np.isfinite(value) else float(value)
+
+
+def _to_list(values):
+    """NaN を None にしてリストに変換する"""
+    values = np.asarray(values, dtype=np.float64)
+    out = values.astype(object)
+    out[~np.isfinite(values)] = None
+    return out.tolist()
+
+
+def compare_all_laps(data_file, output_dir=None, grid_step=0.5, sector_bounds=None, circuit=None):
+    """セッション内の全ラップ組み合わせを比較し、行列をJSONとして保存する関数
+
+    circuit を指定するとセクターはサーキットのゲートで区切る。circuit・sector_bounds の
+    どちらも指定しない場合はラップ全体の差分だけを出力する（LapMatrix を参照）。
+
+    Returns:
+    --------
+    LapMatrix
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(data_file)
+
+    df = load_preprocessed_data(data_file)
+    laps = group_laps(df)
+    matrix = LapMatrix(laps, grid_step=grid_step, sector_bounds=sector_bounds, circuit=circuit)
+
+    name = os.path.basename(data_file).split('.')[0]
+    output_file = os.path.join(output_dir, f"lap_matrix_{name}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(matrix.to_dict(), f, ensure_ascii=False, allow_nan=False)
+
+    print(f"{len(matrix.laps)} ラップの全組み合わせの比較が完了しました。")
+    print(f"結果は '{output_file}' に保存されました。")
+    return matrix
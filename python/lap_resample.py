@@ -0,0 +1,222 @@
+import pandas as pd
+import numpy as np
+
+# 地球半径 [m]
+EARTH_RADIUS = 6378137
+
+# 緯度経度のカラム名
+LAT_COL = 'Lat.'
+LON_COL = 'Lon.'
+
+# 時間カラムの候補（ラップ内の経過時間 [秒]）
+TIME_COLUMNS = ['Time', 'Time [1/10 s]', 'Time_sec']
+
+# リサンプリング対象から除外するカラム
+EXCLUDED_COLUMNS = {'Lap', LAT_COL, LON_COL}
+
+
+def normalize_latlon(lat, lon):
+    """緯度経度を度単位のfloat64配列に揃える関数
+
+    Alfanoのラップファイルは緯度経度を 1e6 倍した整数で保存しているため、
+    緯度の絶対値が90を超える場合は 1e6 で割って度に戻す。
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.size and np.nanmax(np.abs(lat)) > 90:
+        lat = lat / 1e6
+        lon = lon / 1e6
+    return lat, lon
+
+
+def latlon_to_xy(lat, lon, lat0=None, lon0=None):
+    """緯度経度（度）を基準点からのローカルXY座標 [m] に変換する関数"""
+    lat, lon = normalize_latlon(lat, lon)
+    if lat0 is None:
+        lat0 = np.nanmean(lat)
+    if lon0 is None:
+        lon0 = np.nanmean(lon)
+    x = np.deg2rad(lon - lon0) * EARTH_RADIUS * np.cos(np.deg2rad(lat0))
+    y = np.deg2rad(lat - lat0) * EARTH_RADIUS
+    return x, y
+
+
+def xy_to_latlon(x, y, lat0, lon0):
+    """ローカルXY座標 [m] を緯度経度（度）に戻す関数（latlon_to_xy の逆変換）"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lat = lat0 + np.rad2deg(y / EARTH_RADIUS)
+    lon = lon0 + np.rad2deg(x / (EARTH_RADIUS * np.cos(np.deg2rad(lat0))))
+    return lat, lon
+
+
+def cumulative_distance(lat, lon):
+    """ラップ開始点からの累積走行距離 [m] を計算する関数"""
+    x, y = latlon_to_xy(lat, lon)
+    if x.size == 0:
+        return x
+    step = np.hypot(np.diff(x), np.diff(y))
+    return np.concatenate(([0.0], np.cumsum(step)))
+
+
+def lap_elapsed_time(lap_data, sample_interval=0.1):
+    """ラップ開始からの経過時間 [秒] を返す関数
+
+    時間カラムが無い場合はサンプリング間隔から計算する。
+    """
+    for col in TIME_COLUMNS:
+        if col in lap_data.columns:
+            t = lap_data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            if np.isfinite(t).any():
+                return t - np.nanmin(t)
+    return np.arange(len(lap_data), dtype=np.float64) * sample_interval
+
+
+def resample_lap(lap_data, step=0.5, channels=None, sample_interval=0.1, track=None):
+    """ラップデータを累積距離軸上の等間隔グリッドに補間する関数
+
+    Parameters:
+    -----------
+    lap_data : pd.DataFrame
+        1ラップ分のデータ（'Lat.' / 'Lon.' が必要）
+    step : float
+        グリッド間隔 [m]
+    channels : list, optional
+        補間するカラム。指定がなければ数値カラムすべて
+    sample_interval : float
+        時間カラムが無い場合のサンプリング間隔 [秒]
+    track : track_model.TrackModel, optional
+        指定するとサンプルをコース中心線に投影した距離を軸にする（走行ラインの違いや
+        GPSの横方向のぶれで距離がずれない）。指定がなければ軌跡の累積距離
+
+    Returns:
+    --------
+    pd.DataFrame
+        'Distance'（ラップ開始からの距離 [m]）、'Elapsed' [秒] と各チャンネルを持つグリッドデータ
+    """
+    if channels is None:
+        channels = [
+            col for col in lap_data.select_dtypes(include=[np.number]).columns
+            if col not in EXCLUDED_COLUMNS
+        ]
+
+    lat = lap_data[LAT_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = lap_data[LON_COL].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    elapsed = lap_elapsed_time(lap_data, sample_interval)[valid]
+
+    if track is not None:
+        distance = track.project_lap(lap_data[valid])['LapDistance'].to_numpy()
+        distance = distance - distance[0] if distance.size else distance
+    else:
+        distance = cumulative_distance(lat[valid], lon[valid])
+    if distance.size == 0:
+        return pd.DataFrame(columns=['Distance', 'Elapsed'] + list(channels))
+
+    # 停止中や投影のぶれで距離が増えない（それまでの最大を超えない）サンプルは補間の基準点から外す
+    keep = np.concatenate(([True], distance[1:] > np.maximum.accumulate(distance)[:-1]))
+    distance = distance[keep]
+
+    grid = np.arange(0.0, distance[-1] + step / 2, step)
+    resampled = {
+        'Distance': grid,
+        'Elapsed': np.interp(grid, distance, elapsed[keep]),
+    }
+    for col in channels:
+        values = lap_data[col].to_numpy(dtype=np.float64, na_value=np.nan)[valid][keep]
+        resampled[col] = np.interp(grid, distance, values)
+
+    return pd.DataFrame(resampled)
+
+
+def delta_time_trace(grid, reference_grid, normalize=True):
+    """基準ラップに対するタイム差（デルタタイム）を走行距離に沿って計算する関数
+
+    基準ラップの距離グリッドの各点で、比較ラップがその距離に到達した時刻を補間し、
+    基準ラップとの経過時間の差を求める（正ならロス、負ならゲイン）。
+
+    Parameters:
+    -----------
+    grid, reference_grid : pd.DataFrame
+        resample_lap の距離グリッド（'Distance', 'Elapsed' が必要）
+    normalize : bool
+        True の場合は比較ラップの走行距離を基準ラップの全長に合わせて伸縮する
+        （走行ラインやGPS誤差による全長の違いで、デルタが距離とともにずれるのを防ぐ）
+
+    Returns:
+    --------
+    pd.DataFrame
+        'Distance'（基準ラップの距離 [m]）と 'Delta'（タイム差 [秒]）
+    """
+    ref_distance = reference_grid['Distance'].to_numpy(dtype=np.float64)
+    ref_elapsed = reference_grid['Elapsed'].to_numpy(dtype=np.float64)
+    distance = grid['Distance'].to_numpy(dtype=np.float64)
+    elapsed = grid['Elapsed'].to_numpy(dtype=np.float64)
+
+    if distance.size == 0 or ref_distance.size == 0:
+        return pd.DataFrame({'Distance': ref_distance, 'Delta': np.full(ref_distance.size, np.nan)})
+
+    if normalize and distance[-1] > 0:
+        distance = distance * (ref_distance[-1] / distance[-1])
+
+    delta = np.interp(ref_distance, distance, elapsed) - ref_elapsed
+    # 比較ラップの走行距離を超える範囲は補間できない
+    delta[ref_distance > distance[-1]] = np.nan
+    return pd.DataFrame({'Distance': ref_distance, 'Delta': delta})
+
+
+class LapResampler:
+    """ラップごとの距離グリッドをキャッシュするクラス
+
+    セッション内の各ラップは一度だけリサンプリングされ、
+    全ラップ組み合わせの比較でも同じグリッドを再利用する。
+    キャッシュはラップデータのオブジェクトごとに持つため、ラップ番号・行数が同じ
+    別セッションのラップや、読み込み直したラップを取り違えることはない。
+    """
+
+    def __init__(self, step=0.5, channels=None, sample_interval=0.1, track=None):
+        self.step = step
+        self.channels = channels
+        self.sample_interval = sample_interval
+        self.track = track
+        # {id(ラップデータ): (ラップデータ, グリッド)}（元データを保持して id が再利用されないようにする）
+        self._cache = {}
+        self._delta_cache = {}
+
+    def get(self, lap_data):
+        """ラップのグリッドを返す（未計算ならリサンプリングしてキャッシュ）"""
+        cached = self._cache.get(id(lap_data))
+        if cached is None or cached[0] is not lap_data:
+            cached = (lap_data, resample_lap(lap_data, self.step, self.channels, self.sample_interval, self.track))
+            self._cache[id(lap_data)] = cached
+        return cached[1]
+
+    def resample_laps(self, laps):
+        """ラップ辞書をまとめてリサンプリングする"""
+        return {lap_num: self.get(lap_data) for lap_num, lap_data in laps.items()}
+
+    def delta_time(self, lap_data, reference_data, normalize=True):
+        """基準ラップに対するデルタタイムを返す（ラップと基準ラップの組み合わせごとにキャッシュ）"""
+        key = (id(lap_data), id(reference_data), normalize)
+        cached = self._delta_cache.get(key)
+        if cached is None or cached[0] is not lap_data or cached[1] is not reference_data:
+            delta = delta_time_trace(self.get(lap_data), self.get(reference_data), normalize)
+            cached = (lap_data, reference_data, delta)
+            self._delta_cache[key] = cached
+        return cached[2]
+
+    def delta_traces(self, laps, reference_lap, normalize=True):
+        """全ラップのデルタタイムを基準ラップの距離を軸にした表で返す（列はラップ番号）"""
+        reference_data = laps[reference_lap]
+        traces = {
+            lap_num: self.delta_time(lap_data, reference_data, normalize)
+            for lap_num, lap_data in laps.items()
+        }
+        reference_distance = self.get(reference_data)['Distance'].to_numpy()
+        table = pd.DataFrame({lap_num: trace['Delta'].to_numpy() for lap_num, trace in traces.items()})
+        table.insert(0, 'Distance', reference_distance)
+        return table
+
+    def clear(self):
+        self._cache.clear()
+        self._delta_cache.clear()
@@ -1,63 +1,30 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
+
+from telemetry_io import read_telemetry
+from lap_resample import latlon_to_xy
+from circuit_registry import load_circuit
+from corner_zones import assign_corners, corner_passages
 
 # CSVファイルパス（Windows環境用パス）
 csv_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\data\test-lap2.csv"
 
-# CSV読み込み
-df = pd.read_csv(csv_path, sep=',', encoding='utf-8')
-df.columns = [col.strip() for col in df.columns]
-
-manual_corners_geo = [
-    {
-        "name": "Corner 1",
-        "lat_min": 35.3815536, "lat_max": 35.3819542,
-        "lon_min": 140.281662, "lon_max": 140.2819214
-    },
-    {
-        "name": "Corner 2",
-        "lat_min": 35.3814621, "lat_max": 35.3817215,
-        "lon_min": 140.2812653, "lon_max": 140.281662
-    },
-    {
-        "name": "Corner 3",
-        "lat_min": 35.3817215, "lat_max": 35.3819427,
-        "lon_min": 140.2810516, "lon_max": 140.2817535
-    },
-    {
-        "name": "Corner 4",
-        "lat_min": 35.3815727, "lat_max": 35.3818512,
-        "lon_min": 140.2806091, "lon_max": 140.2810516
-    },
-    {
-        "name": "Corner 5",
-        "lat_min": 35.3813477, "lat_max": 35.3816147,
-        "lon_min": 140.2804413, "lon_max": 140.2810974
-    },
-    {
-        "name": "Corner 6",
-        "lat_min": 35.381546, "lat_max": 35.3820724,
-        "lon_min": 140.280426, "lon_max": 140.2818756
-    },
-]
+# CSV読み込み（Lat./Lon. は度単位に正規化される）
+df = read_telemetry(csv_path)
 
+# コーナー領域（緯度経度の矩形）はサーキット定義から読み込む
+circuit = load_circuit('mobara')
 
 # 緯度・経度データを抽出
-latitudes = df['Lat.'].dropna().tolist()
-longitudes = df['Lon.'].dropna().tolist()
+position = df[['Lat.', 'Lon.']].dropna()
+latitudes = position['Lat.'].to_numpy()
+longitudes = position['Lon.'].to_numpy()
 
 # 基準点（スタート位置）を決定
 lat0 = latitudes[0]
 lon0 = longitudes[0]
 
-# 1度あたりの距離[m]を計算
-lat_meter = 111000  # 緯度方向
-lon_meter = 111320 * np.cos(np.radians(lat0))  # 経度方向
-
-# ローカル座標に変換（相対距離[m]）
-x = [(lon - lon0) * lon_meter for lon in longitudes]
-y = [(lat - lat0) * lat_meter for lat in latitudes]
+# ローカル座標に変換（相対距離[m]、他のモジュールと同じ地球半径で計算）
+x, y = latlon_to_xy(latitudes, longitudes, lat0, lon0)
 
 # 最大値取得
 x_max = max(abs(min(x)), abs(max(x)))
@@ -76,24 +43,25 @@ plt.grid(True)
 plt.legend()
 plt.show()
 
-# 任意に区間を指定（start_idx, end_idx）
-manual_corners = [
-    (50, 80),   # コーナー1
-    (120, 150), # コーナー2
-    (200, 230), # コーナー3
-]
+# 全サンプルをコーナー領域に割り当てる（重なった領域は優先度の高いコーナーを採用）
+corner_labels = assign_corners(latitudes, longitudes, circuit)
 
 # プロットで確認
 plt.figure(figsize=(8, 8))
 plt.plot(x, y, '-o', markersize=1, label='Lap Trace')
 
-for idx, (start, end) in enumerate(manual_corners):
-    plt.plot(x[start:end], y[start:end], linewidth=4, label=f'Corner {idx+1}')
+for corner_id, name in enumerate(circuit.corner_names):
+    in_corner = corner_labels == corner_id
+    plt.plot(x[in_corner], y[in_corner], '.', markersize=4, label=name)
 
-plt.title("Manual Corner Sections - Mobara Twin Circuit West")
+plt.title("Corner Sections (Geo-fence) - Mobara Twin Circuit West")
 plt.xlabel("X [m]")
 plt.ylabel("Y [m]")
 plt.axis('equal')
 plt.grid(True)
 plt.legend()
 plt.show()
+
+# コーナー通過ごとの進入・エイペックス・脱出
+passages = corner_passages(df.loc[position.index], circuit, labels=corner_labels)
+print(passages[['Lap', 'Corner', 'entry_speed', 'apex_speed', 'exit_speed', 'peak_g', 'duration']].to_string(index=False))
@@ -1,8 +1,10 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
 
+from telemetry_io import read_telemetry
+from lap_resample import latlon_to_xy, normalize_latlon
+
 class MobaraTrackAlignment:
     def __init__(self, csv_path):
         """
@@ -11,9 +13,8 @@ class MobaraTrackAlignment:
         Args:
             csv_path (str): CSVファイルのパス
         """
-        # CSVファイルの読み込み
-        self.df = pd.read_csv(csv_path, sep=',', encoding='utf-8')
-        self.df.columns = [col.strip() for col in self.df.columns]
+        # CSVファイルの読み込み（G-Forceの閾値は生値に合わせてあるため単位は変換しない）
+        self.df = read_telemetry(csv_path, normalize=False)
         
         # 座標データの抽出
         self.latitudes = self.df['Lat.'].dropna().values
@@ -26,17 +27,11 @@ class MobaraTrackAlignment:
         Returns:
             tuple: 変換後のx, y座標
         """
-        # 基準点（最初の点）
-        lat0 = self.latitudes[0]
-        lon0 = self.longitudes[0]
-        
-        # 緯度・経度から距離への変換係数
-        lat_meter = 111000  # 緯度1度あたりの距離（メートル）
-        lon_meter = 111320 * np.cos(np.radians(lat0))  # 経度1度あたりの距離（メートル）
+        # 緯度経度を度に揃える（生値は 1e6 倍で保存されている）
+        latitudes, longitudes = normalize_latlon(self.latitudes, self.longitudes)
         
-        # 相対座標への変換
-        x_raw = (self.longitudes - lon0) * lon_meter
-        y_raw = (self.latitudes - lat0) * lat_meter
+        # 基準点（最初の点）からの相対座標 [m] への変換
+        x_raw, y_raw = latlon_to_xy(latitudes, longitudes, latitudes[0], longitudes[0])
         
         # 主成分分析による座標回転の微調整
         coords = np.column_stack([x_raw, y_raw])
@@ -2,8 +2,90 @@ import pandas as pd
 import numpy as np
 from scipy.signal import find_peaks
 from scipy.spatial.distance import cdist
+from scipy.optimize import linear_sum_assignment
 import matplotlib.pyplot as plt
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Union
+
+from session_cache import load_cached_frame
+from telemetry_io import read_telemetry
+
+
+def _read_lap_csv(lap_path: str) -> pd.DataFrame:
+    # G-Forceの閾値は生値に合わせてあるため、単位は変換せずに読み込む
+    return read_telemetry(lap_path, normalize=False)
+
+
+def load_lap_csv(lap_path: str) -> pd.DataFrame:
+    """
+    ラップCSVを読み込む（セッションキャッシュがあればCSV解析を省略）
+    
+    Args:
+        lap_path (str): ラップのCSVファイルパス
+    
+    Returns:
+        pd.DataFrame: カラム名を整理したラップデータ
+    """
+    return load_cached_frame(lap_path, _read_lap_csv, namespace='map3.lap')
+
+
+# コーナー特徴量の窓幅（ピークの前後のポイント数）
+FEATURE_HALF_WINDOW = 50
+
+
+def _window_mean_std(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    累積和で各窓 [start, end) の平均と標準偏差（母標準偏差）をまとめて計算
+    
+    Args:
+        values (np.ndarray): 1チャンネル分のデータ
+        starts (np.ndarray): 窓の開始位置
+        ends (np.ndarray): 窓の終了位置（含まない）
+    
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 平均と標準偏差（NaNは除いて計算し、有効な値が無い窓はNaN）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    # 桁落ちを避けるため全体の平均を引いてから二乗和を累積する
+    shift = values[valid].mean() if valid.any() else 0.0
+    centered = np.where(valid, values - shift, 0.0)
+    
+    csum = np.concatenate(([0.0], np.cumsum(centered)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(centered ** 2)))
+    cvalid = np.concatenate(([0], np.cumsum(valid)))
+    
+    count = (cvalid[ends] - cvalid[starts]).astype(np.float64)
+    count[count == 0] = np.nan
+    mean = (csum[ends] - csum[starts]) / count
+    var = np.maximum((csum_sq[ends] - csum_sq[starts]) / count - mean ** 2, 0.0)
+    return mean + shift, np.sqrt(var)
+
+
+def detect_corner_peaks(df: pd.DataFrame,
+                        g_force_threshold: float = 0.2,
+                        min_distance: int = 10,
+                        max_corners: int = None) -> np.ndarray:
+    """
+    横Gのピークからコーナー位置を検出
+    
+    Args:
+        df (pd.DataFrame): ラップデータ
+        g_force_threshold (float): G-Forceの閾値
+        min_distance (int): コーナー間の最小距離
+        max_corners (int, optional): 検出するコーナーの最大数（横Gの大きい順に残す）
+    
+    Returns:
+        np.ndarray: コーナーのインデックス
+    """
+    g_force_lateral = np.abs(df['Gf. Y'].to_numpy(dtype=np.float64) / 9.8)
+    peaks, _ = find_peaks(g_force_lateral, height=g_force_threshold, distance=min_distance)
+    
+    if max_corners is not None and len(peaks) > max_corners:
+        sorted_indices = np.argsort(g_force_lateral[peaks])[::-1]
+        peaks = peaks[sorted_indices[:max_corners]]
+    
+    return peaks
+
 
 class RefinedCornerClassifier:
     def __init__(self, reference_lap_path: str):
@@ -14,11 +96,11 @@ class RefinedCornerClassifier:
             reference_lap_path (str): 基準となるラップのCSVファイルパス
         """
         # CSVファイルの読み込み
-        self.reference_df = pd.read_csv(reference_lap_path, sep=',', encoding='utf-8')
-        self.reference_df.columns = [col.strip() for col in self.reference_df.columns]
+        self.reference_df = load_lap_csv(reference_lap_path)
         
-        # コーナー検出と特徴量計算
+        # コーナー検出と特徴量計算（特徴量は分類のたびに再計算しないよう保持する）
         self.reference_corners = self._detect_corners_with_features()
+        self.reference_features = self._calculate_corner_features(self.reference_df, self.reference_corners)
     
     def _calculate_corner_features(self, df: pd.DataFrame, indices: np.ndarray) -> np.ndarray:
         """
@@ -31,24 +113,24 @@ class RefinedCornerClassifier:
         Returns:
             np.ndarray: コーナーの特徴量
         """
-        features = []
-        for idx in indices:
-            # 周辺データポイントの範囲（前後50ポイント）
-            start = max(0, idx - 50)
-            end = min(len(df), idx + 50)
-            
-            # 特徴量計算
-            section = df.iloc[start:end]
-            feature = [
-                df['Gf. Y'].iloc[idx] / 9.8,  # 横G
-                np.mean(section['Speed GPS']),  # 平均速度
-                np.std(section['Speed GPS']),  # 速度の標準偏差
-                np.mean(section['RPM']),  # 平均RPM
-                np.std(section['RPM']),  # RPMの標準偏差
-            ]
-            features.append(feature)
-        
-        return np.array(features)
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return np.empty((0, 5))
+        
+        # 周辺データポイントの範囲（前後50ポイント）
+        starts = np.maximum(0, indices - FEATURE_HALF_WINDOW)
+        ends = np.minimum(len(df), indices + FEATURE_HALF_WINDOW)
+        
+        speed_mean, speed_std = _window_mean_std(df['Speed GPS'].to_numpy(dtype=np.float64), starts, ends)
+        rpm_mean, rpm_std = _window_mean_std(df['RPM'].to_numpy(dtype=np.float64), starts, ends)
+        
+        return np.column_stack((
+            df['Gf. Y'].to_numpy(dtype=np.float64)[indices] / 9.8,  # 横G
+            speed_mean,  # 平均速度
+            speed_std,  # 速度の標準偏差
+            rpm_mean,  # 平均RPM
+            rpm_std,  # RPMの標準偏差
+        ))
     
     def _detect_corners_with_features(self, 
                                       g_force_threshold: float = 0.2, 
@@ -65,23 +147,79 @@ class RefinedCornerClassifier:
         Returns:
             List[int]: 検出されたコーナーのインデックス
         """
-        # G-Forceに基づくコーナー検出
-        g_force_lateral = np.abs(self.reference_df['Gf. Y'] / 9.8)
+        return detect_corner_peaks(self.reference_df, g_force_threshold, min_distance, max_corners)
+    
+    def _match_corners(self, distances: np.ndarray, peaks: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        特徴量距離の行列から、距離の合計が最小になるコーナーの対応を求める（ハンガリアン法）
         
-        # ピーク検出
-        peaks, _ = find_peaks(
-            g_force_lateral, 
-            height=g_force_threshold, 
-            distance=min_distance
-        )
+        Args:
+            distances (np.ndarray): 基準コーナー × 新しいラップのコーナーの特徴量距離
+            peaks (np.ndarray): 新しいラップのコーナーインデックス
         
-        # コーナーの最大数を制限
-        if max_corners is not None and len(peaks) > max_corners:
-            # G-Forceの大きさでソートし、上位のコーナーを選択
-            sorted_indices = np.argsort(g_force_lateral[peaks])[::-1]
-            peaks = peaks[sorted_indices[:max_corners]]
+        Returns:
+            List[Dict[str, Any]]: 基準コーナー順の対応（コーナー数の少ない側の数だけ対応が付く。
+            特徴量が NaN で距離を計算できない組み合わせは対応に含めない）
+        """
+        if distances.size == 0:
+            return []
+        # 距離が NaN の組み合わせは、有効な組み合わせの距離の合計より大きいコストにして
+        # 割り当てを解き（linear_sum_assignment は NaN を受け付けない）、対応からは除く
+        finite = np.isfinite(distances)
+        if not finite.any():
+            return []
+        cost = np.where(finite, distances, distances[finite].sum() + 1.0)
+        ref_rows, new_cols = linear_sum_assignment(cost)
+        return [
+            {
+                'reference_corner_index': self.reference_corners[i],
+                'new_lap_corner_index': peaks[j],
+                'feature_distance': distances[i, j]
+            }
+            for i, j in zip(ref_rows, new_cols)
+            if finite[i, j]
+        ]
+    
+    def classify_laps(self, laps: Union[List[str], Dict[Any, Union[str, pd.DataFrame]]],
+                      max_corners: int = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        複数ラップのコーナーをまとめて基準ラップに対応付ける
+        
+        全ラップのコーナー特徴量を連結して基準コーナーとの距離を一度に計算し、
+        ラップごとに最適な対応付けを行う。
+        
+        Args:
+            laps: ラップのCSVファイルパスのリスト、または {キー: CSVパスまたはラップデータ}
+            max_corners (int, optional): 各ラップで検出するコーナーの最大数
+        
+        Returns:
+            Dict[Any, Dict[str, Any]]: {キー（パス）: classify_lap と同じ形式の分類結果}
+        """
+        if not isinstance(laps, dict):
+            laps = {lap_path: lap_path for lap_path in laps}
+        
+        lap_peaks = {}
+        lap_features = []
+        for key, lap in laps.items():
+            lap_df = load_lap_csv(lap) if isinstance(lap, str) else lap
+            peaks = detect_corner_peaks(lap_df, max_corners=max_corners)
+            lap_peaks[key] = peaks
+            lap_features.append(self._calculate_corner_features(lap_df, peaks))
         
-        return peaks
+        # 全ラップのコーナーとの特徴量距離（基準コーナー × 全ラップのコーナー）
+        all_features = np.vstack(lap_features) if lap_features else np.empty((0, 5))
+        all_distances = cdist(self.reference_features, all_features)
+        offsets = np.concatenate(([0], np.cumsum([len(p) for p in lap_peaks.values()])))
+        
+        results = {}
+        for n, (key, peaks) in enumerate(lap_peaks.items()):
+            distances = all_distances[:, offsets[n]:offsets[n + 1]]
+            results[key] = {
+                'corner_mapping': self._match_corners(distances, peaks),
+                'total_corners_ref': len(self.reference_corners),
+                'total_corners_new': len(peaks)
+            }
+        return results
     
     def classify_lap(self, lap_path: str, 
                      max_corners: int = None) -> Dict[str, Any]:
@@ -95,51 +233,7 @@ class RefinedCornerClassifier:
         Returns:
             Dict[str, Any]: コーナー分類結果
         """
-        # 新しいラップデータの読み込み
-        lap_df = pd.read_csv(lap_path, sep=',', encoding='utf-8')
-        lap_df.columns = [col.strip() for col in lap_df.columns]
-        
-        # 新しいラップのコーナー検出
-        g_force_lateral = np.abs(lap_df['Gf. Y'] / 9.8)
-        peaks, _ = find_peaks(
-            g_force_lateral, 
-            height=0.2, 
-            distance=10
-        )
-        
-        # コーナーの最大数を制限
-        if max_corners is not None and len(peaks) > max_corners:
-            sorted_indices = np.argsort(g_force_lateral[peaks])[::-1]
-            peaks = peaks[sorted_indices[:max_corners]]
-        
-        # 参照と新しいラップのコーナー特徴量計算
-        ref_corner_features = self._calculate_corner_features(self.reference_df, self.reference_corners)
-        new_corner_features = self._calculate_corner_features(lap_df, peaks)
-        
-        # 特徴量に基づくマッチング
-        feature_distances = cdist(ref_corner_features, new_corner_features)
-        
-        # コーナーマッピング
-        corner_mapping = []
-        used_new_corners = set()
-        
-        for i, ref_corner_idx in enumerate(self.reference_corners):
-            # 最も近い特徴量を持つコーナーを見つける
-            best_match = np.argmin(feature_distances[i, :])
-            
-            if best_match not in used_new_corners:
-                corner_mapping.append({
-                    'reference_corner_index': ref_corner_idx,
-                    'new_lap_corner_index': peaks[best_match],
-                    'feature_distance': feature_distances[i, best_match]
-                })
-                used_new_corners.add(best_match)
-        
-        return {
-            'corner_mapping': corner_mapping,
-            'total_corners_ref': len(self.reference_corners),
-            'total_corners_new': len(peaks)
-        }
+        return self.classify_laps([lap_path], max_corners=max_corners)[lap_path]
     
     def visualize_corner_mapping(self, classification_result: Dict[str, Any], 
                                  reference_lap_path: str, 
@@ -153,8 +247,8 @@ class RefinedCornerClassifier:
             other_lap_path (str): 比較するラップのCSVパス
         """
         # データ読み込み
-        ref_df = pd.read_csv(reference_lap_path, sep=',', encoding='utf-8')
-        other_df = pd.read_csv(other_lap_path, sep=',', encoding='utf-8')
+        ref_df = load_lap_csv(reference_lap_path)
+        other_df = load_lap_csv(other_lap_path)
         
         plt.figure(figsize=(12, 8))
         
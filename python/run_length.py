@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def find_runs(mask, min_length=1, groups=None):
+    """真偽値マスクの連続区間（ラン）を開始・終了インデックスの配列にまとめる関数
+
+    np.diff でマスクの立ち上がり・立ち下がりを求めるため、
+    Pythonのループなしで全区間を一括で取得できる。
+
+    Parameters:
+    -----------
+    mask : array-like of bool
+        判定結果（NaNを含む比較は False として扱われる）
+    min_length : int
+        区間として残す最小の連続ポイント数
+    groups : array-like, optional
+        ラップ番号など。値が変わる位置では区間を分割する
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (開始インデックス, 終了インデックス)。終了インデックスは区間に含まれる
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if groups is not None:
+        groups = np.asarray(groups)
+        # グループの値が切り替わる位置（新しいグループの先頭）
+        boundary = np.concatenate(([False], groups[1:] != groups[:-1]))
+    else:
+        boundary = np.zeros(len(mask), dtype=bool)
+
+    # ランの開始: マスクが立ち上がる位置、またはグループ境界でマスクが真の位置
+    prev = np.concatenate(([False], mask[:-1]))
+    starts = np.flatnonzero(mask & (~prev | boundary))
+    # ランの終了: 次のポイントでマスクが偽になる位置、または次がグループ境界
+    nxt = np.concatenate((mask[1:], [False]))
+    next_boundary = np.concatenate((boundary[1:], [True]))
+    ends = np.flatnonzero(mask & (~nxt | next_boundary))
+
+    keep = (ends - starts + 1) >= min_length
+    return starts[keep], ends[keep]
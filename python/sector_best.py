@@ -0,0 +1,231 @@
+import pandas as pd
+import numpy as np
+from collections import namedtuple
+import json
+
+# ラップの識別子（ドライバー・セッション・ラップ番号）
+LapKey = namedtuple('LapKey', ['driver', 'session', 'lap'])
+
+
+def _lap_key(key):
+    """タプル・ラップ番号などを LapKey に揃える"""
+    if isinstance(key, LapKey):
+        return key
+    if isinstance(key, tuple) and len(key) == 3:
+        return LapKey(*key)
+    return LapKey(None, None, key)
+
+
+class SectorBestIndex:
+    """セクターごとのベストタイムの索引（理論ベストラップの計算用）
+
+    ラップ・セッション・ドライバーをまたいでセクターごとの最速タイムと、そのタイムを
+    出したラップを保持する。ラップの追加はセクター数に比例する処理だけで済み、
+    既存のラップを走査し直すことはない。
+    つなぎ合わせた走行データ（ベストセクターのトレース）を作るため、いずれかの
+    セクターでベストを保持しているラップのリサンプリング済みデータだけを残す。
+    """
+
+    def __init__(self, n_sectors):
+        self.n_sectors = n_sectors
+        self.best_times = np.full(n_sectors, np.inf)
+        self.best_laps = [None] * n_sectors
+        self.lap_sector_times = {}
+        # ベストを保持しているラップのトレース {LapKey: (トレース, セクター境界の経過時間)}
+        self._traces = {}
+
+    def add_lap(self, key, sector_times, trace=None, gate_times=None):
+        """ラップのセクタータイムを追加し、ベストを更新したセクター番号（0始まり）のリストを返す
+
+        Parameters:
+        -----------
+        key : LapKey or tuple or int
+            ラップの識別子（(ドライバー, セッション, ラップ番号) またはラップ番号）
+        sector_times : array-like
+            セクタータイム [秒]（未計測のセクターは NaN / None）
+        trace : pd.DataFrame, optional
+            lap_resample.resample_lap の距離グリッド（'Distance', 'Elapsed' と各チャンネル）
+        gate_times : array-like, optional
+            トレースと同じ時間軸（ラップ開始からの経過時間 [秒]）のゲート通過時刻
+            （sector_engine.crossing_matrix のラップの行）。trace を指定する場合は必須。
+            ゲート数がセクター数と同じなら周回コースとして、最終セクターを
+            最後のゲート → ラップ終了とラップ開始 → 最初のゲートの2つの区間から切り出す
+        """
+        key = _lap_key(key)
+        times = np.array([np.nan if t is None else t for t in sector_times], dtype=np.float64)
+        if len(times) != self.n_sectors:
+            raise ValueError(f"セクター数が一致しません: {len(times)} (期待値: {self.n_sectors})")
+        if trace is not None:
+            gate_times = self._check_gate_times(gate_times)
+
+        if key in self.lap_sector_times:
+            # 同じラップの再登録はベストが入れ替わる可能性があるため作り直す
+            self.lap_sector_times[key] = times
+            self._rebuild()
+            improved = [s for s in range(self.n_sectors) if self.best_laps[s] == key]
+        else:
+            self.lap_sector_times[key] = times
+            improved = [s for s in range(self.n_sectors) if times[s] < self.best_times[s]]
+            replaced = set()
+            for s in improved:
+                if self.best_laps[s] is not None:
+                    replaced.add(self.best_laps[s])
+                self.best_times[s] = times[s]
+                self.best_laps[s] = key
+            # どのセクターのベストも持たなくなったラップのトレースは破棄する
+            for old_key in replaced:
+                if old_key not in self.best_laps:
+                    self._traces.pop(old_key, None)
+
+        if trace is not None and key in self.best_laps:
+            self._traces[key] = (trace, gate_times)
+        return improved
+
+    def _check_gate_times(self, gate_times):
+        """トレースを切り出すゲート通過時刻を検証する"""
+        if gate_times is None:
+            raise ValueError("トレースを追加する場合はゲート通過時刻（gate_times）が必要です")
+        gate_times = np.asarray(gate_times, dtype=np.float64)
+        if len(gate_times) not in (self.n_sectors, self.n_sectors + 1):
+            raise ValueError(
+                f"ゲート数が一致しません: {len(gate_times)} (期待値: {self.n_sectors} または {self.n_sectors + 1})"
+            )
+        if not np.isfinite(gate_times).all() or (np.diff(gate_times) <= 0).any():
+            raise ValueError("全ゲートを走行順に通過していないラップのトレースは切り出せません")
+        return gate_times
+
+    def _sector_spans(self, s, gate_times, elapsed):
+        """セクター s のトレース上の時間区間 [(開始, 終了), ...]（周回コースの最終セクターは2区間）"""
+        if s + 1 < len(gate_times):
+            return [(gate_times[s], gate_times[s + 1])]
+        # 最終セクター: 最後のゲート → ラップ終了、ラップ開始 → 最初のゲート
+        return [(gate_times[-1], elapsed[-1]), (elapsed[0], gate_times[0])]
+
+    def _rebuild(self):
+        keys = list(self.lap_sector_times)
+        if not keys:
+            self.best_times[:] = np.inf
+            self.best_laps = [None] * self.n_sectors
+            return
+        table = np.vstack([self.lap_sector_times[k] for k in keys])
+        filled = np.where(np.isnan(table), np.inf, table)
+        best_idx = np.argmin(filled, axis=0)
+        self.best_times = filled[best_idx, np.arange(self.n_sectors)]
+        self.best_laps = [keys[i] if np.isfinite(t) else None for i, t in zip(best_idx, self.best_times)]
+        self._traces = {k: v for k, v in self._traces.items() if k in self.best_laps}
+
+    def theoretical_best(self):
+        """理論ベストラップタイム（全セクターのベストの合計、未計測のセクターがあれば NaN）"""
+        if not np.isfinite(self.best_times).all():
+            return np.nan
+        return float(self.best_times.sum())
+
+    def lap_gap(self, key):
+        """ラップのセクターごとのロスと理論ベストとの差 [秒] を返す"""
+        times = self.lap_sector_times[_lap_key(key)]
+        losses = times - self.best_times
+        return float(np.sum(losses)), losses
+
+    def best_sectors(self):
+        """セクターごとのベストタイムと、そのタイムを出したラップの一覧"""
+        rows = []
+        for s in range(self.n_sectors):
+            owner = self.best_laps[s] or LapKey(None, None, None)
+            rows.append({
+                'Sector': s + 1,
+                'BestTime': self.best_times[s] if np.isfinite(self.best_times[s]) else np.nan,
+                'Driver': owner.driver,
+                'Session': owner.session,
+                'Lap': owner.lap,
+            })
+        return pd.DataFrame(rows)
+
+    def lap_gaps(self):
+        """全ラップのラップタイム（セクター合計）・理論ベストとの差・セクターごとのロス"""
+        keys = list(self.lap_sector_times)
+        columns = ['Driver', 'Session', 'Lap', 'LapTime', 'Gap'] + [f'Sector{s + 1}Loss' for s in range(self.n_sectors)]
+        if not keys:
+            return pd.DataFrame(columns=columns)
+        table = np.vstack([self.lap_sector_times[k] for k in keys])
+        losses = table - self.best_times
+        df = pd.DataFrame({
+            'Driver': [k.driver for k in keys],
+            'Session': [k.session for k in keys],
+            'Lap': [k.lap for k in keys],
+            'LapTime': table.sum(axis=1),
+            'Gap': losses.sum(axis=1),
+        })
+        for s in range(self.n_sectors):
+            df[f'Sector{s + 1}Loss'] = losses[:, s]
+        return df[columns]
+
+    def stitched_trace(self):
+        """ベストセクターの走行データをつなぎ合わせたトレースを返す
+
+        各セクターのベストラップのトレースから、ゲート通過時刻の間の区間を切り出して
+        セクター順に連結する（最初のゲートから始まり、周回コースなら最初のゲートで終わる）。
+        'Distance' と 'Elapsed' はつなぎ目で連続するように補正し、'Sector' と出典のラップを付ける。
+        """
+        pieces = []
+        distance_offset = 0.0
+        elapsed_offset = 0.0
+        for s, key in enumerate(self.best_laps):
+            if key is None or key not in self._traces:
+                raise ValueError(f"セクター{s + 1} のベストラップのトレースがありません")
+            trace, gate_times = self._traces[key]
+            elapsed = trace['Elapsed'].to_numpy()
+            distance = trace['Distance'].to_numpy()
+            for t_start, t_end in self._sector_spans(s, gate_times, elapsed):
+                # 区間の境界の距離（経過時間から補間）
+                d_start, d_end = np.interp([t_start, t_end], elapsed, distance)
+                piece = trace[(distance >= d_start) & (distance < d_end)].copy()
+                if not piece.empty:
+                    piece['Distance'] = piece['Distance'] - d_start + distance_offset
+                    piece['Elapsed'] = piece['Elapsed'] - t_start + elapsed_offset
+                    piece['Sector'] = s + 1
+                    piece['Driver'], piece['Session'], piece['Lap'] = key.driver, key.session, key.lap
+                    pieces.append(piece)
+                distance_offset += d_end - d_start
+                elapsed_offset += t_end - t_start
+        if not pieces:
+            return pd.DataFrame()
+        return pd.concat(pieces, ignore_index=True)
+
+    def to_dict(self):
+        """セクタータイムの索引をJSON保存用の辞書に変換する（トレースは含まない）"""
+        return {
+            'n_sectors': self.n_sectors,
+            'laps': [
+                {**k._asdict(), 'sector_times': [None if np.isnan(t) else float(t) for t in v]}
+                for k, v in self.lap_sector_times.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data['n_sectors'])
+        for lap in data['laps']:
+            index.add_lap(LapKey(lap['driver'], lap['session'], lap['lap']), lap['sector_times'])
+        return index
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def index_from_sector_csv(path, driver=None, session=None, index=None):
+    """sector_times_per_lap.csv（Lap × Sector1..N）のラップを索引に追加する関数"""
+    df = pd.read_csv(path)
+    sector_columns = [col for col in df.columns if col.startswith('Sector')]
+    if index is None:
+        index = SectorBestIndex(len(sector_columns))
+    laps = df['Lap'].to_numpy()
+    times = df[sector_columns].to_numpy(dtype=np.float64)
+    for lap, sector_times in zip(laps, times):
+        index.add_lap(LapKey(driver, session, int(lap)), sector_times)
+    return index
@@ -0,0 +1,171 @@
+import pandas as pd
+import numpy as np
+
+from gate_crossing import find_gate_crossings
+
+
+def lap_index(lap):
+    """ラップ番号の配列を (ラップ番号の一覧, 各サンプルの行番号) にする（NaN のラップは行番号 -1）"""
+    lap = np.asarray(lap, dtype=np.float64)
+    valid = ~np.isnan(lap)
+    laps = np.unique(lap[valid])
+    rows = np.full(len(lap), -1, dtype=np.int64)
+    rows[valid] = np.searchsorted(laps, lap[valid])
+    return laps, rows
+
+
+def crossing_matrix(crossings, laps, n_gates):
+    """ゲート通過の一覧をラップ × ゲートの最初の通過時刻の配列にまとめる関数
+
+    find_gate_crossings の結果（同じゲートを複数回通過していてもよい）を
+    ラップ・ゲートごとの最小時刻で1回の集約にかける。通過しなかったゲートは NaN。
+    """
+    gate_times = np.full((len(laps), n_gates), np.inf)
+    if len(crossings):
+        rows = np.searchsorted(laps, crossings['Lap'].to_numpy(dtype=np.float64))
+        np.minimum.at(gate_times, (rows, crossings['Gate'].to_numpy()), crossings['Time'].to_numpy(dtype=np.float64))
+    gate_times[np.isinf(gate_times)] = np.nan
+    return gate_times
+
+
+def valid_laps(gate_times):
+    """全ゲートを走行順に通過したラップ（セクターを判定できるラップ）"""
+    complete = np.isfinite(gate_times).all(axis=1)
+    with np.errstate(invalid='ignore'):
+        ordered = (np.diff(gate_times, axis=1) > 0).all(axis=1)
+    return complete & ordered
+
+
+def assign_sectors(rows, t, gate_times, closed=True):
+    """全サンプルのセクター番号（1始まり）を一括で求める関数
+
+    各ラップのゲート通過時刻を「行番号 × 幅 + 時刻」で1本の昇順の配列に並べ、
+    サンプルの時刻を np.searchsorted で探して通過済みのゲート数を数える。
+    ゲート i と i+1 の間がセクター i+1。周回コース（closed=True）では最後のゲート以降と
+    最初のゲートより前を最終セクター（最後のゲート → 最初のゲート）とする。
+
+    Parameters:
+    -----------
+    rows : array-like
+        各サンプルのラップの行番号（lap_index の戻り値、-1 は判定しない）
+    t : array-like
+        各サンプルのラップ内の時刻 [秒]
+    gate_times : np.ndarray
+        crossing_matrix の戻り値（ラップ × ゲート）
+    closed : bool
+        周回コースとして最終セクターを加えるか（False ならゲート数 - 1 セクター）
+
+    Returns:
+    --------
+    np.ndarray
+        セクター番号（判定できないサンプルは 0）
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    t = np.asarray(t, dtype=np.float64)
+    n_laps, n_gates = gate_times.shape
+    sectors = np.zeros(len(t), dtype=np.int64)
+    if n_laps == 0 or n_gates == 0:
+        return sectors
+
+    lap_ok = valid_laps(gate_times)
+    sample_ok = (rows >= 0) & np.isfinite(t)
+    sample_ok[sample_ok] = lap_ok[rows[sample_ok]]
+    if not sample_ok.any():
+        return sectors
+
+    # ラップごとの時刻の区間が重ならないように行番号 × 幅だけずらす
+    low = min(np.nanmin(gate_times[lap_ok]), t[sample_ok].min())
+    high = max(np.nanmax(gate_times[lap_ok]), t[sample_ok].max())
+    width = high - low + 1.0
+    offset = np.arange(n_laps, dtype=np.float64)[:, np.newaxis] * width
+    # 判定しないラップはゲート時刻を区間の先頭に揃え、全体の昇順を保つ
+    keys = offset + np.where(lap_ok[:, np.newaxis], gate_times - low, 0.0)
+
+    r = rows[sample_ok]
+    passed = np.searchsorted(keys.ravel(), r * width + (t[sample_ok] - low), side='right') - r * n_gates
+
+    inside = (passed >= 1) & (passed <= n_gates - 1)
+    if closed:
+        sectors[sample_ok] = np.where(inside, passed, n_gates)
+    else:
+        sectors[sample_ok] = np.where(inside, passed, 0)
+    return sectors
+
+
+def sector_times(gate_times, lap_times=None, closed=True):
+    """全ラップのセクタータイム（補間したゲート通過時刻の差）を一括で求める関数
+
+    セクター i（ゲート i-1 → i）は通過時刻の差。周回コースの最終セクターは
+    ラップ内で最後のゲート → ラップ終了と、ラップ開始 → 最初のゲートの合計
+    （lap_times - (最後のゲート - 最初のゲート)）で、全セクターの合計がラップタイムになる。
+
+    Parameters:
+    -----------
+    gate_times : np.ndarray
+        crossing_matrix の戻り値（ラップ × ゲート）
+    lap_times : array-like, optional
+        ラップタイム [秒]（closed=True の最終セクターに使う。省略時は最終セクターは NaN）
+    closed : bool
+        周回コースとして最終セクターを加えるか
+
+    Returns:
+    --------
+    np.ndarray
+        セクタータイム（ラップ × セクター、判定できないラップは NaN）
+    """
+    n_laps, n_gates = gate_times.shape
+    times = np.diff(gate_times, axis=1)
+    if closed:
+        if lap_times is None:
+            last = np.full(n_laps, np.nan)
+        else:
+            last = np.asarray(lap_times, dtype=np.float64) - (gate_times[:, -1] - gate_times[:, 0])
+        times = np.column_stack((times, last))
+    times[~valid_laps(gate_times)] = np.nan
+    return times
+
+
+def session_sectors(x, y, t, lap, gates, lap_times=None, closed=True, lines=None):
+    """セッション全体のゲート通過検出・セクター判定・セクタータイム計算をまとめて行う関数
+
+    Parameters:
+    -----------
+    x, y : array-like
+        軌跡のローカル座標 [m]
+    t : array-like
+        各サンプルのラップ内の時刻 [秒]
+    lap : array-like
+        各サンプルのラップ番号
+    gates : array-like
+        走行順のゲート線分 [((x1, y1), (x2, y2)), ...]（任意の数）
+    lap_times : dict or pd.Series, optional
+        {ラップ番号: ラップタイム [秒]}（周回コースの最終セクターに使う）
+    closed : bool
+        周回コースとして最後のゲート → 最初のゲートをセクターに加えるか
+    lines : tuple, optional
+        gate_crossing.gate_lines(gates) の戻り値（Circuit.gate_lines, Circuit.gate_lengths）
+
+    Returns:
+    --------
+    tuple
+        (各サンプルのセクター番号（判定できないサンプルは 0）,
+         'Sector1', 'Sector2', ... のカラムを持つラップごとのセクタータイム（index: Lap、
+         判定できないラップは含めない）,
+         ラップ × ゲートの通過時刻)
+    """
+    lap = np.asarray(lap, dtype=np.float64)
+    laps, rows = lap_index(lap)
+    n_gates = len(np.asarray(gates, dtype=np.float64).reshape(-1, 2, 2))
+
+    crossings = find_gate_crossings(x, y, t, gates, lap=lap, lines=lines)
+    gate_times = crossing_matrix(crossings, laps, n_gates)
+
+    if lap_times is not None:
+        lap_times = pd.Series(lap_times, dtype=np.float64).reindex(laps).to_numpy()
+    times = sector_times(gate_times, lap_times, closed)
+
+    table = pd.DataFrame(
+        times, index=pd.Index(laps, name='Lap'),
+        columns=[f"Sector{i + 1}" for i in range(times.shape[1])]
+    ).dropna(how='all')
+    return assign_sectors(rows, t, gate_times, closed), table, gate_times
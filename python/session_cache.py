@@ -0,0 +1,139 @@
+import pandas as pd
+import hashlib
+import json
+import os
+
+# キャッシュ形式や読み込み処理が変わったら上げる（古いキャッシュは自動的に無効になる）
+CACHE_VERSION = 2
+
+# 既定のキャッシュディレクトリ名（元ファイルと同じディレクトリに作成）
+CACHE_DIR_NAME = '.session_cache'
+
+# Parquetはpyarrowがある場合のみ使用し、無ければpickleで保存する
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """ファイル内容のSHA-1ハッシュを計算する関数"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(file_path, namespace, cache_dir):
+    """キャッシュ本体とメタ情報ファイルのパスを返す"""
+    abs_path = os.path.abspath(file_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(abs_path), CACHE_DIR_NAME)
+    name = hashlib.sha1(f"{abs_path}|{namespace}".encode('utf-8')).hexdigest()[:20]
+    base = os.path.join(cache_dir, f"{os.path.basename(abs_path)}.{name}")
+    return base, base + '.meta.json'
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_frame(base, df):
+    """データフレームを列指向形式で保存し、保存形式を返す"""
+    if HAS_PYARROW:
+        tmp_path = base + '.parquet.tmp'
+        try:
+            df.to_parquet(tmp_path, index=True)
+            os.replace(tmp_path, base + '.parquet')
+            return 'parquet'
+        except Exception:
+            # 型が混在した列などParquet化できない場合はpickleに切り替える
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    tmp_path = base + '.pkl.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, base + '.pkl')
+    return 'pickle'
+
+
+def _read_frame(base, fmt):
+    if fmt == 'parquet':
+        return pd.read_parquet(base + '.parquet')
+    return pd.read_pickle(base + '.pkl')
+
+
+def load_cached_frame(file_path, loader, namespace='raw', cache_dir=None, use_cache=True):
+    """キャッシュを確認してからデータフレームを読み込む関数
+
+    キーは元ファイルのパス・更新時刻・内容ハッシュ。更新時刻とサイズが
+    一致すればハッシュ計算も省略し、更新時刻だけ変わった場合は内容ハッシュで
+    同一性を確認する。ヒットしなければ loader で読み込んで保存する。
+
+    Parameters:
+    -----------
+    file_path : str
+        元データ（CSV）のパス
+    loader : callable
+        file_path を受け取り、解析済みのデータフレームを返す関数
+    namespace : str
+        読み込み処理の種類（前処理の有無などでキャッシュを分ける）
+    cache_dir : str, optional
+        キャッシュディレクトリ。指定がなければ元ファイルと同じ場所の .session_cache
+    use_cache : bool
+        False の場合はキャッシュを使わず loader を直接呼ぶ
+
+    Returns:
+    --------
+    pd.DataFrame
+    """
+    if not use_cache:
+        return loader(file_path)
+
+    base, meta_path = _cache_paths(file_path, namespace, cache_dir)
+    stat = os.stat(file_path)
+    meta = _read_meta(meta_path)
+
+    if meta is not None and meta.get('version') == CACHE_VERSION and meta.get('size') == stat.st_size:
+        hit = meta.get('mtime_ns') == stat.st_mtime_ns
+        if not hit and meta.get('sha1') == file_digest(file_path):
+            # 内容は同じで更新時刻だけ変わった場合
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+            hit = True
+        if hit:
+            try:
+                return _read_frame(base, meta['format'])
+            except Exception as e:
+                print(f"キャッシュの読み込みに失敗したため再解析します: {e}")
+
+    df = loader(file_path)
+
+    try:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        fmt = _write_frame(base, df)
+        _write_meta(meta_path, {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(file_path),
+            'namespace': namespace,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_digest(file_path),
+            'format': fmt
+        })
+    except OSError as e:
+        print(f"キャッシュの保存に失敗しました: {e}")
+
+    return df
@@ -0,0 +1,255 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import json
+import os
+
+from session_cache import CACHE_DIR_NAME
+
+# 保存形式を変えたら上げる（古いファイルは読み込まずに作り直す）
+STATS_VERSION = 1
+
+# 既定の保存先ファイル名（データと同じディレクトリの .session_cache に作成）
+STATS_FILE_NAME = 'correlation_stats.npz'
+
+# 一度に読み込む行数
+DEFAULT_CHUNKSIZE = 200000
+
+# 行番号などの統計に使わないカラム
+EXCLUDED_COLUMNS = {'id', 'cluster'}
+
+
+def default_stats_path(file_path):
+    """データファイルに対応する既定の統計ファイルのパスを返す"""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, STATS_FILE_NAME)
+
+
+class CorrelationAccumulator:
+    """平均・共分散・相関をチャンクごとに更新し、セッション間で統合できる集計器
+
+    DataFrame.corr() と同じく欠損値はカラムの組ごとに除外する（両方に値がある行だけを使う）。
+    そのため件数・平均・二乗偏差和・共偏差和をカラムの組（K × K）ごとに保持し、
+    チャンク内の集計は行列積で一括計算して Chan らの方法で統合する。
+    """
+
+    def __init__(self, columns=None):
+        self.columns = []
+        k = 0
+        self.count = np.zeros((k, k))
+        # mean[i, j]: カラム i と j の両方に値がある行でのカラム i の平均
+        self.mean = np.zeros((k, k))
+        # m2[i, j]: 同じ行でのカラム i の二乗偏差和、comoment[i, j]: i と j の共偏差和
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+        if columns is not None:
+            self._extend_columns(list(columns))
+
+    def _extend_columns(self, columns):
+        """未知のカラムを追加する（既存の集計は件数0のカラムとの組として広げる）"""
+        new = [col for col in columns if col not in self.columns]
+        if not new:
+            return
+        k_old = len(self.columns)
+        k = k_old + len(new)
+        for name in ('count', 'mean', 'm2', 'comoment'):
+            grown = np.zeros((k, k))
+            grown[:k_old, :k_old] = getattr(self, name)
+            setattr(self, name, grown)
+        self.columns = self.columns + new
+
+    def _aligned(self, columns):
+        """columns の並びをこの集計器のカラム位置に対応させる"""
+        self._extend_columns(columns)
+        position = {col: i for i, col in enumerate(self.columns)}
+        return np.array([position[col] for col in columns], dtype=np.int64)
+
+    def _merge_arrays(self, idx, count, mean, m2, comoment):
+        """別の集計結果（カラム位置 idx の部分行列）を統合する"""
+        grid = np.ix_(idx, idx)
+        count_a = self.count[grid]
+        mean_a = self.mean[grid]
+        total = count_a + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, count / total, 0.0)
+            cross = np.where(total > 0, count_a * count / total, 0.0)
+        delta = mean - mean_a
+        self.mean[grid] = mean_a + delta * weight
+        self.m2[grid] = self.m2[grid] + m2 + delta ** 2 * cross
+        self.comoment[grid] = self.comoment[grid] + comoment + delta * delta.T * cross
+        self.count[grid] = total
+
+    def update(self, chunk):
+        """チャンク（DataFrame）の数値カラムで集計を更新する"""
+        columns = [
+            col for col in chunk.select_dtypes(include=[np.number]).columns
+            if col not in EXCLUDED_COLUMNS
+        ]
+        if not columns or len(chunk) == 0:
+            return self
+        values = chunk[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        valid = ~np.isnan(values)
+        v = valid.astype(np.float64)
+        # 桁落ちを避けるため、チャンク内のカラム平均を引いてから積和を取る
+        n_valid = v.sum(axis=0)
+        shift = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(n_valid, 1)
+        x = np.where(valid, values - shift, 0.0)
+
+        count = v.T @ v
+        sums = x.T @ v                    # sums[i, j]: i と j の両方に値がある行での x_i の合計
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, sums / count, 0.0)
+            m2 = (x ** 2).T @ v - np.where(count > 0, sums ** 2 / count, 0.0)
+            comoment = x.T @ x - np.where(count > 0, sums * sums.T / count, 0.0)
+        mean = mean + shift[:, np.newaxis]
+
+        self._merge_arrays(self._aligned(columns), count, mean, np.maximum(m2, 0.0), comoment)
+        return self
+
+    def merge(self, other):
+        """別の集計器（別セッションなど）の結果を統合する"""
+        if other.columns:
+            self._merge_arrays(self._aligned(other.columns), other.count, other.mean, other.m2, other.comoment)
+        return self
+
+    @property
+    def n_rows(self):
+        """カラムごとの有効な値の数"""
+        return pd.Series(np.diag(self.count).astype(np.int64), index=self.columns)
+
+    def means(self):
+        """カラムごとの平均"""
+        with np.errstate(invalid='ignore'):
+            return pd.Series(np.where(np.diag(self.count) > 0, np.diag(self.mean), np.nan), index=self.columns)
+
+    def cov(self, ddof=1):
+        """共分散行列（DataFrame.cov と同じくカラムの組ごとに欠損値を除外）"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.count > ddof, self.comoment / (self.count - ddof), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """相関行列（DataFrame.corr と同じくカラムの組ごとに欠損値を除外）"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr = np.where((self.count > 1) & np.isfinite(corr), np.clip(corr, -1.0, 1.0), np.nan)
+        # 分散が0でないカラムの対角は1にする
+        diag = np.diag(self.m2) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diag, 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def to_arrays(self, prefix=''):
+        return {
+            f'{prefix}columns': np.array(self.columns, dtype=str),
+            f'{prefix}count': self.count,
+            f'{prefix}mean': self.mean,
+            f'{prefix}m2': self.m2,
+            f'{prefix}comoment': self.comoment,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=''):
+        acc = cls()
+        acc.columns = arrays[f'{prefix}columns'].tolist()
+        for name in ('count', 'mean', 'm2', 'comoment'):
+            setattr(acc, name, np.array(arrays[f'{prefix}{name}'], dtype=np.float64))
+        return acc
+
+
+def accumulate_file(file_path, chunksize=DEFAULT_CHUNKSIZE, sep=';'):
+    """CSVを1回走査して集計器を作る関数"""
+    acc = CorrelationAccumulator()
+    for chunk in pd.read_csv(file_path, sep=sep, chunksize=chunksize):
+        acc.update(chunk)
+    return acc
+
+
+class CorrelationStore:
+    """セッションごとの集計結果を保存し、まとめた相関行列を再集計なしで返すストア
+
+    ファイルのサイズ・更新時刻が保存時と同じセッションは読み直さない。
+    変更されたファイルはそのセッションの集計だけを作り直す。
+    path が None のストアはファイルを読み書きしない（1回の実行の中だけで使う）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sessions = {}
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != STATS_VERSION:
+                    return
+                for n, info in enumerate(meta['sessions']):
+                    self.sessions[info['session']] = {
+                        'size': info['size'],
+                        'mtime_ns': info['mtime_ns'],
+                        'updated_at': info['updated_at'],
+                        'stats': CorrelationAccumulator.from_arrays(data, prefix=f's{n}_'),
+                    }
+        except (OSError, ValueError, KeyError):
+            # 壊れたファイルは空のストアとして扱う（次の保存で作り直す）
+            self.sessions = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        arrays = {}
+        meta_sessions = []
+        for n, (session, info) in enumerate(self.sessions.items()):
+            arrays.update(info['stats'].to_arrays(prefix=f's{n}_'))
+            meta_sessions.append({
+                'session': session,
+                'size': info['size'],
+                'mtime_ns': info['mtime_ns'],
+                'updated_at': info['updated_at'],
+            })
+        arrays['meta'] = np.array(json.dumps({'version': STATS_VERSION, 'sessions': meta_sessions}, ensure_ascii=False))
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.path)
+        return self.path
+
+    def is_current(self, file_path):
+        info = self.sessions.get(os.path.abspath(file_path))
+        if info is None:
+            return False
+        stat = os.stat(file_path)
+        return info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns
+
+    def add_file(self, file_path, chunksize=DEFAULT_CHUNKSIZE, sep=';', save=True, frame=None):
+        """セッションファイルの集計を追加する（保存済みで変更が無ければ読み込まない）
+
+        frame を渡した場合は、ファイルを読み直さずに読み込み済みの DataFrame から集計する。
+        """
+        session = os.path.abspath(file_path)
+        if not self.is_current(session):
+            stat = os.stat(session)
+            if frame is not None:
+                stats = CorrelationAccumulator().update(frame)
+            else:
+                stats = accumulate_file(session, chunksize, sep)
+            self.sessions[session] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'stats': stats,
+            }
+            if save and self.path is not None:
+                self.save()
+        return self.sessions[session]['stats']
+
+    def remove(self, file_path):
+        self.sessions.pop(os.path.abspath(file_path), None)
+
+    def combined(self, sessions=None):
+        """保存済みセッション（または指定したセッション）の集計を統合して返す"""
+        acc = CorrelationAccumulator()
+        keys = self.sessions if sessions is None else [os.path.abspath(s) for s in sessions]
+        for key in keys:
+            acc.merge(self.sessions[key]['stats'])
+        return acc
@@ -0,0 +1,386 @@
+import pandas as pd
+import numpy as np
+import csv
+
+# --- 対応フォーマット ---
+# 'alfano'   : Alfano本体のセミコロン区切りCSV（data/alfano_data.csv）
+# 'dashware' : Dashwareエクスポート（1行目 "ALFANO"、2行目ヘッダー、3行目単位）
+# 'lap'      : ラップ単位のカンマ区切りCSV（LAP_n_ALFANO6_*.csv, test-lap*.csv）
+# 'merged'   : test2/merge.py で Dashware とラップファイルを結合したCSV
+FORMATS = ('alfano', 'dashware', 'lap', 'merged')
+
+# 正規化後のカラム順（Alfano本体CSVの名前に揃える）
+CANONICAL_COLUMNS = [
+    'Lap', 'Time Lap', 'Strip', 'Time Strip', 'Absolute Time', 'Time',
+    'RPM', 'Speed GPS', 'T1', 'T2', 'Gf. X', 'Gf. Y', 'Orientation',
+    'Speed rear', 'Lat.', 'Lon.', 'Altitude', 'Partiel'
+]
+
+# 精度が必要なカラム（緯度経度・時間）はfloat64、それ以外のチャンネルはfloat32
+# （ラップ番号は前方補完して int32）
+FLOAT64_COLUMNS = {'Time Lap', 'Time Strip', 'Absolute Time', 'Time', 'Lat.', 'Lon.'}
+
+# mm:ss.SSS 形式の可能性がある時間カラム（型はCパーサーの推論に任せる）
+TIME_TEXT_COLUMNS = {'Time Lap', 'Time Strip'}
+
+# Dashwareのカラム名（単位を除いた名前）→ 正規化後の名前
+# Dashwareは加速度の軸名がAlfano本体と逆になっている（A. Lat. = Gf. X）
+DASHWARE_COLUMN_MAP = {
+    'Lap': 'Lap',
+    'Time Lap': 'Time Lap',
+    'Strip': 'Strip',
+    'Time Strip': 'Time Strip',
+    'Absolute Time': 'Absolute Time',
+    'Time': 'Time',
+    'RPM': 'RPM',
+    'Speed #2': 'Speed GPS',
+    'Speed #3': 'Speed rear',
+    'Ntc1': 'T1',
+    'K2': 'T2',
+    'A. Lat.': 'Gf. X',
+    'A. Long.': 'Gf. Y',
+    'GPS Lat.': 'Lat.',
+    'GPS Long.': 'Lon.',
+}
+
+# ラップファイルの生値 → 物理量への変換（scale, offset）: value = (raw - offset) / scale
+LAP_FILE_UNITS = {
+    'Partiel': (1, 0),
+    'RPM': (1, 0),
+    'Speed GPS': (10, 0),
+    'T1': (10, 0),
+    'T2': (10, 0),
+    'Gf. X': (100, 1000),
+    'Gf. Y': (100, 1000),
+    'Orientation': (1, 0),
+    'Speed rear': (10, 0),
+    'Lat.': (1e6, 0),
+    'Lon.': (1e6, 0),
+    'Altitude': (10, 0),
+}
+
+
+# 時間カラムの単位表記 → 1秒あたりのカウント数
+# Alfano / Dashware のエクスポートはこれらのカラムにも秒の値を書き出しており、
+# 単位表記は記録分解能を表すだけなので、既定では換算しない
+TIME_UNIT_TICKS = {
+    '[1/100 s]': 100,
+    '[1/10 s]': 10,
+}
+
+
+def _text_to_float(text):
+    """文字列の配列を float64 に変換する（変換できない値が混ざる場合だけ pandas で NaN にする）"""
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        return pd.to_numeric(pd.Series(text, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _parse_time_text(text):
+    """"[mm:]ss[.SSS]" 形式・秒の文字列を列単位でまとめて秒に変換する（変換できない値は NaN）
+
+    ':' で1回だけ分割し、空欄を除いた値を numpy の型変換でまとめて数値にする。
+    """
+    text = np.char.strip(np.asarray(text, dtype=str))
+    if not len(text):
+        return np.empty(0)
+    minutes, colon, secs = np.char.partition(text, ':').T
+    has_colon = colon == ':'
+    plain = ~has_colon & (text != '')
+
+    seconds = np.full(len(text), np.nan)
+    seconds[plain] = _text_to_float(text[plain])
+    if has_colon.any():
+        seconds[has_colon] = _text_to_float(minutes[has_colon]) * 60 + _text_to_float(secs[has_colon])
+    return seconds
+
+
+def time_to_seconds(values, ticks_per_second=None):
+    """時間の値を列単位でまとめて秒に変換する関数
+
+    "mm:ss.SSS" 形式の文字列、秒の数値（文字列も可）、空欄（NaN）を扱う。
+    変換できない値はNaNになる。数値の列はそのまま float64 にする。
+
+    Parameters:
+    -----------
+    values : array-like
+        時間の値（pd.Series など）
+    ticks_per_second : int, optional
+        値がカウント値（1/100秒単位など）の場合の換算係数
+
+    Returns:
+    --------
+    pd.Series
+        秒単位の float64（元の index を保持）
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        seconds = series.to_numpy(dtype=np.float64)
+    else:
+        text = series.astype(object).where(series.notna(), '').to_numpy().astype(str)
+        seconds = _parse_time_text(text)
+
+    if ticks_per_second:
+        seconds = seconds / ticks_per_second
+    return pd.Series(seconds, index=series.index)
+
+
+def time_column_to_seconds(df, column, raw_ticks=False):
+    """カラム名の単位表記（[1/100 s] など）を考慮して時間カラムを秒に変換する関数
+
+    raw_ticks=True の場合のみ、単位表記に従ってカウント値を秒に換算する。
+    """
+    ticks = None
+    if raw_ticks:
+        for unit, count in TIME_UNIT_TICKS.items():
+            if column.endswith(unit):
+                ticks = count
+                break
+    return time_to_seconds(df[column], ticks_per_second=ticks)
+
+
+def detect_format(file_path):
+    """ファイルの先頭行からフォーマットを判定する関数"""
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        first = f.readline()
+
+    if first.lstrip('"').upper().startswith('ALFANO'):
+        return 'dashware'
+    if ';' in first:
+        return 'alfano'
+
+    header = [col.strip().strip('"') for col in first.split(',')]
+    if 'Partiel' in header:
+        return 'merged' if 'Lap' in header else 'lap'
+    if header and header[0] == 'Lap':
+        return 'dashware'
+    raise ValueError(f"未対応のファイル形式です: {file_path}")
+
+
+def _format_dashware_column(name, unit):
+    """Dashwareの2段ヘッダーを "名前 [単位]" に整形する"""
+    name = name.strip()
+    unit = (unit or '').strip()
+    if unit == '':
+        return name
+    if unit.startswith('[') and unit.endswith(']'):
+        return f"{name} {unit}"
+    return f"{name} [{unit}]"
+
+
+def _base_name(column):
+    """"名前 [単位]" から単位部分を除いた名前を返す"""
+    return column.split(' [')[0].strip()
+
+
+def _read_header(file_path, fmt):
+    """フォーマットごとにカラム名と読み飛ばす行数を返す"""
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        reader = csv.reader(f, delimiter=';' if fmt == 'alfano' else ',')
+        if fmt == 'dashware':
+            first = next(reader)
+            if first and first[0].strip().upper().startswith('ALFANO'):
+                names, units = next(reader), next(reader)
+                units = units + [''] * (len(names) - len(units))
+                return [_format_dashware_column(n, u) for n, u in zip(names, units)], 3
+            return [col.strip() for col in first], 1
+        return [col.strip() for col in next(reader)], 1
+
+
+def _column_plan(columns, fmt):
+    """読み込むカラム（位置）と、正規化後の名前・単位変換の対応を作る
+
+    Returns:
+    --------
+    list of tuple
+        (列位置, 正規化後の名前, 単位変換 (scale, offset) または None)
+    """
+    plan = {}
+    for pos, col in enumerate(columns):
+        if fmt == 'alfano':
+            target, unit = (col, None) if col in CANONICAL_COLUMNS else (None, None)
+        elif fmt == 'lap':
+            target, unit = (col, LAP_FILE_UNITS.get(col)) if col in LAP_FILE_UNITS else (None, None)
+        else:
+            # dashware / merged: 単位付きの名前はDashware側、単位なしの名前はラップファイル側
+            base = _base_name(col)
+            if col in LAP_FILE_UNITS and fmt == 'merged':
+                target, unit = col, LAP_FILE_UNITS[col]
+            elif base in DASHWARE_COLUMN_MAP:
+                target, unit = DASHWARE_COLUMN_MAP[base], None
+            else:
+                target, unit = None, None
+
+        # 同じ名前に複数のカラムが対応する場合は、単位変換の要らない方（先に出た方）を優先
+        if target is None:
+            continue
+        if target not in plan or (plan[target][2] is not None and unit is None):
+            plan[target] = (pos, target, unit)
+
+    return sorted(plan.values(), key=lambda item: CANONICAL_COLUMNS.index(item[1]))
+
+
+def read_telemetry(file_path, fmt=None, normalize=True, usecols=None):
+    """テレメトリーCSVを形式を自動判定して読み込む関数
+
+    usecols 付きで pandas のCパーサーに一度だけ通し、数値として読めたカラムはそのまま使う。
+    ロガーの書き込み途中の行などで数値以外の値が混ざったカラムだけ、
+    pd.to_numeric(errors='coerce') でその値を NaN にする（ファイル全体の読み込みは失敗させない）。
+
+    Parameters:
+    -----------
+    file_path : str
+        CSVファイルのパス
+    fmt : str, optional
+        'alfano' / 'dashware' / 'lap' / 'merged'。指定がなければ自動判定
+    normalize : bool
+        True ならカラム名と単位をAlfano本体CSVに揃え（Lat.は度、Gは G 単位）、
+        空欄のLapを前方補完して int32 にする。
+        False なら元のカラム名・単位のまま読み込む
+    usecols : list, optional
+        正規化後のカラム名で読み込む列を限定する（normalize=True の場合のみ）
+
+    Returns:
+    --------
+    pd.DataFrame
+    """
+    if fmt is None:
+        fmt = detect_format(file_path)
+    if fmt not in FORMATS:
+        raise ValueError(f"未対応のフォーマットです: {fmt}")
+
+    columns, skiprows = _read_header(file_path, fmt)
+    sep = ';' if fmt == 'alfano' else ','
+
+    if not normalize:
+        # 元のカラム名のまま（Dashwareは "名前 [単位]" に整形）読み込む
+        return pd.read_csv(
+            file_path, sep=sep, header=None, skiprows=skiprows, names=columns,
+            encoding='utf-8-sig'
+        )
+
+    plan = _column_plan(columns, fmt)
+    if usecols is not None:
+        plan = [item for item in plan if item[1] in usecols]
+
+    raw = pd.read_csv(
+        file_path, sep=sep, header=None, skiprows=skiprows,
+        usecols=[pos for pos, _, _ in plan], encoding='utf-8-sig'
+    )
+    df, _ = _normalize_frame(raw, plan)
+    return df
+
+
+def _normalize_frame(raw, plan, last_lap=None):
+    """読み込んだ生データのカラム名・単位・型を揃える
+
+    Parameters:
+    -----------
+    raw : pd.DataFrame
+        列位置をカラム名とする読み込み結果
+    plan : list
+        _column_plan の戻り値
+    last_lap : float, optional
+        直前のチャンクの最後のラップ番号（チャンクをまたいで前方補完するため）
+
+    Returns:
+    --------
+    tuple
+        (正規化したデータフレーム, このチャンクの最後のラップ番号)
+    """
+    data = {}
+    for pos, target, unit in plan:
+        values = raw[pos]
+        if not pd.api.types.is_numeric_dtype(values):
+            if target in TIME_TEXT_COLUMNS:
+                # mm:ss.SSS 形式の時間はそのまま残す（preprocess_dataで秒に変換）
+                data[target] = values.to_numpy()
+                continue
+            # 数値以外の値（壊れた行など）は NaN にする
+            values = pd.to_numeric(values, errors='coerce')
+        values = values.to_numpy(dtype=np.float64)
+        if unit is not None:
+            scale, offset = unit
+            values = (values - offset) / scale
+
+        if target == 'Lap':
+            # 継続行ではLapが空欄なので直前のラップ番号で埋める
+            lap = pd.Series(values).ffill()
+            if last_lap is not None:
+                lap = lap.fillna(last_lap)
+            if len(lap):
+                last_lap = lap.iloc[-1]
+            data[target] = lap.fillna(0).to_numpy().astype(np.int32)
+        elif target in FLOAT64_COLUMNS:
+            data[target] = values
+        else:
+            data[target] = values.astype(np.float32)
+
+    return pd.DataFrame(data), last_lap
+
+
+def iter_laps(file_path, fmt=None, chunksize=50000, usecols=None):
+    """ファイルをチャンク単位で読み込み、完了したラップから順に返すジェネレーター
+
+    Lapの値が変わった時点でそのラップを確定して返すため、
+    メモリ上に保持するのは読み込み中のチャンクと未完了の1ラップ分だけになる。
+    カラム名・単位は read_telemetry(normalize=True) と同じ。
+
+    Parameters:
+    -----------
+    file_path : str
+        CSVファイルのパス
+    fmt : str, optional
+        ファイル形式。指定がなければ自動判定
+    chunksize : int
+        一度に読み込む行数
+    usecols : list, optional
+        正規化後のカラム名で読み込む列を限定する
+
+    Yields:
+    -------
+    tuple
+        (ラップ番号, ラップデータ)
+    """
+    if fmt is None:
+        fmt = detect_format(file_path)
+    if fmt not in FORMATS:
+        raise ValueError(f"未対応のフォーマットです: {fmt}")
+
+    columns, skiprows = _read_header(file_path, fmt)
+    plan = _column_plan(columns, fmt)
+    if usecols is not None:
+        plan = [item for item in plan if item[1] in usecols or item[1] == 'Lap']
+    if not any(target == 'Lap' for _, target, _ in plan):
+        # ラップ番号の無い形式（ラップ単位のファイル）はファイル全体で1ラップ
+        yield 1, read_telemetry(file_path, fmt=fmt, usecols=usecols)
+        return
+
+    reader = pd.read_csv(
+        file_path, sep=';' if fmt == 'alfano' else ',', header=None, skiprows=skiprows,
+        usecols=[pos for pos, _, _ in plan], encoding='utf-8-sig', chunksize=chunksize
+    )
+
+    pending = None
+    last_lap = None
+    for raw in reader:
+        chunk, last_lap = _normalize_frame(raw, plan, last_lap)
+        if chunk.empty:
+            continue
+
+        # チャンク内でラップ番号が変わる位置で分割
+        lap_values = chunk['Lap'].to_numpy()
+        bounds = np.concatenate(([0], np.flatnonzero(lap_values[1:] != lap_values[:-1]) + 1, [len(chunk)]))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            piece = chunk.iloc[start:end]
+            lap_num = int(lap_values[start])
+            if pending is not None and pending[0] == lap_num:
+                pending = (lap_num, pending[1] + [piece])
+                continue
+            if pending is not None:
+                yield pending[0], pd.concat(pending[1], ignore_index=True)
+            pending = (lap_num, [piece])
+
+    if pending is not None:
+        yield pending[0], pd.concat(pending[1], ignore_index=True)
@@ -1,39 +1,26 @@
 import pandas as pd
-import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from trajectory_lod import export_trajectories
 
 # --- ファイルパスの定義 ---
 csv_data_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test\dashware_data_with_sector_column.csv"
 csv_summary_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test\sector_times_per_lap.csv"
-json_output_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\nextjs-app\public\sector_data.json"
+# ラップ・詳細度ごとの軌跡（<ラップ>_<レベル>.bin）と索引 index.json の出力先
+output_dir = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\nextjs-app\public\sector_data"
 
 # --- CSVの読み込み ---
 df_data = pd.read_csv(csv_data_path)
 df_summary = pd.read_csv(csv_summary_path)
 
-# --- Time_sec を補完（もし未定義なら） ---
+# --- Time_sec を補完（もし未定義なら、"Time [1/10 s]" の値は秒） ---
 if "Time_sec" not in df_data.columns and "Time [1/10 s]" in df_data.columns:
-    df_data["Time_sec"] = df_data["Time [1/10 s]"] * 0.1
-
-# --- Lapごとにデータを統合して JSON 化 ---
-combined = []
-
-for lap in sorted(df_data["Lap"].dropna().unique()):
-    lap_points = df_data[df_data["Lap"] == lap][["x", "y", "Time_sec", "Sector"]].to_dict(orient="records")
-
-    sector_times_row = df_summary[df_summary["Lap"] == lap]
-    if not sector_times_row.empty:
-        sector_times = sector_times_row.drop(columns=["Lap"]).iloc[0].to_dict()
-    else:
-        sector_times = {}
-
-    combined.append({
-        "lap": int(lap),
-        "sectorTimes": sector_times,
-        "points": lap_points
-    })
+    df_data["Time_sec"] = df_data["Time [1/10 s]"]
 
-# --- JSONとして保存 ---
-with open(json_output_path, "w", encoding="utf-8") as f:
-    json.dump(combined, f, ensure_ascii=False, indent=2)
+# --- Lapごとに詳細度別の軌跡を書き出す ---
+index = export_trajectories(df_data, output_dir, sector_times=df_summary)
 
-print(f"✅ JSONファイルを保存しました → {json_output_path}")
+total_points = sum(lap["levels"][0]["points"] for lap in index["laps"])
+print(f"✅ {len(index['laps'])} ラップ（{total_points} ポイント, {len(index['levels'])} レベル）を保存しました → {output_dir}")
@@ -1,7 +1,16 @@
-
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lap_resample import latlon_to_xy, normalize_latlon, xy_to_latlon
+from circuit_registry import Circuit, circuit_path, load_circuit
+
+# 保存先のサーキット名（circuits/<名前>.json）と定義するゲート数
+CIRCUIT_NAME = 'mobara'
+N_GATES = 6
 
 # CSVファイルの読み込み（パスを変更してください）
 df_lap2 = pd.read_csv("test-lap2.csv")
@@ -11,15 +20,37 @@ df_lap3 = pd.read_csv("test-lap3.csv")
 df_lap2.rename(columns={'Lat.': 'Lat', 'Lon.': 'Lon'}, inplace=True)
 df_lap3.rename(columns={'Lat.': 'Lat', 'Lon.': 'Lon'}, inplace=True)
 
-# 中心点を共通化
-lat0 = df_lap2['Lat'].mean()
-lon0 = df_lap2['Lon'].mean()
-R = 6378137  # 地球半径
+# 中心点を共通化（登録済みのサーキットはその基準点、未登録なら Lap2 の中心）
+if os.path.exists(circuit_path(CIRCUIT_NAME)):
+    circuit = load_circuit(CIRCUIT_NAME)
+    lat0, lon0 = circuit.lat0, circuit.lon0
+else:
+    circuit = None
+    lat, lon = normalize_latlon(df_lap2['Lat'], df_lap2['Lon'])
+    lat0, lon0 = float(np.nanmean(lat)), float(np.nanmean(lon))
 
-# 緯度経度→相対XY座標に変換
+# 緯度経度→相対XY座標 [m] に変換
 for df in [df_lap2, df_lap3]:
-    df['x'] = (df['Lon'] - lon0) * (np.pi / 180) * R * np.cos(np.deg2rad(lat0 / 1e6))
-    df['y'] = (df['Lat'] - lat0) * (np.pi / 180) * R
+    df['x'], df['y'] = latlon_to_xy(df['Lat'], df['Lon'], lat0, lon0)
+
+
+def save_gates(points):
+    """クリックした点の組をゲート（緯度経度）としてサーキット定義に保存する"""
+    lat, lon = xy_to_latlon([p[0] for p in points], [p[1] for p in points], lat0, lon0)
+    gates = [
+        {
+            'name': f"Gate {i // 2 + 1}",
+            'start': [round(float(lat[i]), 8), round(float(lon[i]), 8)],
+            'end': [round(float(lat[i + 1]), 8), round(float(lon[i + 1]), 8)],
+        }
+        for i in range(0, len(points), 2)
+    ]
+    if circuit is not None:
+        # コーナー領域など、ゲート以外の定義はそのまま残す
+        updated = Circuit.from_dict({**circuit.to_dict(), 'gates': gates})
+    else:
+        updated = Circuit(CIRCUIT_NAME, lat0, lon0, gates)
+    return updated.save()
 
 # クリック処理
 clicked_points = []
@@ -34,16 +65,15 @@ def onclick(event):
             plt.plot(x_vals, y_vals, 'r--', label=f'Gate {len(clicked_points)//2}')
             plt.legend()
             plt.draw()
-        if len(clicked_points) == 12:
-            print("すべての仮想ラインを選択しました。座標：")
-            for i in range(0, 12, 2):
-                print(f"Gate {i//2 + 1}: Start={clicked_points[i]}, End={clicked_points[i+1]}")
+        if len(clicked_points) == N_GATES * 2:
+            path = save_gates(clicked_points)
+            print(f"すべての仮想ラインを選択しました。サーキット定義に保存しました → {path}")
             fig.canvas.mpl_disconnect(cid)
 
 fig, ax = plt.subplots(figsize=(10, 8))
 ax.plot(df_lap2['x'], df_lap2['y'], label='Lap2', linewidth=2)
 ax.plot(df_lap3['x'], df_lap3['y'], label='Lap3', linewidth=2, linestyle='--')
-ax.set_title("Click 12 Points (6 Gates) to Define Sector Gates")
+ax.set_title(f"Click {N_GATES * 2} Points ({N_GATES} Gates) to Define Sector Gates")
 ax.set_xlabel("X [m]")
 ax.set_ylabel("Y [m]")
 ax.axis('equal')
@@ -1,6 +1,19 @@
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import os
 import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from telemetry_io import read_telemetry
+
+# ラップファイル・Dashwareのサンプリング周波数 [Hz]（結合キーのサンプル番号の計算に使う）
+SAMPLE_RATE = 10
+
+# 結合結果をCSVに書き出す単位（行数）
+WRITE_BATCH_ROWS = 50000
+
 
 def load_and_format_dashware_csv(file_path):
     # 2行目: ヘッダー, 3行目: 単位
@@ -25,52 +38,142 @@ def load_and_format_dashware_csv(file_path):
 
     return df
 
-def merge_lap_segments_preserving_order(dashware_df, lapdata_folder):
+def _lap_files(lapdata_folder):
+    """フォルダ内のラップファイル [(ラップ番号, パス), ...] をラップ番号順に返す"""
     lap_entries = []
-
     for filename in os.listdir(lapdata_folder):
         if filename.endswith(".csv"):
             match = re.search(r"LAP_(\d+)", filename)
             if match:
-                lap_num = int(match.group(1))
-                filepath = os.path.join(lapdata_folder, filename)
-                lap_entries.append((lap_num, filepath))
-
+                lap_entries.append((int(match.group(1)), os.path.join(lapdata_folder, filename)))
     lap_entries.sort(key=lambda x: x[0])  # Lap番号順に並べ替え
-
-    final_df_list = []
-
-    for lap_num, filepath in lap_entries:
-        dash_segment = dashware_df[dashware_df.iloc[:, 0] == lap_num].copy().reset_index(drop=True)
-
-        # Lap列を明示的に挿入
-        dash_segment.insert(0, "Lap", lap_num)
-
-        lap_segment = pd.read_csv(filepath).reset_index(drop=True)
-        merged = pd.concat([dash_segment, lap_segment], axis=1)
-        final_df_list.append(merged)
-
-    final_df = pd.concat(final_df_list, ignore_index=True)
-    return final_df
-
-
-# 🔧 使用パスの指定
-dashware_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test2\dashware_SN13239_120425_13H49_AKIRA 1__P__MOBARA__01_08_24_12_3351.csv"
-lap_folder = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test2\Lapdata"
-
-# Dashware整形処理（保存せずそのまま利用）
-dashware_df = load_and_format_dashware_csv(dashware_path)
-
-# Lap別ファイルとの結合処理
-df_combined = merge_lap_segments_preserving_order(dashware_df, lap_folder)
-
-# A列（Lap列）の空白行を削除
-lap_col = df_combined.columns[0]
-df_combined = df_combined[df_combined[lap_col].notna()]
-df_combined = df_combined[df_combined[lap_col].astype(str).str.strip() != ""]
-
-# 保存
-output_path = os.path.join(os.path.dirname(lap_folder), "dashware_lap_combined_filled.csv")
-df_combined.to_csv(output_path, index=False)
-
-print(f"✅ Lapごとの結合とA列補正を含めた処理が完了しました：{output_path}")
+    return lap_entries
+
+
+def _time_column(df):
+    """Dashwareの経過時間カラム（"Time [1/10 s]" など、無ければ None）"""
+    for col in df.columns:
+        if col.split(" [")[0].strip() == "Time":
+            return col
+    return None
+
+
+def partition_by_lap(dashware_df):
+    """Dashwareデータをラップ番号で1回だけ安定ソートし、ラップごとの区間とサンプル番号を求める関数
+
+    サンプル番号はラップ開始からの経過時間をサンプリング間隔で割ったもの
+    （時間カラムが無い・欠けているラップはラップ内の行番号）。欠落したサンプルが
+    あってもラップファイルの同じ時刻の行と対応する。
+
+    Returns:
+    --------
+    tuple
+        (Lap列を先頭に加えてラップ順に並べたデータ, サンプル番号の配列,
+         {ラップ番号: (開始行, 終了行+1)})
+    """
+    lap_values = dashware_df.iloc[:, 0].to_numpy()
+    rows = np.flatnonzero(pd.notna(lap_values))
+    order = rows[np.argsort(lap_values[rows], kind="stable")]
+    laps_sorted = lap_values[order]
+
+    data = dashware_df.take(order).reset_index(drop=True)
+    # Lap列を明示的に挿入
+    data.insert(0, "Lap", laps_sorted)
+
+    bounds = np.flatnonzero(np.concatenate(([True], laps_sorted[1:] != laps_sorted[:-1], [True])))
+    starts = bounds[:-1]
+    lengths = np.diff(bounds)
+    row_in_lap = np.arange(len(data)) - np.repeat(starts, lengths)
+
+    sample = row_in_lap
+    time_col = _time_column(dashware_df)
+    if time_col is not None and len(data):
+        elapsed = data[time_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        elapsed = elapsed - np.repeat(elapsed[starts], lengths)
+        missing = np.repeat(np.add.reduceat(np.isnan(elapsed), starts) > 0, lengths)
+        with np.errstate(invalid="ignore"):
+            sample = np.where(missing, row_in_lap, np.rint(np.nan_to_num(elapsed) * SAMPLE_RATE)).astype(np.int64)
+
+    laps = {int(laps_sorted[start]): (start, start + length) for start, length in zip(starts, lengths)}
+    return data, sample, laps
+
+
+def _read_lap_file(filepath):
+    """ラップファイルを読み込む（ラップファイルは等間隔で時間カラムが無いため、行番号がサンプル番号）"""
+    return read_telemetry(filepath, fmt='lap', normalize=False)
+
+
+def iter_merged_laps(dashware_df, lapdata_folder, max_workers=None):
+    """ラップごとに Dashware とラップファイルを結合して、ラップ番号順に返すジェネレーター
+
+    ラップファイルはスレッドプールで並行して読み込み、(Lap, サンプル番号) をキーに
+    Dashware 側の行へ結合する（Dashware に無いサンプル・ラップは含めない）。
+    """
+    data, sample, laps = partition_by_lap(dashware_df)
+    lap_entries = [(lap_num, filepath) for lap_num, filepath in _lap_files(lapdata_folder) if lap_num in laps]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        lap_frames = executor.map(_read_lap_file, [filepath for _, filepath in lap_entries])
+        for (lap_num, _), lap_segment in zip(lap_entries, lap_frames):
+            start, end = laps[lap_num]
+            segment = data.iloc[start:end].reset_index(drop=True)
+            # ラップファイルの行番号（= サンプル番号）で Dashware の各行に対応する行を取り出す
+            lap_rows = lap_segment.reindex(sample[start:end]).reset_index(drop=True)
+            yield lap_num, pd.concat([segment, lap_rows], axis=1)
+
+
+def merge_lap_segments_preserving_order(dashware_df, lapdata_folder, max_workers=None):
+    """全ラップを結合した DataFrame を返す関数"""
+    merged = [df for _, df in iter_merged_laps(dashware_df, lapdata_folder, max_workers)]
+    if not merged:
+        return pd.DataFrame()
+    return pd.concat(merged, ignore_index=True)
+
+
+def write_merged_laps(dashware_df, lapdata_folder, output_path, max_workers=None, batch_rows=WRITE_BATCH_ROWS):
+    """結合したラップを batch_rows 行程度ずつCSVへ追記する関数（全ラップをメモリ上で連結しない）
+
+    Returns:
+    --------
+    int
+        書き出した行数
+    """
+    rows = 0
+    columns = None
+    batch = []
+    batch_size = 0
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        def flush():
+            # ラップファイルによってカラムが欠けていても、先頭ラップのカラム順で書き出す
+            pd.concat(batch, ignore_index=True).reindex(columns=columns).to_csv(f, index=False, header=(rows == 0))
+
+        for _, merged in iter_merged_laps(dashware_df, lapdata_folder, max_workers):
+            if columns is None:
+                columns = merged.columns
+            batch.append(merged)
+            batch_size += len(merged)
+            if batch_size >= batch_rows:
+                flush()
+                rows += batch_size
+                batch, batch_size = [], 0
+        if batch:
+            flush()
+            rows += batch_size
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+if __name__ == "__main__":
+    # 🔧 使用パスの指定
+    dashware_path = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test2\dashware_SN13239_120425_13H49_AKIRA 1__P__MOBARA__01_08_24_12_3351.csv"
+    lap_folder = r"C:\Users\MasatoOkada\Documents\Python Scripts\Alfano Analysis App\python\test2\Lapdata"
+
+    # Dashware整形処理（保存せずそのまま利用）
+    dashware_df = load_and_format_dashware_csv(dashware_path)
+
+    # Lap別ファイルとの結合処理（ラップごとに結合して順に保存）
+    output_path = os.path.join(os.path.dirname(lap_folder), "dashware_lap_combined_filled.csv")
+    rows = write_merged_laps(dashware_df, lap_folder, output_path)
+
+    print(f"✅ Lapごとの結合が完了しました（{rows} 行）：{output_path}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# テスト対象のモジュールは python/ 直下にある（パッケージ化していない）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
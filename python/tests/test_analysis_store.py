@@ -0,0 +1,151 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from analysis_store import (
+    AnalysisStore, STORE_SCHEMA_VERSION, lap_content_hash, open_store, parameters_hash
+)
+
+
+def _record(lap, lap_hash='h', params_hash='p', lap_time=36.0):
+    return {
+        'lap': lap,
+        'lap_hash': lap_hash,
+        'params_hash': params_hash,
+        'row_count': 10,
+        'lap_time': lap_time,
+        'corners': [{'corner': 1, 'max_g': np.float64(1.2)}],
+        'operations': {'brake': np.int64(3)},
+        'sectors': None
+    }
+
+
+def test_lap_results_round_trip(tmp_path):
+    with open_store(db_path=str(tmp_path / 'store.sqlite')) as store:
+        store.put_lap_results('session.csv', [_record(1), _record(2, lap_time=np.nan)])
+        results = store.get_lap_results('session.csv')
+
+    assert sorted(results) == [1, 2]
+    assert results[1]['lap_time'] == 36.0
+    assert results[2]['lap_time'] is None
+    # numpy の値はJSONに変換されて読み戻せる
+    assert results[1]['corners'] == [{'corner': 1, 'max_g': 1.2}]
+    assert results[1]['operations'] == {'brake': 3}
+    assert results[1]['sectors'] is None
+
+
+def test_put_overwrites_and_remove_other_laps(tmp_path):
+    with open_store(db_path=str(tmp_path / 'store.sqlite')) as store:
+        store.put_lap_results('session.csv', [_record(1), _record(2), _record(3)])
+        store.put_lap_results('session.csv', [_record(2, lap_hash='new')])
+        store.put_lap_results('other.csv', [_record(1)])
+
+        store.remove_other_laps('session.csv', [1, 2])
+        results = store.get_lap_results('session.csv')
+        assert sorted(results) == [1, 2]
+        assert results[2]['lap_hash'] == 'new'
+
+        store.remove_other_laps('session.csv', [])
+        assert store.get_lap_results('session.csv') == {}
+        # 他のセッションの結果は残る
+        assert sorted(store.get_lap_results('other.csv')) == [1]
+
+
+def test_results_persist_across_connections(tmp_path):
+    db_path = str(tmp_path / 'store.sqlite')
+    with open_store(db_path=db_path) as store:
+        store.put_lap_results('session.csv', [_record(1)])
+    # 同じバージョンのストアを開き直しても消えない
+    with open_store(db_path=db_path) as store:
+        assert sorted(store.get_lap_results('session.csv')) == [1]
+
+
+def test_old_schema_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / 'store.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE lap_results (session TEXT, lap INTEGER)")
+    conn.execute("INSERT INTO lap_results VALUES ('session.csv', 1)")
+    conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION - 1}")
+    conn.commit()
+    conn.close()
+
+    with AnalysisStore(db_path) as store:
+        assert store.get_lap_results('session.csv') == {}
+        store.put_lap_results('session.csv', [_record(1)])
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == STORE_SCHEMA_VERSION
+    conn.close()
+
+
+def test_lap_content_hash_tracks_values_and_dtypes():
+    lap = pd.DataFrame({'Lap': [1, 1, 1], 'Speed GPS': [50.0, 51.0, 52.0]})
+    same = lap.copy()
+    changed = lap.copy()
+    changed.loc[2, 'Speed GPS'] = 52.5
+    retyped = lap.astype({'Speed GPS': 'float32'})
+
+    assert lap_content_hash(lap) == lap_content_hash(same)
+    # インデックスは内容に含めない
+    assert lap_content_hash(lap) == lap_content_hash(lap.set_index(pd.Index([10, 11, 12])))
+    assert lap_content_hash(lap) != lap_content_hash(changed)
+    assert lap_content_hash(lap) != lap_content_hash(retyped)
+
+
+def test_parameters_hash_ignores_key_order():
+    a = {'threshold': 0.5, 'gates': np.array([[0.0, 1.0], [2.0, 3.0]])}
+    b = {'gates': [[0.0, 1.0], [2.0, 3.0]], 'threshold': np.float64(0.5)}
+
+    assert parameters_hash(a) == parameters_hash(b)
+    assert parameters_hash(a) != parameters_hash({**b, 'threshold': 0.6})
+
+
+def _categories():
+    return {
+        1: {'time': 36.2, 'diff_from_best': 0.3, 'category': 'average'},
+        2: {'time': 35.9, 'diff_from_best': 0.0, 'category': 'success'},
+        3: {'time': 36.1, 'diff_from_best': 0.2, 'category': 'average'},
+        4: {'time': 37.5, 'diff_from_best': 1.6, 'category': 'miss'}
+    }
+
+
+def test_publish_and_query_lap_categories(tmp_path):
+    session = tmp_path / 'session.csv'
+    session.write_text("Lap\n1\n", encoding='utf-8')
+    session = str(session)
+
+    with open_store(db_path=str(tmp_path / 'store.sqlite')) as store:
+        store.publish_lap_categories(session, _categories(), 35.9)
+
+        assert store.is_session_current(session)
+        info = store.get_session(session)
+        assert info['lap_count'] == 4
+        assert info['best_lap_time'] == 35.9
+
+        assert sorted(store.get_lap_categories(session)) == [1, 2, 3, 4]
+        # 分類を指定するとタイム順で返す
+        assert list(store.get_lap_categories(session, 'average')) == [3, 1]
+        assert list(store.get_lap_categories(session, 'success')) == [2]
+
+        # 再公開すると以前の分類は置き換わる
+        store.publish_lap_categories(session, {2: _categories()[2]}, 35.9, lap_count=4)
+        assert list(store.get_lap_categories(session)) == [2]
+        assert store.get_session(session)['lap_count'] == 4
+
+        assert [row['session'] for row in store.list_sessions(str(tmp_path))] == [session]
+        assert store.list_sessions(str(tmp_path / 'elsewhere')) == []
+
+
+def test_session_goes_stale_when_file_changes(tmp_path):
+    session = tmp_path / 'session.csv'
+    session.write_text("Lap\n1\n", encoding='utf-8')
+
+    with open_store(db_path=str(tmp_path / 'store.sqlite')) as store:
+        assert not store.is_session_current(str(session))
+        store.publish_lap_categories(str(session), _categories(), float('nan'))
+        assert store.get_session(str(session))['best_lap_time'] is None
+        assert store.is_session_current(str(session))
+
+        session.write_text("Lap\n1\n2\n", encoding='utf-8')
+        assert not store.is_session_current(str(session))
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from circuit_registry import Circuit, load_circuit
+from gate_crossing import find_gate_crossings
+from lap_resample import xy_to_latlon
+
+LAT0, LON0 = 35.38, 140.28
+
+
+def _circuit(tmp_path=None):
+    # x = 10 と x = 30 の縦向きのゲート、y = 5 付近のコーナー
+    gates = []
+    for gx in (10.0, 30.0):
+        lat, lon = xy_to_latlon(np.array([gx, gx]), np.array([-5.0, 5.0]), LAT0, LON0)
+        gates.append({'name': f'x{int(gx)}', 'start': [lat[0], lon[0]], 'end': [lat[1], lon[1]]})
+    return Circuit('test', LAT0, LON0, gates=gates, corners=[
+        {'name': 'C1', 'lat_min': LAT0, 'lat_max': LAT0 + 1e-4, 'lon_min': LON0, 'lon_max': LON0 + 1e-4},
+    ])
+
+
+def test_gate_lines_are_precomputed_in_local_coordinates():
+    circuit = _circuit()
+
+    assert circuit.gates_xy[:, :, 0] == pytest.approx(np.array([[10.0, 10.0], [30.0, 30.0]]), abs=1e-3)
+    assert circuit.gate_lengths == pytest.approx([10.0, 10.0], abs=1e-3)
+    # a*x + b*y - c はゲートの直線からの符号付き距離
+    a, b, c = circuit.gate_lines[0]
+    assert a * 13.0 + b * 0.0 - c == pytest.approx(-3.0, abs=1e-3)
+
+
+def test_circuit_crossings_match_plain_kernel():
+    circuit = _circuit()
+    x = np.linspace(0.0, 40.0, 81)
+    y = np.full_like(x, 1.0)
+    t = x / 10.0
+
+    crossings = circuit.find_gate_crossings(x, y, t)
+    expected = find_gate_crossings(x, y, t, circuit.gates_xy)
+
+    assert crossings['Gate'].tolist() == [0, 1]
+    assert crossings['Time'].to_numpy() == pytest.approx(expected['Time'].to_numpy())
+    assert crossings['Time'].to_numpy() == pytest.approx([1.0, 3.0], abs=1e-3)
+
+
+def test_from_sector_gates_round_trip():
+    circuit = _circuit()
+    rebuilt = Circuit.from_sector_gates(circuit.sector_gates())
+
+    assert rebuilt.sector_gates() == circuit.sector_gates()
+    assert (rebuilt.lat0, rebuilt.lon0) == circuit.sector_gates()[0][0]
+    assert rebuilt.gate_lengths == pytest.approx(circuit.gate_lengths)
+
+
+def test_save_and_load_reuses_prepared_circuit(tmp_path):
+    path = _circuit().save(str(tmp_path / 'test.json'))
+
+    first = load_circuit(path)
+    assert load_circuit(path) is first
+    assert first.gate_names == ['x10', 'x30']
+    assert first.corner_is_box.tolist() == [True]
+    assert first.gate_lines == pytest.approx(_circuit().gate_lines)
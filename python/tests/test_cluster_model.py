@@ -0,0 +1,81 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster_model import ScalableClusterModel, load_or_fit_model, read_chunks
+
+
+@pytest.fixture
+def session_file(tmp_path):
+    # はっきり分かれた3つの塊（欠損値と文字列カラムを含む）
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0], [20.0, 0.0], [0.0, 20.0]])
+    points = np.vstack([c + rng.normal(scale=0.5, size=(40, 2)) for c in centers])
+    frame = pd.DataFrame({'x': points[:, 0], 'y': points[:, 1], 'note': 'a'})
+    frame.loc[5, 'y'] = np.nan
+    path = tmp_path / 'session.csv'
+    frame.to_csv(path, sep=';', index=False)
+    return str(path)
+
+
+def test_scaler_matches_full_data(session_file):
+    model = ScalableClusterModel().fit_files(session_file, chunksize=7)
+    frame = pd.read_csv(session_file, sep=';')
+
+    assert model.columns == ['x', 'y']
+    filled = frame[['x', 'y']].fillna(0)
+    np.testing.assert_allclose(model.scaler.mean_, filled.mean().to_numpy())
+    np.testing.assert_allclose(model.scaler.var_, filled.var(ddof=0).to_numpy())
+    assert model.fitted_rows == len(frame)
+
+
+def test_predict_file_aggregates_match_row_predictions(session_file):
+    model = ScalableClusterModel().fit_files(session_file, chunksize=16)
+    frame = pd.read_csv(session_file, sep=';')
+    labels = model.predict(frame)
+
+    # 3つの塊がそれぞれ1つのクラスタになる
+    assert sorted(np.bincount(labels)) == [40, 40, 40]
+
+    result = model.predict_file(session_file, chunksize=13, sample_size=25)
+    assert result['rows'] == len(frame)
+    assert result['missing_values'] == 1
+    assert result['sizes'] == {int(k): int(v) for k, v in pd.Series(labels).value_counts().items()}
+
+    expected = frame.assign(cluster=labels).groupby('cluster')[['x', 'y']].mean()
+    for k, means in result['cluster_means'].items():
+        assert means['x'] == pytest.approx(expected.loc[k, 'x'])
+        assert means['y'] == pytest.approx(expected.loc[k, 'y'])
+
+    assert len(result['head']) == 5
+    np.testing.assert_array_equal(result['head']['cluster'].to_numpy(), labels[:5])
+    assert list(result['sample'].columns) == ['pc1', 'pc2', 'cluster']
+    assert len(result['sample']) == 25
+
+
+def test_short_trailing_chunk_is_used(session_file):
+    # 120行を59行ずつ読むと最後のチャンクは2行（n_clusters 未満）になる
+    model = ScalableClusterModel().fit_files(session_file, chunksize=59)
+    assert model.fitted_rows == 120
+
+
+def test_load_or_fit_model_reuses_saved_model(session_file, tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    fitted = load_or_fit_model(session_file, model_path, chunksize=50)
+    loaded = load_or_fit_model(session_file, model_path, chunksize=50)
+
+    assert loaded.fitted_at == fitted.fitted_at
+    np.testing.assert_allclose(loaded.kmeans.cluster_centers_, fitted.kmeans.cluster_centers_)
+    chunk = next(read_chunks(session_file, chunksize=20))
+    np.testing.assert_array_equal(loaded.predict(chunk), fitted.predict(chunk))
+
+
+def test_outdated_model_is_refitted(session_file, tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    joblib.dump({'version': 0, 'model': None}, model_path)
+    assert ScalableClusterModel.load(model_path) is None
+
+    model = load_or_fit_model(session_file, model_path, chunksize=50)
+    assert model is not None
+    assert ScalableClusterModel.load(model_path).fitted_rows == model.fitted_rows
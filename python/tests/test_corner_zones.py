@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from circuit_registry import Circuit
+from corner_zones import STRAIGHT, assign_corners, corner_passages, corner_summary
+
+LAT0, LON0 = 35.0, 140.0
+
+
+def _box(name, lat_min, lat_max, lon_min, lon_max, **extra):
+    return {'name': name, 'lat_min': LAT0 + lat_min * 1e-4, 'lat_max': LAT0 + lat_max * 1e-4,
+            'lon_min': LON0 + lon_min * 1e-4, 'lon_max': LON0 + lon_max * 1e-4, **extra}
+
+
+def _circuit(big_priority=None):
+    triangle = [[LAT0 + 20e-4, LON0], [LAT0 + 20e-4, LON0 + 10e-4], [LAT0 + 30e-4, LON0]]
+    return Circuit('test', LAT0, LON0, corners=[
+        _box('Big', 0, 10, 0, 30, priority=big_priority),
+        _box('Small', 0, 10, 10, 20),
+        {'name': 'Tri', 'polygon': triangle},
+    ])
+
+
+def test_assign_corners_resolves_overlaps_and_polygons():
+    lat = LAT0 + np.array([5, 5, 5, 5, 22, 28, np.nan]) * 1e-4
+    lon = LON0 + np.array([5, 15, 25, 40, 2, 8, 5]) * 1e-4
+
+    # 重なった領域は面積の小さいコーナー、三角形は頂点で内外を判定する
+    assert assign_corners(lat, lon, _circuit()).tolist() == [0, 1, 0, STRAIGHT, 2, STRAIGHT, STRAIGHT]
+    # 優先度が高ければ大きい領域が上書きする
+    assert assign_corners(lat, lon, _circuit(big_priority=1)).tolist() == [0, 0, 0, STRAIGHT, 2, STRAIGHT, STRAIGHT]
+
+
+def _session(labels_by_lap, g_by_lap):
+    frames = []
+    for lap, (labels, g) in enumerate(zip(labels_by_lap, g_by_lap), start=1):
+        n = len(labels)
+        frames.append(pd.DataFrame({
+            'Lap': lap, 'Time': np.arange(n) * 0.1, 'Speed GPS': 50.0 + np.abs(np.arange(n) - 8.0),
+            'Gf. Y': g, 'Lat.': LAT0, 'Lon.': LON0, 'label': labels,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_passages_merge_fragments_and_keep_one_per_corner_per_lap():
+    s, a, b = STRAIGHT, 0, 1
+    # ラップ 1: A の区間が B の短い区間で途切れ、ストレートをはさんで A をもう一度かすめる
+    lap1 = [s, s] + [a] * 5 + [b] * 2 + [a] * 5 + [s] * 16 + [a] * 6 + [s] * 4
+    g1 = np.full(len(lap1), 0.1)
+    g1[4] = 1.2
+    g1[30] = 0.3
+    # ラップ 2: A の2ポイントは GPS のぶれとして除き、B だけを通過とする
+    lap2 = [s, a, a, s, s] + [b] * 8 + [s] * 3
+    g2 = np.full(len(lap2), 0.2)
+    df = _session([lap1, lap2], [g1, g2])
+
+    passages = corner_passages(df, _circuit(), labels=df['label'].to_numpy())
+
+    assert passages[['Lap', 'Corner', 'start_idx', 'end_idx']].values.tolist() == [
+        [1, 'Big', 2, 13],
+        [2, 'Small', 5, 12],
+    ]
+    first = passages.iloc[0]
+    assert first['apex_idx'] == 8
+    assert first['peak_g'] == pytest.approx(1.2)
+    assert first['duration'] == pytest.approx(1.1)
+    assert first['entry_time'] == pytest.approx(0.2)
+
+    every = corner_passages(df, _circuit(), labels=df['label'].to_numpy(), one_per_lap=False)
+    assert every[['Lap', 'Corner', 'start_idx', 'end_idx']].values.tolist() == [
+        [1, 'Big', 2, 13],
+        [1, 'Big', 30, 35],
+        [2, 'Small', 5, 12],
+    ]
+
+
+def test_corner_summary_counts_passes():
+    s, a = STRAIGHT, 0
+    labels = [s] + [a] * 6 + [s]
+    df = _session([labels, labels], [np.full(8, 0.5), np.full(8, 0.7)])
+
+    summary = corner_summary(corner_passages(df, _circuit(), labels=df['label'].to_numpy()))
+
+    assert summary.loc['Big', 'passes'] == 2
+    assert summary.loc['Big', 'peak_g_mean'] == pytest.approx(0.6)
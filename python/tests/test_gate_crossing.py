@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from gate_crossing import find_gate_crossings, first_crossings
+
+
+def _straight(n=11):
+    """x = 0, 1, ..., n-1 を1秒ごとに進む直線"""
+    x = np.arange(n, dtype=np.float64)
+    return x, np.zeros(n), x.copy()
+
+
+def test_crossing_time_is_interpolated_between_samples():
+    x, y, t = _straight()
+    crossings = find_gate_crossings(x, y, t, [((2.5, -1.0), (2.5, 1.0)), ((7.25, 1.0), (7.25, -1.0))])
+
+    assert crossings['Gate'].tolist() == [0, 1]
+    assert crossings['Segment'].tolist() == [2, 7]
+    assert crossings['Time'].to_numpy() == pytest.approx([2.5, 7.25])
+    assert crossings['x'].to_numpy() == pytest.approx([2.5, 7.25])
+
+
+def test_gate_on_a_sample_is_counted_once():
+    x, y, t = _straight()
+    crossings = find_gate_crossings(x, y, t, [((3.0, -1.0), (3.0, 1.0))])
+
+    # セグメントは [0, 1) なので、サンプル点上の交差は後ろのセグメントだけで数える
+    assert crossings['Segment'].tolist() == [3]
+    assert crossings['Ratio'].tolist() == [0.0]
+
+
+def test_segments_across_laps_are_ignored():
+    x, y, t = _straight()
+    lap = np.array([1] * 5 + [2] * 6)
+    gates = [((4.5, -1.0), (4.5, 1.0)), ((6.5, -1.0), (6.5, 1.0))]
+
+    assert len(find_gate_crossings(x, y, t, gates)) == 2
+    crossings = find_gate_crossings(x, y, t, gates, lap=lap)
+    assert crossings['Gate'].tolist() == [1]
+    assert crossings['Lap'].tolist() == [2]
+
+
+def test_chunks_and_first_crossings():
+    # 同じゲートを往復して2回通過する
+    x = np.array([0.0, 2.0, 0.0, 2.0])
+    y = np.zeros(4)
+    t = np.arange(4.0)
+    gate = [((1.0, -1.0), (1.0, 1.0))]
+
+    crossings = find_gate_crossings(x, y, t, gate, chunk_size=1)
+    assert crossings['Time'].to_numpy() == pytest.approx([0.5, 1.5, 2.5])
+    assert first_crossings(crossings)['Time'].to_numpy() == pytest.approx([0.5])
@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from driving_analyze import group_laps, load_preprocessed_data
+from lap_matrix import LapMatrix
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'alfano_data.csv')
+
+
+@pytest.fixture
+def laps(tmp_path):
+    if not os.path.exists(DATA_FILE):
+        pytest.skip('サンプルデータがない')
+    data_file = tmp_path / 'alfano_data.csv'
+    shutil.copy(DATA_FILE, data_file)
+    return group_laps(load_preprocessed_data(str(data_file), use_cache=False))
+
+
+def test_circuit_sectors_follow_gates_and_sum_to_lap_time(laps):
+    matrix = LapMatrix(laps, grid_step=1.0, circuit='mobara')
+
+    assert matrix.sector_times.shape == (len(matrix.laps), 5)
+    complete = ~np.isnan(matrix.sector_times).any(axis=1)
+    assert complete.any()
+    assert matrix.sector_times[complete].sum(axis=1) == pytest.approx(matrix.lap_times[complete], abs=1e-6)
+    assert matrix.sector_time_delta.shape == (len(matrix.laps), len(matrix.laps), 5)
+
+
+def test_without_circuit_or_bounds_only_whole_lap_deltas(laps):
+    matrix = LapMatrix(laps, grid_step=1.0)
+
+    assert matrix.sector_times.shape == (len(matrix.laps), 0)
+    pair = matrix.pair(matrix.laps[1], matrix.laps[0])
+    assert pair['sector_time_delta'] == []
+    assert pair['lap_time_delta'] == pytest.approx(matrix.lap_times[1] - matrix.lap_times[0])
+    assert not any(col.startswith('sector') for col in matrix.to_frame().columns)
+
+
+def test_sector_bounds_split_on_distance(laps):
+    matrix = LapMatrix(laps, grid_step=1.0, sector_bounds=[200.0])
+
+    assert matrix.sector_times.shape == (len(matrix.laps), 2)
+    assert (matrix.sector_times > 0).all()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lap_resample import LapResampler, delta_time_trace, resample_lap, xy_to_latlon
+
+LAT0, LON0 = 35.38, 140.28
+
+
+def _lap(x, y, t, speed):
+    lat, lon = xy_to_latlon(x, y, LAT0, LON0)
+    return pd.DataFrame({'Lat.': lat, 'Lon.': lon, 'Time': t, 'Speed GPS': speed})
+
+
+def _straight_lap(length=100.0, lap_time=10.0, n=101, speed=50.0):
+    x = np.linspace(0.0, length, n)
+    return _lap(x, np.zeros(n), np.linspace(0.0, lap_time, n), np.full(n, speed))
+
+
+def test_resample_lap_interpolates_on_distance_grid():
+    grid = resample_lap(_straight_lap(), step=10.0)
+
+    assert grid['Distance'].to_numpy() == pytest.approx(np.arange(0.0, 101.0, 10.0), abs=1e-6)
+    assert grid['Elapsed'].to_numpy() == pytest.approx(np.arange(0.0, 10.1, 1.0), abs=1e-6)
+    assert (grid['Speed GPS'] == 50.0).all()
+
+
+def test_delta_time_trace_is_positive_for_slower_lap():
+    reference = resample_lap(_straight_lap(lap_time=10.0), step=10.0)
+    slower = resample_lap(_straight_lap(lap_time=12.0), step=10.0)
+    delta = delta_time_trace(slower, reference)
+
+    assert delta['Delta'].to_numpy() == pytest.approx(np.arange(0.0, 101.0, 10.0) * 0.02, abs=1e-6)
+
+
+def test_resampler_does_not_mix_laps_with_same_number_and_length():
+    resampler = LapResampler(step=10.0)
+    session_a = _straight_lap(speed=50.0)
+    session_b = _straight_lap(speed=70.0)
+
+    assert (resampler.get(session_a)['Speed GPS'] == 50.0).all()
+    assert (resampler.get(session_b)['Speed GPS'] == 70.0).all()
+    # 同じオブジェクトはキャッシュしたグリッドを返す
+    assert resampler.get(session_a) is resampler.get(session_a)
+
+
+def test_resampler_delta_cache_follows_lap_data():
+    resampler = LapResampler(step=10.0)
+    reference = _straight_lap(lap_time=10.0)
+    first = resampler.delta_time(_straight_lap(lap_time=11.0), reference)
+    second = resampler.delta_time(_straight_lap(lap_time=12.0), reference)
+
+    assert first['Delta'].iloc[-1] == pytest.approx(1.0, abs=1e-6)
+    assert second['Delta'].iloc[-1] == pytest.approx(2.0, abs=1e-6)
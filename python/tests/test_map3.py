@@ -0,0 +1,41 @@
+import numpy as np
+
+from map3 import RefinedCornerClassifier, _window_mean_std
+
+
+def _classifier(reference_corners):
+    # 基準ラップの読み込みを省き、コーナーの対応付けだけを試す
+    classifier = RefinedCornerClassifier.__new__(RefinedCornerClassifier)
+    classifier.reference_corners = np.asarray(reference_corners)
+    return classifier
+
+
+def test_window_mean_std_ignores_nan_and_returns_nan_for_empty_windows():
+    values = np.array([1.0, 2.0, np.nan, 4.0, np.nan, np.nan])
+    mean, std = _window_mean_std(values, np.array([0, 0, 4]), np.array([2, 4, 6]))
+
+    assert np.allclose(mean[:2], [1.5, 7.0 / 3.0])
+    assert np.allclose(std[:2], [0.5, np.std([1.0, 2.0, 4.0])])
+    assert np.isnan(mean[2]) and np.isnan(std[2])
+
+
+def test_match_corners_minimizes_total_distance():
+    classifier = _classifier([10, 20])
+    distances = np.array([[1.0, 2.0], [1.5, 10.0]])
+    mapping = classifier._match_corners(distances, np.array([110, 120]))
+
+    assert [(m['reference_corner_index'], m['new_lap_corner_index']) for m in mapping] == [(10, 120), (20, 110)]
+
+
+def test_match_corners_skips_nan_distances():
+    classifier = _classifier([10, 20, 30])
+    distances = np.array([
+        [1.0, np.nan],
+        [np.nan, np.nan],
+        [np.nan, 2.0],
+    ])
+    mapping = classifier._match_corners(distances, np.array([110, 120]))
+
+    assert [(m['reference_corner_index'], m['new_lap_corner_index']) for m in mapping] == [(10, 110), (30, 120)]
+    assert all(np.isfinite(m['feature_distance']) for m in mapping)
+    assert classifier._match_corners(np.full((2, 2), np.nan), np.array([1, 2])) == []
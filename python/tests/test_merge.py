@@ -0,0 +1,98 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# test2/merge.py はパッケージに含まれないスクリプトのため、パスを指定して読み込む
+_spec = importlib.util.spec_from_file_location(
+    'test2_merge', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test2', 'merge.py')
+)
+merge = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(merge)
+
+
+def _dashware():
+    # ラップ2の行が先に並び、ラップ1は 0.2秒のサンプルが欠けている。ラップ3はラップファイルが無い
+    return pd.DataFrame({
+        'Lap [x]': [2, 2, 1, 1, 1, np.nan, 3],
+        'Time Lap [1/100 s]': [36.0] * 7,
+        'Strip [x]': [1] * 7,
+        'Time Strip [1/100 s]': [36.0] * 7,
+        'Time [1/10 s]': [10.0, 10.1, 0.0, 0.1, 0.3, 0.4, 20.0],
+        'RPM': [200, 201, 100, 101, 103, 0, 300],
+    })
+
+
+def _write_lap_file(folder, lap, speeds):
+    path = folder / f'LAP_{lap}_ALFANO6_LAP_test.csv'
+    pd.DataFrame({'Partiel': 1, 'Speed GPS': speeds}).to_csv(path, index=False)
+
+
+@pytest.fixture
+def lap_folder(tmp_path):
+    folder = tmp_path / 'Lapdata'
+    folder.mkdir()
+    _write_lap_file(folder, 1, [500, 510, 520, 530])
+    _write_lap_file(folder, 2, [600, 610])
+    # Dashware に無いラップは結合しない
+    _write_lap_file(folder, 4, [700])
+    return str(folder)
+
+
+def test_partition_by_lap_uses_elapsed_time():
+    data, sample, laps = merge.partition_by_lap(_dashware())
+
+    assert laps == {1: (0, 3), 2: (3, 5), 3: (5, 6)}
+    assert data['Lap'].tolist() == [1, 1, 1, 2, 2, 3]
+    assert data['RPM'].tolist() == [100, 101, 103, 200, 201, 300]
+    # 欠けたサンプルの後もラップ開始からの経過時間で番号を振る
+    assert sample.tolist() == [0, 1, 3, 0, 1, 0]
+
+
+def test_partition_by_lap_falls_back_to_row_number():
+    frame = _dashware()
+    frame.loc[3, 'Time [1/10 s]'] = np.nan
+    _, sample, _ = merge.partition_by_lap(frame)
+    # 時間が欠けたラップ（ラップ1）だけ行番号を使う
+    assert sample.tolist() == [0, 1, 2, 0, 1, 0]
+
+
+def test_merged_laps_align_samples(lap_folder):
+    merged = dict(merge.iter_merged_laps(_dashware(), lap_folder, max_workers=2))
+
+    assert list(merged) == [1, 2]
+    assert merged[1]['RPM'].tolist() == [100, 101, 103]
+    assert merged[1]['Speed GPS'].tolist() == [500, 510, 530]
+    assert merged[2]['Speed GPS'].tolist() == [600, 610]
+
+
+def test_write_merged_laps_matches_in_memory_merge(lap_folder, tmp_path):
+    output_path = str(tmp_path / 'combined.csv')
+    rows = merge.write_merged_laps(_dashware(), lap_folder, output_path, batch_rows=2)
+    expected = merge.merge_lap_segments_preserving_order(_dashware(), lap_folder)
+
+    assert rows == len(expected) == 5
+    assert not os.path.exists(output_path + '.tmp')
+    written = pd.read_csv(output_path)
+    pd.testing.assert_frame_equal(written, expected, check_dtype=False)
+
+
+def test_load_and_format_dashware_csv(tmp_path):
+    path = tmp_path / 'dashware.csv'
+    path.write_text(
+        '"ALFANO ",,,,\n'
+        '"Lap","Time Lap","Strip","Time","RPM"\n'
+        ',"[1/100 s]",,"[1/10 s]",\n'
+        '"1","35.97","1","0","6832"\n'
+        '"","","","0.1","6900"\n',
+        encoding='utf-8'
+    )
+    frame = merge.load_and_format_dashware_csv(str(path))
+
+    assert 'Time Lap [1/100 s]' in frame.columns
+    assert 'Time [1/10 s]' in frame.columns
+    # 先頭4列の空白は直前の値で埋める
+    assert frame.iloc[:, 0].tolist() == [1, 1]
+    assert frame['Time Lap [1/100 s]'].tolist() == [35.97, 35.97]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from run_length import find_runs
+
+MASK = [False, True, True, False, True, True, True, False, True]
+
+
+def test_find_runs_returns_inclusive_bounds():
+    starts, ends = find_runs(MASK)
+
+    assert starts.tolist() == [1, 4, 8]
+    assert ends.tolist() == [2, 6, 8]
+
+
+def test_find_runs_drops_short_runs():
+    starts, ends = find_runs(MASK, min_length=3)
+
+    assert starts.tolist() == [4]
+    assert ends.tolist() == [6]
+
+
+def test_find_runs_splits_at_group_boundaries():
+    groups = [1, 1, 1, 1, 1, 2, 2, 2, 2]
+    starts, ends = find_runs(MASK, groups=groups)
+
+    assert starts.tolist() == [1, 4, 5, 8]
+    assert ends.tolist() == [2, 4, 6, 8]
+    starts, _ = find_runs(MASK, min_length=2, groups=groups)
+    assert starts.tolist() == [1, 5]
+
+
+def test_find_runs_treats_nan_comparison_as_false():
+    values = np.array([1.0, np.nan, 2.0, 3.0])
+    starts, ends = find_runs(values > 0)
+
+    assert starts.tolist() == [0, 2]
+    assert ends.tolist() == [0, 3]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sector_best import SectorBestIndex, LapKey
+
+
+def _trace(lap_time, length=100.0, step=1.0):
+    """一定速度で1周するラップの距離グリッド（'Distance', 'Elapsed'）"""
+    distance = np.arange(0.0, length + step / 2, step)
+    return pd.DataFrame({'Distance': distance, 'Elapsed': distance / length * lap_time})
+
+
+def test_theoretical_best_takes_fastest_sector_from_each_lap():
+    index = SectorBestIndex(3)
+    index.add_lap(1, [10.0, 12.0, 11.0])
+    improved = index.add_lap(2, [11.0, 11.5, None])
+
+    assert improved == [1]
+    assert index.theoretical_best() == pytest.approx(10.0 + 11.5 + 11.0)
+    assert [k.lap for k in index.best_laps] == [1, 2, 1]
+
+
+def test_re_adding_a_lap_rebuilds_the_bests():
+    index = SectorBestIndex(2)
+    index.add_lap(1, [10.0, 10.0])
+    index.add_lap(2, [11.0, 11.0])
+    index.add_lap(1, [12.0, 9.0])
+
+    assert index.best_times.tolist() == [11.0, 9.0]
+    assert [k.lap for k in index.best_laps] == [2, 1]
+
+
+def test_trace_requires_valid_gate_times():
+    index = SectorBestIndex(2)
+    with pytest.raises(ValueError):
+        index.add_lap(1, [5.0, 5.0], trace=_trace(10.0))
+    with pytest.raises(ValueError):
+        index.add_lap(1, [5.0, 5.0], trace=_trace(10.0), gate_times=[2.0, np.nan])
+    with pytest.raises(ValueError):
+        index.add_lap(1, [5.0, 5.0], trace=_trace(10.0), gate_times=[6.0, 2.0])
+
+
+def test_stitched_trace_wraps_the_last_sector_through_lap_end():
+    # 周回コース: ゲート2本（10m, 60m）、セクター1 = ゲート1 → 2、セクター2 = ゲート2 → ラップ終了 → ゲート1
+    index = SectorBestIndex(2)
+    # ラップ1: 一定速度で10秒/周（ゲート通過 1秒, 6秒）
+    index.add_lap(LapKey('A', 's', 1), [5.0, 5.0], trace=_trace(10.0), gate_times=[1.0, 6.0])
+    # ラップ2: 10m〜60m だけ速い（ゲート通過 1.5秒, 5.5秒、ラップタイム 11.5秒）
+    fast = _trace(1.0)
+    fast['Elapsed'] = np.interp(fast['Distance'], [0.0, 10.0, 60.0, 100.0], [0.0, 1.5, 5.5, 11.5])
+    index.add_lap(LapKey('A', 's', 2), [4.0, 7.5], trace=fast, gate_times=[1.5, 5.5])
+
+    assert [k.lap for k in index.best_laps] == [2, 1]
+    stitched = index.stitched_trace()
+
+    # セクター1 はラップ2 の 10m〜60m
+    sector1 = stitched[stitched['Sector'] == 1]
+    assert (sector1['Lap'] == 2).all()
+    assert sector1['Distance'].iloc[0] == pytest.approx(0.0)
+    assert sector1['Distance'].max() < 50.0
+
+    # セクター2 はラップ1 の 60m → 100m とラップ開始 → 10m の2区間（全長 50m）
+    sector2 = stitched[stitched['Sector'] == 2]
+    assert (sector2['Lap'] == 1).all()
+    assert sector2['Distance'].iloc[0] == pytest.approx(50.0)
+    assert sector2['Distance'].max() < 100.0
+
+    # つなぎ目で距離・経過時間は単調に増え、経過時間はベストセクターの合計（4.0 + 5.0）まで
+    assert (np.diff(stitched['Distance']) > 0).all()
+    assert (np.diff(stitched['Elapsed']) > 0).all()
+    assert stitched['Elapsed'].max() == pytest.approx(9.0 - 0.1)
+
+
+def test_open_course_uses_one_more_gate_than_sectors():
+    index = SectorBestIndex(1)
+    index.add_lap(1, [5.0], trace=_trace(10.0), gate_times=[2.0, 7.0])
+    stitched = index.stitched_trace()
+
+    assert stitched['Distance'].iloc[0] == pytest.approx(0.0)
+    assert stitched['Distance'].max() == pytest.approx(49.0)
+    assert stitched['Elapsed'].iloc[0] == pytest.approx(0.0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from sector_engine import assign_sectors, lap_index, sector_times
+
+# ラップ × ゲートの通過時刻（ラップ 2 の時刻はラップ 1 のゲートの間に入る）
+GATE_TIMES = np.array([
+    [1.0, 3.0, 6.0],
+    [2.0, 4.0, 5.0],
+])
+
+
+def test_lap_index_maps_lap_numbers_to_rows():
+    laps, rows = lap_index([3, 3, np.nan, 7, 3])
+
+    assert laps.tolist() == [3.0, 7.0]
+    assert rows.tolist() == [0, 0, -1, 1, 0]
+
+
+def test_assign_sectors_searches_each_lap_separately():
+    rows = [0, 0, 0, 0, 1, 1, 1, 1, -1]
+    t = [0.5, 1.5, 3.5, 7.0, 1.0, 2.5, 4.5, 5.5, 2.0]
+
+    sectors = assign_sectors(rows, t, GATE_TIMES)
+
+    # 最初のゲートより前と最後のゲート以降は最終セクター（周回コース）
+    assert sectors.tolist() == [3, 1, 2, 3, 3, 1, 2, 3, 0]
+
+
+def test_assign_sectors_open_course_leaves_outside_samples_unassigned():
+    sectors = assign_sectors([0, 0, 0, 0], [0.5, 1.5, 3.5, 7.0], GATE_TIMES[:1], closed=False)
+
+    assert sectors.tolist() == [0, 1, 2, 0]
+
+
+def test_assign_sectors_skips_laps_without_all_gates_in_order():
+    gate_times = np.array([
+        [1.0, np.nan, 6.0],
+        [4.0, 2.0, 5.0],
+        [1.0, 3.0, 6.0],
+    ])
+
+    sectors = assign_sectors([0, 1, 2], [2.0, 3.0, 2.0], gate_times)
+
+    assert sectors.tolist() == [0, 0, 1]
+
+
+def test_sector_times_wrap_around_sector_completes_lap_time():
+    times = sector_times(GATE_TIMES, lap_times=[10.0, 9.0])
+
+    assert times == pytest.approx(np.array([[2.0, 3.0, 5.0], [2.0, 1.0, 6.0]]))
+    assert times.sum(axis=1) == pytest.approx([10.0, 9.0])
+
+
+def test_sector_times_without_lap_time_or_closed_course():
+    assert np.isnan(sector_times(GATE_TIMES)[:, -1]).all()
+    assert sector_times(GATE_TIMES, closed=False) == pytest.approx(np.array([[2.0, 3.0], [2.0, 1.0]]))
+    assert np.isnan(sector_times(np.array([[1.0, np.nan, 6.0]]), [10.0])).all()
@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+
+from session_cache import CACHE_DIR_NAME, load_cached_frame
+
+
+class _Loader:
+    """呼び出し回数を数える loader"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return pd.read_csv(path)
+
+
+def _write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_second_load_hits_cache(tmp_path):
+    data_file = _write(tmp_path / 'session.csv', "a,b\n1,2\n3,4\n")
+    loader = _Loader()
+
+    first = load_cached_frame(data_file, loader)
+    second = load_cached_frame(data_file, loader)
+
+    assert loader.calls == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert os.path.isdir(tmp_path / CACHE_DIR_NAME)
+
+
+def test_changed_content_reloads_and_touched_file_does_not(tmp_path):
+    data_file = _write(tmp_path / 'session.csv', "a,b\n1,2\n")
+    loader = _Loader()
+    load_cached_frame(data_file, loader)
+
+    # 内容が同じで更新時刻だけ変わった場合は内容ハッシュで一致を確認する
+    stat = os.stat(data_file)
+    os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_cached_frame(data_file, loader)
+    assert loader.calls == 1
+
+    _write(tmp_path / 'session.csv', "a,b\n5,6\n")
+    assert load_cached_frame(data_file, loader)['a'].tolist() == [5]
+    assert loader.calls == 2
+
+
+def test_namespaces_and_disabled_cache(tmp_path):
+    data_file = _write(tmp_path / 'session.csv', "a,b\n1,2\n")
+    loader = _Loader()
+    cache_dir = str(tmp_path / 'cache')
+
+    load_cached_frame(data_file, loader, namespace='raw', cache_dir=cache_dir)
+    load_cached_frame(data_file, loader, namespace='preprocessed', cache_dir=cache_dir)
+    assert loader.calls == 2
+
+    load_cached_frame(data_file, loader, use_cache=False)
+    assert loader.calls == 3
+    assert not os.path.exists(tmp_path / CACHE_DIR_NAME)
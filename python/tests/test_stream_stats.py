@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stream_stats import CorrelationAccumulator, CorrelationStore
+
+
+def _frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.normal(100.0, 5.0, n)
+    df = pd.DataFrame({
+        'a': a,
+        'b': 0.5 * a + rng.normal(0.0, 1.0, n),
+        'c': rng.normal(0.0, 1.0, n),
+        'id': np.arange(n),
+    })
+    # 欠損値の位置をカラムごとに変える（カラムの組ごとに除外されることを確かめる）
+    df.loc[rng.random(n) < 0.1, 'a'] = np.nan
+    df.loc[rng.random(n) < 0.2, 'b'] = np.nan
+    return df
+
+
+def test_chunked_updates_match_single_pass_corr():
+    df = _frame()
+    acc = CorrelationAccumulator()
+    for start in range(0, len(df), 64):
+        acc.update(df.iloc[start:start + 64])
+
+    expected = df.drop(columns='id')
+    assert acc.columns == ['a', 'b', 'c']
+    assert acc.corr().to_numpy() == pytest.approx(expected.corr().to_numpy(), abs=1e-10)
+    assert acc.cov().to_numpy() == pytest.approx(expected.cov().to_numpy(), rel=1e-9)
+    assert acc.means().to_numpy() == pytest.approx(expected.mean().to_numpy(), rel=1e-12)
+    assert acc.n_rows.tolist() == expected.count().tolist()
+
+
+def test_merge_of_sessions_matches_concatenated_data():
+    first = _frame(seed=1)
+    second = _frame(seed=2).rename(columns={'c': 'd'})
+
+    merged = CorrelationAccumulator().update(first).merge(CorrelationAccumulator().update(second))
+    expected = pd.concat([first, second], ignore_index=True).drop(columns='id')
+
+    assert merged.columns == ['a', 'b', 'c', 'd']
+    # 同じ行に値がない c と d の組は NaN
+    assert merged.corr().to_numpy() == pytest.approx(expected.corr().to_numpy(), abs=1e-10, nan_ok=True)
+
+
+def test_arrays_round_trip():
+    acc = CorrelationAccumulator().update(_frame())
+    restored = CorrelationAccumulator.from_arrays(acc.to_arrays(prefix='s0_'), prefix='s0_')
+
+    assert restored.columns == acc.columns
+    assert restored.corr().to_numpy() == pytest.approx(acc.corr().to_numpy())
+
+
+def test_store_without_path_does_not_write(tmp_path):
+    df = _frame()
+    data_file = tmp_path / 'session.csv'
+    df.to_csv(data_file, sep=';', index=False)
+
+    stats = CorrelationStore(None).add_file(str(data_file), frame=df)
+
+    assert stats.columns == ['a', 'b', 'c']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['session.csv']
+
+
+def test_persisted_store_reuses_unchanged_sessions(tmp_path):
+    df = _frame()
+    data_file = tmp_path / 'session.csv'
+    df.to_csv(data_file, sep=';', index=False)
+    stats_path = str(tmp_path / 'stats.npz')
+
+    CorrelationStore(stats_path).add_file(str(data_file), chunksize=100)
+    store = CorrelationStore(stats_path)
+
+    assert store.is_current(str(data_file))
+    expected = df.drop(columns='id').corr().to_numpy()
+    assert store.combined().corr().to_numpy() == pytest.approx(expected, abs=1e-10)
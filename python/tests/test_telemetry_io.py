@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from driving_analyze import preprocess_data
+from telemetry_io import detect_format, iter_laps, read_telemetry, time_column_to_seconds, time_to_seconds
+
+ALFANO_TEXT = """Lap;Time Lap;Time;RPM;Speed GPS;Gf. X;Gf. Y;Lat.;Lon.;Extra
+1;0:35.97;0;6832;40.8;0.27;-0.32;35.382012;140.281985;x
+;;0.1;6900;41.9;0.26;-0.33;35.382052;140.281966;y
+2;0:34.10;0;7000;45.0;0.10;0.05;35.382044;140.281971;z
+"""
+
+LAP_TEXT = """Partiel,RPM,Speed GPS,Gf. X,Gf. Y,Lat.,Lon.
+1,6832,408,1027,968,35382012,140281985
+1,6900,419,1026,967,35382052,140281966
+"""
+
+DASHWARE_TEXT = """ALFANO,export
+Lap,Time,RPM,Speed #2,A. Lat.,A. Long.,GPS Lat.,GPS Long.
+,[1/10 s],,[Km/h],[G],[G],,
+1,0.0,6832,40.8,0.27,-0.32,35.382012,140.281985
+1,0.1,6900,41.9,0.26,-0.33,35.382052,140.281966
+"""
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_detect_format(tmp_path):
+    assert detect_format(_write(tmp_path, 'a.csv', ALFANO_TEXT)) == 'alfano'
+    assert detect_format(_write(tmp_path, 'l.csv', LAP_TEXT)) == 'lap'
+    assert detect_format(_write(tmp_path, 'd.csv', DASHWARE_TEXT)) == 'dashware'
+    with pytest.raises(ValueError):
+        detect_format(_write(tmp_path, 'x.csv', "foo,bar\n1,2\n"))
+
+
+def test_alfano_file_keeps_canonical_columns_and_fills_laps(tmp_path):
+    df = read_telemetry(_write(tmp_path, 'a.csv', ALFANO_TEXT))
+
+    assert list(df.columns) == ['Lap', 'Time Lap', 'Time', 'RPM', 'Speed GPS', 'Gf. X', 'Gf. Y', 'Lat.', 'Lon.']
+    assert df['Lap'].tolist() == [1, 1, 2]
+    assert df['Lap'].dtype == np.int32
+    assert df['Speed GPS'].dtype == np.float32
+    assert df['Lat.'].dtype == np.float64
+    # mm:ss.SSS の時間は文字列のまま残す（preprocess_data で秒に変換）
+    assert df['Time Lap'].iloc[0] == '0:35.97'
+
+
+def test_lap_file_raw_values_are_converted_to_physical_units(tmp_path):
+    df = read_telemetry(_write(tmp_path, 'l.csv', LAP_TEXT))
+
+    assert df['Speed GPS'].to_numpy() == pytest.approx([40.8, 41.9], abs=1e-5)
+    assert df['Gf. X'].to_numpy() == pytest.approx([0.27, 0.26], abs=1e-6)
+    assert df['Lat.'].to_numpy() == pytest.approx([35.382012, 35.382052])
+
+
+def test_dashware_header_and_axis_names_are_normalized(tmp_path):
+    df = read_telemetry(_write(tmp_path, 'd.csv', DASHWARE_TEXT))
+
+    assert df['Speed GPS'].to_numpy() == pytest.approx([40.8, 41.9], abs=1e-5)
+    # Dashware の A. Lat. は Alfano 本体の Gf. X
+    assert df['Gf. X'].to_numpy() == pytest.approx([0.27, 0.26], abs=1e-6)
+    assert df['Gf. Y'].to_numpy() == pytest.approx([-0.32, -0.33], abs=1e-6)
+
+    raw = read_telemetry(_write(tmp_path, 'd2.csv', DASHWARE_TEXT), normalize=False)
+    assert 'Speed #2 [Km/h]' in raw.columns
+
+
+def test_stray_non_numeric_cells_become_nan(tmp_path):
+    text = ALFANO_TEXT.replace('6900', 'ERR').replace('35.382044', '')
+    df = read_telemetry(_write(tmp_path, 'a.csv', text))
+
+    assert np.isnan(df['RPM'].iloc[1])
+    assert df['RPM'].iloc[[0, 2]].tolist() == [6832.0, 7000.0]
+    assert df['RPM'].dtype == np.float32
+    assert np.isnan(df['Lat.'].iloc[2])
+
+
+def test_usecols_limits_normalized_columns(tmp_path):
+    df = read_telemetry(_write(tmp_path, 'a.csv', ALFANO_TEXT), usecols=['Lap', 'Speed GPS'])
+
+    assert list(df.columns) == ['Lap', 'Speed GPS']
+
+
+def _alfano_session(laps):
+    """ラップ番号は各ラップの先頭行だけに書く（Alfano本体の形式）"""
+    lines = ["Lap;Time Lap;Time;RPM;Speed GPS;Lat.;Lon."]
+    for lap, n in laps:
+        for i in range(n):
+            head = f"{lap};0:3{lap}.50" if i == 0 else ";"
+            lines.append(f"{head};{i / 10};{6000 + i};{40 + i};35.38;140.28")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 4, 100])
+def test_iter_laps_matches_full_read_across_chunk_boundaries(tmp_path, chunksize):
+    path = _write(tmp_path, 'a.csv', _alfano_session([(1, 5), (2, 3), (3, 4)]))
+    full = read_telemetry(path)
+
+    laps = list(iter_laps(path, chunksize=chunksize))
+
+    assert [lap for lap, _ in laps] == [1, 2, 3]
+    for lap, lap_data in laps:
+        expected = full[full['Lap'] == lap].reset_index(drop=True)
+        # 空欄だけのチャンクの Time Lap は数値の NaN になるため、値だけを比べる
+        pd.testing.assert_frame_equal(lap_data, expected, check_dtype=False)
+        assert lap_data['Speed GPS'].dtype == np.float32
+        assert lap_data['Time Lap'].iloc[0] == f"0:3{lap}.50"
+
+
+def test_iter_laps_without_lap_column_yields_whole_file(tmp_path):
+    laps = list(iter_laps(_write(tmp_path, 'l.csv', LAP_TEXT)))
+
+    assert [lap for lap, _ in laps] == [1]
+    assert len(laps[0][1]) == 2
+
+
+def test_iter_laps_usecols_keeps_lap_column(tmp_path):
+    path = _write(tmp_path, 'a.csv', _alfano_session([(1, 2), (2, 2)]))
+
+    lap, lap_data = next(iter_laps(path, usecols=['Speed GPS']))
+
+    assert lap == 1
+    assert list(lap_data.columns) == ['Lap', 'Speed GPS']
+
+
+def test_time_to_seconds_parses_clock_text_seconds_and_blanks():
+    values = pd.Series(['1:02.500', ' 35.97 ', '', None, 'abc', '0:59'], index=[10, 11, 12, 13, 14, 15])
+
+    seconds = time_to_seconds(values)
+
+    assert seconds.index.tolist() == [10, 11, 12, 13, 14, 15]
+    assert seconds.iloc[[0, 1, 5]].tolist() == pytest.approx([62.5, 35.97, 59.0])
+    assert seconds.iloc[2:5].isna().all()
+
+
+def test_time_to_seconds_malformed_clock_text_and_empty_column():
+    seconds = time_to_seconds(pd.Series(['1:2:3', '1:', ':5', '2:05.25', '1e1']))
+
+    assert seconds.iloc[:3].isna().all()
+    assert seconds.iloc[3:].tolist() == pytest.approx([125.25, 10.0])
+    assert time_to_seconds(pd.Series([], dtype=object)).empty
+
+
+def test_time_to_seconds_numeric_and_ticks():
+    assert time_to_seconds(pd.Series([35.97, np.nan])).iloc[0] == pytest.approx(35.97)
+    assert time_to_seconds(pd.Series([3597]), ticks_per_second=100).iloc[0] == pytest.approx(35.97)
+
+    df = pd.DataFrame({'Time Lap [1/100 s]': [3597.0]})
+    assert time_column_to_seconds(df, 'Time Lap [1/100 s]').iloc[0] == pytest.approx(3597.0)
+    assert time_column_to_seconds(df, 'Time Lap [1/100 s]', raw_ticks=True).iloc[0] == pytest.approx(35.97)
+
+
+def test_preprocess_data_adds_lap_time_in_seconds(tmp_path):
+    df = preprocess_data(read_telemetry(_write(tmp_path, 'a.csv', ALFANO_TEXT)))
+
+    assert df['Time Lap (sec)'].tolist()[0] == pytest.approx(35.97)
+    assert np.isnan(df['Time Lap (sec)'].iloc[1])
+    assert df['Time Lap (sec)'].iloc[2] == pytest.approx(34.10)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lap_resample import resample_lap, xy_to_latlon
+from track_model import TrackModel
+
+LAT0, LON0 = 35.38, 140.28
+RADIUS = 50.0
+
+
+def _circle(n=629, radius=RADIUS):
+    """反時計回りの円周（x = r cos θ, y = r sin θ）"""
+    theta = np.linspace(0.0, 2 * np.pi, n, endpoint=False)
+    return radius * np.cos(theta), radius * np.sin(theta)
+
+
+def test_project_gives_track_distance_and_signed_offset():
+    model = TrackModel(*_circle(), LAT0, LON0)
+    # θ = 90° の位置の内側（進行方向左）と外側（右）
+    projected = model.project([0.0, 0.0, np.nan], [RADIUS - 2.0, RADIUS + 3.0, 0.0])
+
+    assert model.length == pytest.approx(2 * np.pi * RADIUS, rel=1e-3)
+    assert projected['TrackDistance'].iloc[:2].to_numpy() == pytest.approx([np.pi / 2 * RADIUS] * 2, rel=1e-3)
+    assert projected['Offset'].iloc[:2].to_numpy() == pytest.approx([2.0, -3.0], abs=1e-2)
+    assert np.isnan(projected['TrackDistance'].iloc[2])
+    assert projected['Segment'].iloc[2] == -1
+
+
+def test_project_lap_is_continuous_across_start_line():
+    model = TrackModel(*_circle(), LAT0, LON0)
+    theta = np.linspace(np.pi, 3 * np.pi, 200)
+    lat, lon = xy_to_latlon(RADIUS * np.cos(theta), RADIUS * np.sin(theta), LAT0, LON0)
+    projected = model.project_lap(pd.DataFrame({'Lat.': lat, 'Lon.': lon}))
+
+    lap_distance = projected['LapDistance'].to_numpy()
+    assert (np.diff(lap_distance) > 0).all()
+    assert lap_distance[-1] - lap_distance[0] == pytest.approx(model.length, rel=1e-2)
+
+
+def test_resample_lap_on_track_distance_ignores_line_width():
+    model = TrackModel(*_circle(), LAT0, LON0)
+    theta = np.linspace(0.0, np.pi, 400)
+    # 中心線の 5m 外側を走るラップ（軌跡の距離は中心線より長い）
+    lat, lon = xy_to_latlon((RADIUS + 5.0) * np.cos(theta), (RADIUS + 5.0) * np.sin(theta), LAT0, LON0)
+    lap = pd.DataFrame({'Lat.': lat, 'Lon.': lon, 'Time': np.linspace(0.0, 10.0, 400)})
+
+    on_track = resample_lap(lap, step=1.0, track=model)
+    on_trace = resample_lap(lap, step=1.0)
+
+    assert on_track['Distance'].iloc[-1] == pytest.approx(np.pi * RADIUS, abs=1.0)
+    assert on_trace['Distance'].iloc[-1] == pytest.approx(np.pi * (RADIUS + 5.0), abs=1.0)
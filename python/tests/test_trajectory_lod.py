@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from trajectory_lod import douglas_peucker_importance, export_trajectories, simplify
+
+
+def test_endpoints_kept_and_collinear_points_dropped():
+    x = np.arange(11, dtype=np.float64)
+    y = np.zeros(11)
+    y[5] = 3.0
+
+    importance = douglas_peucker_importance(x, y)
+
+    assert np.isinf(importance[[0, -1]]).all()
+    assert importance[5] == 3.0
+    assert simplify(x, y, 2.5).tolist() == [0, 5, 10]
+    assert simplify(x, y, 0.0).tolist() == list(range(11))
+    assert simplify(x, y, 5.0).tolist() == [0, 10]
+
+
+def test_coarser_levels_are_subsets_of_finer_levels():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.normal(size=300))
+    y = np.cumsum(rng.normal(size=300))
+    importance = douglas_peucker_importance(x, y)
+
+    previous = set(range(len(x)))
+    for tolerance in (0.25, 1.0, 4.0):
+        kept = set(simplify(x, y, tolerance, importance).tolist())
+        assert kept <= previous
+        previous = kept
+
+
+def test_closed_loop_uses_distance_from_start_point():
+    theta = np.linspace(0.0, 2 * np.pi, 9)
+    importance = douglas_peucker_importance(np.cos(theta), np.sin(theta))
+
+    # 始点と終点が同じ位置なので、最初の分割は始点から最も遠い点（θ = π）
+    assert importance[4] == importance[1:-1].max()
+    assert len(simplify(np.cos(theta), np.sin(theta), 0.5)) >= 3
+
+
+def test_export_writes_empty_index_without_points(tmp_path):
+    df = pd.DataFrame({'x': [np.nan, np.nan], 'y': [1.0, np.nan], 'Lap': [1, 1], 'Time_sec': [0.0, 0.1]})
+
+    index = export_trajectories(df, str(tmp_path))
+
+    assert index['laps'] == []
+    assert json.loads((tmp_path / 'index.json').read_text(encoding='utf-8'))['laps'] == []
+
+
+def test_export_writes_typed_arrays_and_skips_nan_sector_times(tmp_path):
+    df = pd.DataFrame({
+        'x': [0.0, 1.0, 2.0, 10.0, 11.0],
+        'y': [0.0, 0.0, 0.0, 5.0, 5.0],
+        'Lap': [2, 2, 2, 1, 1],
+        'Time_sec': [0.0, 0.1, 0.2, 0.0, 0.1],
+        'Sector': [1, 1, np.nan, 2, 2],
+    })
+    sector_times = pd.DataFrame({'Lap': [1, 2], 'Sector1': [5.0, np.nan], 'Sector2': [6.0, 7.0]})
+
+    index = export_trajectories(df, str(tmp_path), sector_times=sector_times, tolerances=(0.0, 0.5))
+
+    assert [lap['lap'] for lap in index['laps']] == [1, 2]
+    assert index['laps'][1]['sectorTimes'] == {'Sector2': 7.0}
+    assert [level['points'] for level in index['laps'][1]['levels']] == [3, 2]
+    raw = (tmp_path / '2_0.bin').read_bytes()
+    x = np.frombuffer(raw[:12], dtype='<f4')
+    sector = np.frombuffer(raw[36:], dtype='<i1')
+    assert x.tolist() == [0.0, 1.0, 2.0]
+    assert sector.tolist() == [1, 1, -1]
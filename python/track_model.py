@@ -0,0 +1,240 @@
+import pandas as pd
+import numpy as np
+from scipy.spatial import cKDTree
+import argparse
+import json
+import os
+
+from lap_resample import latlon_to_xy, normalize_latlon, LAT_COL, LON_COL
+# コース中心線ファイルはサーキット定義と同じ場所に <名前>_track.json として保存する
+from circuit_registry import CIRCUIT_DIR, circuit_path, load_circuit
+
+# 中心線の点間隔 [m]
+DEFAULT_CENTERLINE_STEP = 1.0
+
+# 最近傍探索で調べる中心線の点の数（この点の前後のセグメントに投影する）
+DEFAULT_CANDIDATES = 4
+
+
+def track_model_path(circuit, circuit_dir=None):
+    """サーキット名に対応するコース中心線ファイルのパスを返す"""
+    return os.path.join(circuit_dir or CIRCUIT_DIR, f"{circuit}_track.json")
+
+
+class TrackModel:
+    """コースの基準中心線と空間インデックス
+
+    ベストラップの軌跡から等間隔の中心線を一度だけ作り、KD-tree で最近傍の
+    セグメントを探して、任意のサンプルを（コース上の距離, 横方向のオフセット）に
+    まとめて投影する。XY座標は基準点 (lat0, lon0) からのローカル座標 [m]
+    （lap_resample.latlon_to_xy）で、サーキットごとに基準点を固定する。
+    """
+
+    def __init__(self, x, y, lat0, lon0, name=None, closed=True):
+        """
+        Parameters:
+        -----------
+        x, y : array-like
+            中心線の点（走行方向順）のローカル座標 [m]
+        lat0, lon0 : float
+            ローカル座標の基準点（度）
+        name : str, optional
+            サーキット名
+        closed : bool
+            周回コースとして最後の点から最初の点へのセグメントを加えるか
+        """
+        self.name = name
+        self.lat0 = float(lat0)
+        self.lon0 = float(lon0)
+        self.closed = closed
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+
+        # セグメント i は点 i → 点 i+1（周回コースは最後の点 → 最初の点も含む）
+        end_x = np.roll(self.x, -1) if closed else self.x[1:]
+        end_y = np.roll(self.y, -1) if closed else self.y[1:]
+        start_x = self.x if closed else self.x[:-1]
+        start_y = self.y if closed else self.y[:-1]
+        self._seg_start = np.column_stack((start_x, start_y))
+        self._seg_vec = np.column_stack((end_x - start_x, end_y - start_y))
+        self._seg_len = np.hypot(self._seg_vec[:, 0], self._seg_vec[:, 1])
+        self._seg_len2 = np.where(self._seg_len > 0, self._seg_len ** 2, 1.0)
+        self.distance = np.concatenate(([0.0], np.cumsum(self._seg_len)))[:len(self._seg_len)]
+        self.length = float(self._seg_len.sum())
+
+        self._tree = cKDTree(np.column_stack((self.x, self.y)))
+
+    @classmethod
+    def from_lap(cls, lap_data, step=DEFAULT_CENTERLINE_STEP, lat0=None, lon0=None, name=None, closed=True):
+        """1ラップの軌跡（通常はベストラップ）から中心線を作る
+
+        停止中などで重なった点を除き、走行距離に沿って step 間隔で補間する。
+        """
+        lat, lon = normalize_latlon(lap_data[LAT_COL], lap_data[LON_COL])
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        lat, lon = lat[valid], lon[valid]
+        if lat0 is None:
+            lat0 = float(np.mean(lat))
+        if lon0 is None:
+            lon0 = float(np.mean(lon))
+        x, y = latlon_to_xy(lat, lon, lat0, lon0)
+
+        distance = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        keep = np.concatenate(([True], np.diff(distance) > 0))
+        distance, x, y = distance[keep], x[keep], y[keep]
+
+        grid = np.arange(0.0, distance[-1], step)
+        return cls(np.interp(grid, distance, x), np.interp(grid, distance, y), lat0, lon0, name, closed)
+
+    def to_xy(self, lat, lon):
+        """緯度経度をこのコースのローカル座標に変換する（1e6倍の生値にも対応）"""
+        return latlon_to_xy(lat, lon, self.lat0, self.lon0)
+
+    def project(self, x, y, candidates=DEFAULT_CANDIDATES):
+        """ローカル座標の点をまとめて中心線に投影する
+
+        KD-tree で近い中心線の点を candidates 個探し、その前後のセグメントへの
+        垂線の足のうち最も近いものを採用する。
+
+        Returns:
+        --------
+        pd.DataFrame
+            'TrackDistance'（コース上の距離 [m]）、'Offset'（進行方向左が正の横方向オフセット [m]）、
+            'Segment'（セグメント番号）。座標が NaN の点は NaN / -1
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n_points = x.size
+        track_distance = np.full(n_points, np.nan)
+        offset = np.full(n_points, np.nan)
+        segment = np.full(n_points, -1, dtype=np.int64)
+
+        valid = np.isfinite(x) & np.isfinite(y)
+        if not valid.any():
+            return pd.DataFrame({'TrackDistance': track_distance, 'Offset': offset, 'Segment': segment})
+
+        points = np.column_stack((x[valid], y[valid]))
+        k = min(candidates, len(self.x))
+        _, nearest = self._tree.query(points, k=k)
+        nearest = nearest.reshape(len(points), k)
+
+        # 候補の点の前後のセグメント（形状: 点の数 × 2k）
+        n_seg = len(self._seg_len)
+        cand = np.concatenate((nearest, nearest - 1), axis=1)
+        if self.closed:
+            cand %= n_seg
+        else:
+            cand = np.clip(cand, 0, n_seg - 1)
+
+        start = self._seg_start[cand]
+        vec = self._seg_vec[cand]
+        rel = points[:, np.newaxis, :] - start
+        ratio = np.clip((rel * vec).sum(axis=2) / self._seg_len2[cand], 0.0, 1.0)
+        foot = start + ratio[..., np.newaxis] * vec
+        dist2 = ((points[:, np.newaxis, :] - foot) ** 2).sum(axis=2)
+
+        best = np.argmin(dist2, axis=1)
+        rows = np.arange(len(points))
+        best_seg = cand[rows, best]
+        best_ratio = ratio[rows, best]
+        cross = vec[rows, best, 0] * rel[rows, best, 1] - vec[rows, best, 1] * rel[rows, best, 0]
+
+        track_distance[valid] = self.distance[best_seg] + best_ratio * self._seg_len[best_seg]
+        offset[valid] = np.sign(cross) * np.sqrt(dist2[rows, best])
+        segment[valid] = best_seg
+        return pd.DataFrame({'TrackDistance': track_distance, 'Offset': offset, 'Segment': segment})
+
+    def project_latlon(self, lat, lon, candidates=DEFAULT_CANDIDATES):
+        """緯度経度の点をまとめて中心線に投影する"""
+        x, y = self.to_xy(lat, lon)
+        return self.project(x, y, candidates)
+
+    def project_lap(self, lap_data, candidates=DEFAULT_CANDIDATES):
+        """ラップデータを投影し、周回をまたいでも単調に増える 'LapDistance' を加えて返す
+
+        スタート地点がコースの距離0と一致しないラップでも、距離が一周分戻る位置で
+        コース全長を足して連続させる。
+        """
+        projected = self.project_latlon(lap_data[LAT_COL], lap_data[LON_COL], candidates)
+        track_distance = projected['TrackDistance'].to_numpy()
+        if self.closed:
+            step = np.diff(track_distance, prepend=track_distance[0])
+            step = np.where(np.isnan(step), 0.0, step)
+            wraps = np.cumsum(np.where(step < -self.length / 2, 1, np.where(step > self.length / 2, -1, 0)))
+            projected['LapDistance'] = track_distance + wraps * self.length
+        else:
+            projected['LapDistance'] = track_distance
+        return projected
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'lat0': self.lat0,
+            'lon0': self.lon0,
+            'closed': self.closed,
+            'length': self.length,
+            'x': self.x.tolist(),
+            'y': self.y.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['x'], data['y'], data['lat0'], data['lon0'], data.get('name'), data.get('closed', True))
+
+    def save(self, path=None):
+        """中心線をJSONとして保存する（パス省略時はサーキットごとの既定の場所）"""
+        path = path or track_model_path(self.name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, circuit_or_path, circuit_dir=None):
+        """サーキット名または中心線ファイルのパスから読み込む（KD-tree は読み込み時に作る）"""
+        path = circuit_or_path
+        if not os.path.exists(path):
+            path = track_model_path(circuit_or_path, circuit_dir)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_track_model(file_path, circuit, lap=None, step=DEFAULT_CENTERLINE_STEP, save=True):
+    """セッションのベストラップ（または指定ラップ）からコース中心線を作る関数
+
+    サーキット定義（circuits/<名前>.json）が登録済みなら、その基準点をローカル座標の原点にする
+    （ゲート・コーナーと同じ座標系になる）。
+    """
+    from driving_analyze import load_preprocessed_data, group_laps, get_lap_time
+
+    laps = group_laps(load_preprocessed_data(file_path))
+    if lap is None:
+        lap_times = {lap_num: get_lap_time(lap_data) for lap_num, lap_data in laps.items()}
+        lap = min((l for l in lap_times if not np.isnan(lap_times[l])), key=lap_times.get)
+
+    lat0 = lon0 = None
+    if os.path.exists(circuit_path(circuit)):
+        registered = load_circuit(circuit)
+        lat0, lon0 = registered.lat0, registered.lon0
+
+    model = TrackModel.from_lap(laps[lap], step=step, lat0=lat0, lon0=lon0, name=circuit)
+    if save:
+        path = model.save()
+        print(f"コース中心線を保存しました（ラップ {lap}, 全長 {model.length:.1f} m）: {path}")
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="セッションのベストラップからコース中心線を作成して保存します")
+    parser.add_argument('file', help="セッションのCSVファイル")
+    parser.add_argument('circuit', help="サーキット名（circuits/<名前>_track.json に保存）")
+    parser.add_argument('--lap', type=int, default=None, help="中心線にするラップ（既定: ベストラップ）")
+    parser.add_argument('--step', type=float, default=DEFAULT_CENTERLINE_STEP, help="中心線の点間隔 [m]")
+    args = parser.parse_args()
+
+    build_track_model(args.file, args.circuit, lap=args.lap, step=args.step)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
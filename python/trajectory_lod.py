@@ -0,0 +1,168 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import json
+import os
+
+# 出力形式を変えたら上げる（フロントエンドは index.json の version で判別する）
+LOD_VERSION = 1
+
+# 詳細度ごとの許容誤差 [m]（レベル 0 は全ポイント、数字が大きいほど粗い）
+LOD_TOLERANCES = (0.0, 0.25, 1.0, 4.0)
+
+# 1ポイントあたりのフィールドと型（ラップ・レベルごとに各フィールドを連続した型付き配列として並べる）
+# x, y は index.json の origin からの相対座標 [m]、Sector は未割り当てを -1 とする
+POINT_FIELDS = (
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('Time_sec', '<f4'),
+    ('Sector', '<i1'),
+)
+
+INDEX_FILE_NAME = 'index.json'
+
+
+def douglas_peucker_importance(x, y):
+    """Douglas-Peucker 法で各ポイントが残る許容誤差の上限を求める関数
+
+    分割ごとの最大距離を親の値で頭打ちにするため、許容誤差 t で残るポイント
+    （importance > t）は t が大きいほど部分集合になる。1回の分割で全レベルの
+    間引きが決まり、粗いレベルの点は細かいレベルにも必ず含まれる。
+    両端の点は np.inf。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        length = np.hypot(dx, dy)
+        if length > 0:
+            dist = np.abs(dx * py - dy * px) / length
+        else:
+            # 周回の始点と終点が同じ位置の場合は点からの距離
+            dist = np.hypot(px, py)
+        k = int(np.argmax(dist))
+        split = start + 1 + k
+        value = min(dist[k], parent)
+        importance[split] = value
+        stack.append((start, split, value))
+        stack.append((split, end, value))
+    return importance
+
+
+def simplify(x, y, tolerance, importance=None):
+    """許容誤差 tolerance で間引いたポイントのインデックスを返す関数（0 以下なら全ポイント）"""
+    if tolerance <= 0:
+        return np.arange(len(x))
+    if importance is None:
+        importance = douglas_peucker_importance(x, y)
+    return np.flatnonzero(importance > tolerance)
+
+
+def _pack_points(x, y, time_sec, sector):
+    """ポイントをフィールドごとの型付き配列として1つのバイト列にまとめる"""
+    columns = {'x': x, 'y': y, 'Time_sec': time_sec, 'Sector': sector}
+    return b''.join(np.asarray(columns[name]).astype(dtype).tobytes() for name, dtype in POINT_FIELDS)
+
+
+def export_trajectories(df, out_dir, sector_times=None, tolerances=LOD_TOLERANCES, lap_column='Lap',
+                        time_column='Time_sec', sector_column='Sector'):
+    """ラップごとの軌跡を詳細度別のバイナリファイルと索引ファイルに書き出す関数
+
+    フロントエンドは index.json を読んで、表示するラップ・ズームに応じた
+    <ラップ>_<レベル>.bin だけを取得する。各ファイルは POINT_FIELDS の順に
+    ポイント数分の型付き配列を並べたもの（Float32Array / Int8Array でそのまま読める）。
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        'x', 'y'（ローカル座標 [m]）、ラップ番号、時間、セクター番号のカラムを持つデータ
+    out_dir : str
+        出力先ディレクトリ
+    sector_times : pd.DataFrame, optional
+        ラップごとのセクタータイム（'Lap' と 'Sector1', 'Sector2', ... のカラム）。
+        NaN のセクターは索引の 'sectorTimes' から省く
+    tolerances : tuple
+        レベルごとの許容誤差 [m]
+
+    Returns:
+    --------
+    dict
+        書き出した索引（index.json の内容）
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    valid = df['x'].notna() & df['y'].notna() & df[lap_column].notna()
+    data = df.loc[valid]
+    x = data['x'].to_numpy(dtype=np.float64)
+    y = data['y'].to_numpy(dtype=np.float64)
+    time_sec = data[time_column].to_numpy(dtype=np.float64, na_value=np.nan) if time_column in data.columns else np.full(len(data), np.nan)
+    sector = data[sector_column].to_numpy(dtype=np.float64, na_value=np.nan) if sector_column in data.columns else np.full(len(data), np.nan)
+    sector = np.where(np.isnan(sector), -1, sector).astype(np.int64)
+
+    # float32 の精度を保つため、座標は全体の最小値からの相対値で保存する
+    origin_x = float(x.min()) if len(x) else 0.0
+    origin_y = float(y.min()) if len(y) else 0.0
+
+    # ラップ番号で安定ソートして連続した区間に分ける（元の順序はラップ内で保つ。ポイントが無ければラップ無し）
+    laps = data[lap_column].to_numpy()
+    order = np.argsort(laps, kind='stable')
+    laps_sorted = laps[order]
+    if len(laps_sorted):
+        bounds = np.flatnonzero(np.concatenate(([True], laps_sorted[1:] != laps_sorted[:-1], [True])))
+    else:
+        bounds = np.zeros(1, dtype=np.int64)
+
+    times_by_lap = {}
+    if sector_times is not None and not sector_times.empty:
+        for record in sector_times.to_dict('records'):
+            lap = record.pop('Lap')
+            # 計測できなかったセクター（NaN）は含めない
+            times_by_lap[int(lap)] = {k: float(v) for k, v in record.items() if not pd.isna(v)}
+
+    lap_entries = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        rows = order[start:end]
+        lap = int(laps_sorted[start])
+        lx, ly = x[rows], y[rows]
+        importance = douglas_peucker_importance(lx, ly)
+
+        levels = []
+        for level, tolerance in enumerate(tolerances):
+            keep = rows[simplify(lx, ly, tolerance, importance)]
+            file_name = f"{lap}_{level}.bin"
+            with open(os.path.join(out_dir, file_name), 'wb') as f:
+                f.write(_pack_points(x[keep] - origin_x, y[keep] - origin_y, time_sec[keep], sector[keep]))
+            levels.append({'level': level, 'points': int(len(keep)), 'file': file_name})
+
+        lap_entries.append({
+            'lap': lap,
+            'sectorTimes': times_by_lap.get(lap, {}),
+            'bounds': [float(lx.min() - origin_x), float(ly.min() - origin_y),
+                       float(lx.max() - origin_x), float(ly.max() - origin_y)],
+            'levels': levels,
+        })
+
+    index = {
+        'version': LOD_VERSION,
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'origin': {'x': origin_x, 'y': origin_y},
+        'fields': [{'name': name, 'type': np.dtype(dtype).name} for name, dtype in POINT_FIELDS],
+        'levels': [{'level': level, 'tolerance': float(t)} for level, t in enumerate(tolerances)],
+        'laps': lap_entries,
+    }
+    with open(os.path.join(out_dir, INDEX_FILE_NAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index